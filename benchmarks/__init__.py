@@ -0,0 +1,10 @@
+"""
+Benchmark suite for the NLU and data hot paths (see benchmarks/run.py).
+
+Not collected by pytest: run with `python -m benchmarks.run`.
+"""
+
+from .cases import CASES, Case
+from .corpus import Corpus, load_corpus
+
+__all__ = ["CASES", "Case", "Corpus", "load_corpus"]
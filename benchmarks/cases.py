@@ -0,0 +1,114 @@
+"""
+Benchmark cases: the NLU and data hot paths, each fed from the fixed corpus.
+
+Every case builds (func, inputs) once; the runner then times func(x) for each
+input. Cases named "*.cold" clear the text/NER caches before every call (outside
+the timed region) so regressions on the uncached path are not hidden by the
+LRU caches, which are ~100% hit rate when the same corpus is replayed.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks.corpus import Corpus
+
+Prepared = Tuple[Callable[[Any], Any], List[Any]]
+
+MAJOR_LABELS = ("TEN_NGANH", "CHUYEN_NGANH", "MA_NGANH")
+
+
+class Case(NamedTuple):
+    """A named benchmark: prepare(corpus, service) -> (func, inputs), optional per-call reset."""
+    name: str
+    prepare: Callable[[Corpus, Any], Prepared]
+    before_each: Optional[Callable[[Any], None]] = None
+
+
+def _clear_nlu_caches(service: Any) -> None:
+    from nlu.preprocess import clear_text_caches
+    clear_text_caches()
+    extractor = getattr(service.pipeline, "_entity_extractor", None)
+    if extractor is not None:
+        extractor._ner_cache.clear()
+
+
+def _normalize(corpus: Corpus, service: Any) -> Prepared:
+    from nlu.preprocess import normalize_text
+    return normalize_text, corpus.messages
+
+
+def _tokenize(corpus: Corpus, service: Any) -> Prepared:
+    from nlu.preprocess import tokenize_and_map
+    syn_map = service.pipeline.syn_map
+    return (lambda text: tokenize_and_map(text, syn_map)), corpus.messages
+
+
+def _intent_detect(corpus: Corpus, service: Any) -> Prepared:
+    from nlu.preprocess import normalize_text
+    detector, syn_map = service.pipeline._intent_detector, service.pipeline.syn_map
+    return (lambda text: detector.detect(text, syn_map, normalize_text)), corpus.messages
+
+
+def _entity_extract(corpus: Corpus, service: Any) -> Prepared:
+    return service.pipeline._entity_extractor.extract, corpus.messages
+
+
+def _analyze(corpus: Corpus, service: Any) -> Prepared:
+    return service.pipeline.analyze, corpus.messages
+
+
+def _infer_major(corpus: Corpus, service: Any) -> Prepared:
+    from services.processors.utils import infer_major_from_message
+    return infer_major_from_message, corpus.messages
+
+
+def _find_standard_score(corpus: Corpus, service: Any) -> Prepared:
+    from services.processors.scores import find_standard_score
+    # Major names/codes the NLU step extracts from the corpus (what the handler receives), with and without a year
+    majors = sorted({e["text"] for message in corpus.messages for e in service.pipeline.analyze(message)["entities"]
+                     if e["label"] in MAJOR_LABELS})[:40]
+    inputs: List[Tuple[Optional[str], Optional[str]]] = [(None, "2024")]
+    inputs += [(major, year) for major in majors for year in ("2024", None)]
+    return (lambda args: find_standard_score(*args)), inputs
+
+
+def _suggest_majors(corpus: Corpus, service: Any) -> Prepared:
+    from services.processors.scores import suggest_majors_by_score
+    inputs: List[Dict[str, Any]] = []
+    for score in range(15, 30):
+        inputs.append({"diem_thpt": float(score), "nam": "2024"})
+        inputs.append({"diem_thpt": score + 0.5, "diem_tsa": 60.0 + score, "nam": "2025"})
+    return suggest_majors_by_score, inputs
+
+
+def _format_data(corpus: Corpus, service: Any) -> Prepared:
+    from services.processors.utils import format_data_to_text
+    # Real data returned by the handler for each corpus message
+    inputs = []
+    for message in corpus.messages:
+        response = service.handle_message(message, {})["response"]
+        if response.get("data") and response.get("type"):
+            inputs.append((response["data"], response["type"]))
+    return (lambda args: format_data_to_text(*args)), inputs
+
+
+def _handle_message(corpus: Corpus, service: Any) -> Prepared:
+    return (lambda text: service.handle_message(text, {})), corpus.messages
+
+
+CASES: Tuple[Case, ...] = (
+    Case("nlu.normalize_text", _normalize),
+    Case("nlu.normalize_text.cold", _normalize, _clear_nlu_caches),
+    Case("nlu.tokenize_and_map", _tokenize),
+    Case("nlu.tokenize_and_map.cold", _tokenize, _clear_nlu_caches),
+    Case("nlu.intent_detect", _intent_detect),
+    Case("nlu.entity_extract", _entity_extract),
+    Case("nlu.entity_extract.cold", _entity_extract, _clear_nlu_caches),
+    Case("nlu.pipeline_analyze", _analyze),
+    Case("nlu.pipeline_analyze.cold", _analyze, _clear_nlu_caches),
+    Case("data.infer_major_from_message", _infer_major),
+    Case("data.find_standard_score", _find_standard_score),
+    Case("data.suggest_majors_by_score", _suggest_majors),
+    Case("data.format_data_to_text", _format_data),
+    Case("service.handle_message", _handle_message),
+    Case("service.handle_message.cold", _handle_message, _clear_nlu_caches),
+)
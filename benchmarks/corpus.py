@@ -0,0 +1,74 @@
+"""
+Fixed query corpus for the benchmark suite.
+
+Utterances are sampled from data/intent.csv, stratified by intent, with a fixed
+seed, so every run (and every machine) times exactly the same queries. A few
+long multi-topic messages are appended: they are the ones that trigger the NER
+and dictionary double scan and tend to dominate tail latency.
+"""
+
+import csv
+import hashlib
+import os
+import random
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+from config import DATA_DIR
+
+DEFAULT_SIZE = 200
+DEFAULT_SEED = 20250101
+MIN_PER_INTENT = 2
+
+LONG_MESSAGES = (
+    "Cho em hỏi điểm chuẩn ngành Kiến trúc năm 2024 và học phí ngành Công nghệ thông tin "
+    "là bao nhiêu ạ, em thi khối A00 được 25 điểm thì có đỗ không?",
+    "Em muốn tìm hiểu về ngành Kỹ thuật xây dựng công trình giao thông, ngành này học những gì, "
+    "ra trường làm gì và chỉ tiêu tuyển sinh năm nay theo phương thức xét học bạ là bao nhiêu?",
+    "cho minh hoi nganh quan ly xay dung va nganh kinh te xay dung khac nhau the nao, "
+    "diem chuan 3 nam gan day va to hop xet tuyen cua tung nganh",
+)
+
+
+class Corpus(NamedTuple):
+    """Benchmark queries, their source intents and a content hash (to detect corpus changes)."""
+    messages: List[str]
+    intents: List[str]
+    digest: str
+
+
+def read_intent_utterances(path: str) -> Dict[str, List[str]]:
+    """Utterances of intent.csv grouped by intent (file order)."""
+    by_intent: Dict[str, List[str]] = defaultdict(list)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            utterance, intent = (row.get("utterance") or "").strip(), (row.get("intent") or "").strip()
+            if utterance and intent:
+                by_intent[intent].append(utterance)
+    return by_intent
+
+
+def load_corpus(size: int = DEFAULT_SIZE, seed: int = DEFAULT_SEED, data_dir: str = DATA_DIR) -> Corpus:
+    """
+    Sample a stratified, deterministic query corpus from intent.csv.
+
+    Each intent gets a share proportional to its frequency (at least MIN_PER_INTENT),
+    then LONG_MESSAGES are appended.
+    """
+    by_intent = read_intent_utterances(os.path.join(data_dir, "intent.csv"))
+    total = sum(len(v) for v in by_intent.values())
+    rng = random.Random(seed)
+    messages: List[str] = []
+    intents: List[str] = []
+    for intent in sorted(by_intent):
+        pool = sorted(set(by_intent[intent]))
+        k = min(len(pool), max(MIN_PER_INTENT, round(size * len(by_intent[intent]) / total)))
+        for utterance in rng.sample(pool, k):
+            messages.append(utterance)
+            intents.append(intent)
+    for message in LONG_MESSAGES:
+        messages.append(message)
+        intents.append("long_message")
+
+    digest = hashlib.sha1("\n".join(messages).encode("utf-8")).hexdigest()[:12]
+    return Corpus(messages, intents, digest)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run the NLU / data hot-path benchmarks and compare them against a stored baseline.
+
+Each case is timed call by call (time.perf_counter_ns, GC paused like timeit) over
+the fixed corpus for several rounds. Per round the median call time is taken; the
+compared figure ("best_us") is the fastest round, as timeit recommends: slower
+rounds mostly measure interference from other processes, not the code.
+
+    python -m benchmarks.run                         # run all, compare with benchmarks/baseline.json
+    python -m benchmarks.run --cases nlu.            # only cases whose name contains "nlu."
+    python -m benchmarks.run --output result.json    # also write the JSON results
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+
+Exit status is 1 when a case is slower than baseline * (1 + threshold). Thresholds
+come from the baseline file ("thresholds": {"default": ..., "<case>": ...}) and
+--threshold overrides the default. With --normalize, baseline numbers are first
+scaled by the ratio of the calibration loops, to compare runs from different
+machines.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.cases import CASES, Case  # noqa: E402
+from benchmarks.corpus import DEFAULT_SEED, DEFAULT_SIZE, Corpus, load_corpus  # noqa: E402
+
+SCHEMA_VERSION = 1
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def calibrate(rounds: int = 5) -> float:
+    """Median time (µs) of a fixed pure-Python loop: a rough speed unit of this machine."""
+    words = [f"w{i}" for i in range(200)]
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        table: Dict[str, int] = {}
+        for _ in range(50):
+            for word in words:
+                table[word] = table.get(word, 0) + len(word.upper())
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def _percentile(sorted_values: List[int], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class _Timer:
+    """Prepared case plus the samples collected so far."""
+
+    def __init__(self, case: Case, corpus: Corpus, service: Any) -> None:
+        self.case = case
+        self.service = service
+        self.func, self.inputs = case.prepare(corpus, service)
+        self.round_medians: List[float] = []
+        self.samples: List[int] = []
+
+    def warm_up(self) -> None:
+        """One untimed pass: loads lazy models, indexes and caches (for non-.cold cases)."""
+        for x in self.inputs:
+            if self.case.before_each:
+                self.case.before_each(self.service)
+            self.func(x)
+
+    def run_round(self, min_time: float) -> None:
+        func, before_each, service, clock = self.func, self.case.before_each, self.service, time.perf_counter_ns
+        if before_each is None:
+            self.warm_up()  # A .cold case run earlier has cleared the caches
+        round_samples: List[int] = []
+        deadline = time.perf_counter() + min_time
+        while True:
+            for x in self.inputs:
+                if before_each:
+                    before_each(service)
+                start = clock()
+                func(x)
+                round_samples.append(clock() - start)
+            if time.perf_counter() >= deadline:
+                break
+        self.round_medians.append(statistics.median(round_samples))
+        self.samples.extend(round_samples)
+
+    def result(self) -> Dict[str, Any]:
+        """Per-call figures in µs."""
+        if not self.samples:
+            return {"inputs": len(self.inputs), "calls": 0}
+        samples, medians = sorted(self.samples), self.round_medians
+        return {
+            "inputs": len(self.inputs),
+            "calls": len(samples),
+            "best_us": round(min(medians) / 1000, 3),
+            "median_us": round(statistics.median(medians) / 1000, 3),
+            "mean_us": round(statistics.fmean(samples) / 1000, 3),
+            "p95_us": round(_percentile(samples, 0.95) / 1000, 3),
+            "p99_us": round(_percentile(samples, 0.99) / 1000, 3),
+            "min_us": round(samples[0] / 1000, 3),
+            "round_spread": round((max(medians) - min(medians)) / max(min(medians), 1), 3),
+        }
+
+
+def measure(cases: Sequence[Case], corpus: Corpus, service: Any, rounds: int, min_time: float,
+            progress: Optional[Any] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Time the cases with interleaved rounds: round r runs every case once before round r+1.
+
+    Each case's rounds are thus spread over the whole run, so a slow stretch of the
+    machine hurts one round of many cases instead of every round of one case.
+    """
+    timers = [_Timer(case, corpus, service) for case in cases]
+    for timer in timers:
+        timer.warm_up()
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for r in range(rounds):
+            for timer in timers:
+                if timer.inputs:
+                    timer.run_round(min_time)
+            if progress:
+                progress(r + 1, rounds)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {timer.case.name: timer.result() for timer in timers}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                             timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run(case_filters: Sequence[str] = (), rounds: int = 7, min_time: float = 0.05,
+        corpus_size: int = DEFAULT_SIZE, seed: int = DEFAULT_SEED,
+        progress: Optional[Any] = None) -> Dict[str, Any]:
+    """Run the selected cases and return the JSON-serialisable results."""
+    from services.nlp_service import get_nlp_service
+
+    corpus = load_corpus(corpus_size, seed)
+    service = get_nlp_service()
+    service.warm_up()
+    selected = [c for c in CASES if not case_filters or any(f in c.name for f in case_filters)]
+
+    results = measure(selected, corpus, service, rounds, min_time, progress)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "git_commit": _git_commit(),
+        },
+        "corpus": {"size": len(corpus.messages), "seed": seed, "digest": corpus.digest},
+        "settings": {"rounds": rounds, "min_time": min_time},
+        "calibration_us": round(calibrate(), 3),
+        "cases": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: Optional[float] = None,
+            normalize: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compare best_us of each case with the baseline.
+
+    Returns one row per case: name, baseline_us, current_us, ratio, threshold and
+    status ("ok", "regression", "improved", "new" or "missing").
+    """
+    thresholds = dict(baseline.get("thresholds") or {})
+    default = threshold if threshold is not None else thresholds.get("default", DEFAULT_THRESHOLD)
+    scale = 1.0
+    if normalize and baseline.get("calibration_us") and current.get("calibration_us"):
+        scale = current["calibration_us"] / baseline["calibration_us"]
+
+    rows = []
+    base_cases, cur_cases = baseline.get("cases", {}), current.get("cases", {})
+    for name in list(cur_cases) + [n for n in base_cases if n not in cur_cases]:
+        limit = thresholds.get(name, default) if threshold is None else threshold
+        cur, base = cur_cases.get(name, {}).get("best_us"), base_cases.get(name, {}).get("best_us")
+        row = {"name": name, "baseline_us": base, "current_us": cur, "ratio": None, "threshold": limit}
+        if cur is None:
+            row["status"] = "missing"
+        elif base is None:
+            row["status"] = "new"
+        else:
+            ratio = cur / (base * scale) if base else float("inf")
+            row["ratio"] = round(ratio, 3)
+            row["status"] = ("regression" if ratio > 1 + limit
+                             else "improved" if ratio < 1 / (1 + limit) else "ok")
+        rows.append(row)
+    return rows
+
+
+def _print_comparison(rows: List[Dict[str, Any]]) -> None:
+    print(f"\n{'case':<34} {'baseline µs':>12} {'current µs':>11} {'ratio':>7}  status")
+    for row in rows:
+        base = "-" if row["baseline_us"] is None else f"{row['baseline_us']:.2f}"
+        cur = "-" if row["current_us"] is None else f"{row['current_us']:.2f}"
+        ratio = "-" if row["ratio"] is None else f"{row['ratio']:.2f}"
+        flag = f"{row['status']} (> +{row['threshold']:.0%})" if row["status"] == "regression" else row["status"]
+        print(f"{row['name']:<34} {base:>12} {cur:>11} {ratio:>7}  {flag}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", nargs="*", default=[], help="substrings of case names to run (default: all)")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per case per round")
+    parser.add_argument("--corpus-size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--no-compare", action="store_true")
+    parser.add_argument("--save-baseline", metavar="FILE",
+                        help="write the results as a new baseline (keeps existing thresholds)")
+    parser.add_argument("--threshold", type=float, help="allowed slowdown ratio for every case, e.g. 0.25")
+    parser.add_argument("--normalize", action="store_true",
+                        help="scale baseline by the calibration loop ratio (different machines)")
+    parser.add_argument("--list", action="store_true", help="list case names and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(case.name for case in CASES))
+        return 0
+
+    logging.basicConfig(level=logging.WARNING)
+
+    def progress(done: int, total: int) -> None:
+        print(f"round {done}/{total}", file=sys.stderr, flush=True)
+
+    results = run(args.cases, args.rounds, args.min_time, args.corpus_size, args.seed, progress)
+    print(f"\n{'case':<34} {'best µs':>10} {'median µs':>10} {'p95 µs':>10} {'p99 µs':>10} {'calls':>8}")
+    for name, result in results["cases"].items():
+        if not result.get("calls"):
+            print(f"{name:<34} skipped (no inputs)")
+            continue
+        print(f"{name:<34} {result['best_us']:>10.2f} {result['median_us']:>10.2f} {result['p95_us']:>10.2f} "
+              f"{result['p99_us']:>10.2f} {result['calls']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        thresholds = {"default": DEFAULT_THRESHOLD}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, "r", encoding="utf-8") as f:
+                thresholds = json.load(f).get("thresholds", thresholds)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({**results, "thresholds": thresholds}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.no_compare or args.save_baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("corpus", {}).get("digest") != results["corpus"]["digest"]:
+        print("\nwarning: corpus differs from the baseline (intent.csv, --corpus-size or --seed changed)")
+    rows = compare(results, baseline, args.threshold, args.normalize)
+    if args.cases:  # Partial run: do not list the cases that were not selected
+        rows = [row for row in rows if row["status"] != "missing"]
+    _print_comparison(rows)
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,32 @@ from typing import List
 # Đường dẫn
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
+ARTIFACT_DIR_DEFAULT = os.path.join(BASE_DIR, "artifacts")
 
 # Tham số mặc định
 INTENT_THRESHOLD_DEFAULT: float = 0.25
+INTENT_SCORING_ENGINE_DEFAULT: str = "sparse"
+INTENT_MODEL_CACHE_DEFAULT: bool = True
+INTENT_BACKOFF_MODE_DEFAULT: str = "priority"
 CONTEXT_HISTORY_LIMIT_DEFAULT: int = 10
+CONTEXT_MAX_SESSIONS_DEFAULT: int = 10000
+CONTEXT_TTL_SECONDS_DEFAULT: float = 3600.0
+CONTEXT_MAX_MEMORY_MB_DEFAULT: float = 256.0
+CONTEXT_SWEEP_INTERVAL_SECONDS_DEFAULT: float = 60.0
+CONTEXT_CONFLICT_RETRIES_DEFAULT: int = 2
+CONTEXT_BACKEND_DEFAULT: str = "memory"
+CONTEXT_SQLITE_PATH_DEFAULT = os.path.join(BASE_DIR, "artifacts", "context.sqlite3")
+CONTEXT_REDIS_URL_DEFAULT: str = "redis://localhost:6379/0"
+TEXT_CACHE_SIZE_DEFAULT: int = 4096
+NER_MODE_DEFAULT: str = "auto"
+NER_NEEDED_LABELS_DEFAULT: List[str] = ["TEN_NGANH", "CHUYEN_NGANH", "MA_NGANH"]
+NER_TIME_BUDGET_MS_DEFAULT: float = 50.0
+NER_CACHE_SIZE_DEFAULT: int = 1024
+NLP_EXECUTOR_MODE_DEFAULT: str = "thread"
+NLP_EXECUTOR_WORKERS_DEFAULT: int = 4
+NLP_EXECUTOR_MAX_PENDING_DEFAULT: int = 64
+NLP_INIT_MODE_DEFAULT: str = "eager"
+NLP_INIT_WAIT_SECONDS_DEFAULT: float = 5.0
 
 SERVER_HOST_DEFAULT: str = "0.0.0.0"
 SERVER_PORT_DEFAULT: int = 8000
@@ -30,6 +52,19 @@ CORS_ALLOW_CREDENTIALS_DEFAULT: bool = True
 
 MAX_RESULTS_DEFAULT: int = 100
 MAX_SUGGESTIONS_DEFAULT: int = 20
+BATCH_MAX_ITEMS_DEFAULT: int = 100
+
+RATE_LIMIT_REQUESTS_DEFAULT: int = 100
+RATE_LIMIT_WINDOW_SECONDS_DEFAULT: float = 60.0
+RATE_LIMIT_ROUTES_DEFAULT: str = ""
+RATE_LIMIT_BACKEND_DEFAULT: str = "memory"
+RATE_LIMIT_MAX_CLIENTS_DEFAULT: int = 100000
+
+HEALTH_REFRESH_INTERVAL_SECONDS_DEFAULT: float = 10.0
+METRICS_ENABLED_DEFAULT: bool = True
+PROFILE_SAMPLE_RATE_DEFAULT: int = 0
+PROFILE_DIR_DEFAULT = os.path.join(BASE_DIR, "artifacts", "profiles")
+PROFILE_MAX_FILES_DEFAULT: int = 50
 
 
 # Getter functions
@@ -37,6 +72,48 @@ def get_intent_threshold() -> float:
     return float(os.getenv("INTENT_THRESHOLD", INTENT_THRESHOLD_DEFAULT))
 
 
+def get_intent_scoring_engine() -> str:
+    """
+    Lấy engine tính điểm intent từ environment hoặc mặc định.
+
+    Returns:
+        str: "sparse" (ma trận CSR, cần NumPy) hoặc "dict", mặc định "sparse"
+    """
+    return os.getenv("INTENT_SCORING_ENGINE", INTENT_SCORING_ENGINE_DEFAULT).strip().lower()
+
+
+def get_intent_backoff_mode() -> str:
+    """
+    Lấy quy tắc chọn keyword backoff khi TF-IDF không đạt ngưỡng.
+
+    Returns:
+        str: "priority" (thứ tự khai báo, giống hành vi cũ; alias "compat")
+            hoặc "longest" (keyword dài nhất), mặc định "priority"
+    """
+    return os.getenv("INTENT_BACKOFF_MODE", INTENT_BACKOFF_MODE_DEFAULT).strip().lower()
+
+
+def get_intent_model_cache_enabled() -> bool:
+    """
+    Bật/tắt việc dùng intent model đã biên dịch sẵn (artifact) khi khởi động.
+
+    Returns:
+        bool: Mặc định True
+    """
+    enabled_str = os.getenv("INTENT_MODEL_CACHE", str(INTENT_MODEL_CACHE_DEFAULT)).lower()
+    return enabled_str in ("true", "1", "yes", "on")
+
+
+def get_artifact_dir() -> str:
+    """
+    Lấy thư mục chứa các artifact biên dịch sẵn (intent model).
+
+    Returns:
+        str: Đường dẫn thư mục, mặc định <backend>/artifacts
+    """
+    return os.getenv("ARTIFACT_DIR", ARTIFACT_DIR_DEFAULT)
+
+
 def get_context_history_limit() -> int:
     """
     Lấy giới hạn độ dài lịch sử hội thoại từ environment hoặc mặc định.
@@ -47,6 +124,193 @@ def get_context_history_limit() -> int:
     return int(os.getenv("CONTEXT_HISTORY_LIMIT", CONTEXT_HISTORY_LIMIT_DEFAULT))
 
 
+def get_context_max_sessions() -> int:
+    """
+    Lấy số session tối đa được lưu context từ environment hoặc mặc định.
+
+    Returns:
+        int: Vượt quá thì loại session lâu nhất không dùng (LRU), 0 = không giới hạn, mặc định 10000
+    """
+    return int(os.getenv("CONTEXT_MAX_SESSIONS", CONTEXT_MAX_SESSIONS_DEFAULT))
+
+
+def get_context_ttl_seconds() -> float:
+    """
+    Lấy thời gian (giây) session không hoạt động trước khi bị xóa từ environment hoặc mặc định.
+
+    Returns:
+        float: 0 = không hết hạn, mặc định 3600
+    """
+    return float(os.getenv("CONTEXT_TTL_SECONDS", CONTEXT_TTL_SECONDS_DEFAULT))
+
+
+def get_context_max_memory_mb() -> float:
+    """
+    Lấy tổng dung lượng (MB, ước tính) tối đa của context mọi session từ environment hoặc mặc định.
+
+    Returns:
+        float: 0 = không giới hạn, mặc định 256
+    """
+    return float(os.getenv("CONTEXT_MAX_MEMORY_MB", CONTEXT_MAX_MEMORY_MB_DEFAULT))
+
+
+def get_context_sweep_interval_seconds() -> float:
+    """
+    Lấy chu kỳ (giây) quét xóa session hết hạn từ environment hoặc mặc định.
+
+    Returns:
+        float: Mặc định 60
+    """
+    return float(os.getenv("CONTEXT_SWEEP_INTERVAL_SECONDS", CONTEXT_SWEEP_INTERVAL_SECONDS_DEFAULT))
+
+
+def get_context_conflict_retries() -> int:
+    """
+    Lấy số lần xử lý lại 1 câu hỏi khi context của session bị request khác ghi đồng thời.
+
+    Returns:
+        int: Hết số lần thử thì trả về HTTP 409, mặc định 2
+    """
+    return max(0, int(os.getenv("CONTEXT_CONFLICT_RETRIES", CONTEXT_CONFLICT_RETRIES_DEFAULT)))
+
+
+def get_context_backend() -> str:
+    """
+    Lấy backend lưu context hội thoại từ environment hoặc mặc định.
+
+    Returns:
+        str: "memory" (RAM của 1 process), "sqlite" (file dùng chung giữa các worker trên 1 máy)
+             hoặc "redis" (dùng chung giữa nhiều máy), mặc định "memory"
+    """
+    return os.getenv("CONTEXT_BACKEND", CONTEXT_BACKEND_DEFAULT).strip().lower()
+
+
+def get_context_sqlite_path() -> str:
+    """
+    Lấy đường dẫn file SQLite cho backend context "sqlite" từ environment hoặc mặc định.
+
+    Returns:
+        str: Mặc định artifacts/context.sqlite3
+    """
+    return os.getenv("CONTEXT_SQLITE_PATH", CONTEXT_SQLITE_PATH_DEFAULT)
+
+
+def get_context_redis_url() -> str:
+    """
+    Lấy URL Redis cho backend context "redis" từ environment hoặc mặc định.
+
+    Returns:
+        str: Dạng redis://[user:password@]host:port/db, mặc định "redis://localhost:6379/0"
+    """
+    return os.getenv("CONTEXT_REDIS_URL", CONTEXT_REDIS_URL_DEFAULT)
+
+
+def get_text_cache_size() -> int:
+    """
+    Lấy kích thước cache chuẩn hóa/tách từ từ environment hoặc mặc định.
+
+    Returns:
+        int: Số câu tối đa mỗi cache giữ lại, 0 để tắt cache, mặc định 4096
+    """
+    return int(os.getenv("TEXT_CACHE_SIZE", TEXT_CACHE_SIZE_DEFAULT))
+
+
+def get_ner_mode() -> str:
+    """
+    Lấy chế độ chạy NER (Underthesea) từ environment hoặc mặc định.
+
+    Returns:
+        str: "auto" (chỉ chạy khi pattern/dictionary không tìm thấy nhãn cần thiết),
+             "always" hoặc "off", mặc định "auto"
+    """
+    return os.getenv("NER_MODE", NER_MODE_DEFAULT).strip().lower()
+
+
+def get_ner_needed_labels() -> List[str]:
+    """
+    Lấy danh sách nhãn cần thiết cho chế độ NER "auto" (ngăn cách bởi dấu phẩy).
+
+    Returns:
+        List[str]: NER chỉ chạy khi chưa tìm thấy nhãn nào trong danh sách này ("*" = mọi nhãn)
+    """
+    labels_str = os.getenv("NER_NEEDED_LABELS")
+    if labels_str:
+        return [label.strip().upper() for label in labels_str.split(",") if label.strip()]
+    return NER_NEEDED_LABELS_DEFAULT
+
+
+def get_ner_time_budget_ms() -> float:
+    """
+    Lấy ngân sách thời gian (ms) cho bước NER của mỗi câu hỏi.
+
+    Returns:
+        float: NER bị bỏ qua nếu thời gian ước tính vượt ngân sách, 0 = không giới hạn
+    """
+    return float(os.getenv("NER_TIME_BUDGET_MS", NER_TIME_BUDGET_MS_DEFAULT))
+
+
+def get_ner_cache_size() -> int:
+    """
+    Lấy kích thước cache kết quả NER từ environment hoặc mặc định.
+
+    Returns:
+        int: Số câu tối đa được cache, 0 để tắt cache, mặc định 1024
+    """
+    return int(os.getenv("NER_CACHE_SIZE", NER_CACHE_SIZE_DEFAULT))
+
+
+def get_nlp_executor_mode() -> str:
+    """
+    Lấy chế độ chạy xử lý NLP ngoài event loop từ environment hoặc mặc định.
+
+    Returns:
+        str: "thread" (thread pool), "process" (process pool, tránh GIL)
+             hoặc "inline" (chạy trực tiếp trên event loop), mặc định "thread"
+    """
+    return os.getenv("NLP_EXECUTOR_MODE", NLP_EXECUTOR_MODE_DEFAULT).strip().lower()
+
+
+def get_nlp_executor_workers() -> int:
+    """
+    Lấy số worker của executor NLP từ environment hoặc mặc định.
+
+    Returns:
+        int: Số thread/process, mặc định 4
+    """
+    return int(os.getenv("NLP_EXECUTOR_WORKERS", NLP_EXECUTOR_WORKERS_DEFAULT))
+
+
+def get_nlp_executor_max_pending() -> int:
+    """
+    Lấy số tác vụ NLP tối đa đang chờ/đang chạy từ environment hoặc mặc định.
+
+    Returns:
+        int: Vượt quá giới hạn này request bị từ chối ngay với HTTP 503, mặc định 64
+    """
+    return int(os.getenv("NLP_EXECUTOR_MAX_PENDING", NLP_EXECUTOR_MAX_PENDING_DEFAULT))
+
+
+def get_nlp_init_mode() -> str:
+    """
+    Lấy chế độ khởi tạo NLPService khi server khởi động từ environment hoặc mặc định.
+
+    Returns:
+        str: "eager" (dựng + warm-up xong mới nhận request) hoặc "background" (nhận kết nối ngay,
+             /readyz báo chưa sẵn sàng trong lúc dựng + warm-up ở thread nền), mặc định "eager"
+    """
+    return os.getenv("NLP_INIT_MODE", NLP_INIT_MODE_DEFAULT).strip().lower()
+
+
+def get_nlp_init_wait_seconds() -> float:
+    """
+    Lấy thời gian tối đa 1 request chờ NLPService khởi tạo xong (chế độ background).
+
+    Returns:
+        float: Quá thời gian này trả về HTTP 503 (SERVICE_NOT_READY), mặc định 5 giây
+    """
+    return max(0.0, float(os.getenv("NLP_INIT_WAIT_SECONDS", NLP_INIT_WAIT_SECONDS_DEFAULT)))
+
+
 def get_server_host() -> str:
     """
     Lấy host cho server từ environment hoặc mặc định.
@@ -114,3 +378,135 @@ def get_max_results() -> int:
 
 def get_max_suggestions() -> int:
     return int(os.getenv("MAX_SUGGESTIONS", MAX_SUGGESTIONS_DEFAULT))
+
+
+def get_batch_max_items() -> int:
+    """
+    Lấy số câu hỏi tối đa trong 1 request /chat/batch từ environment hoặc mặc định.
+
+    Returns:
+        int: Số câu hỏi tối đa, mặc định 100
+    """
+    return int(os.getenv("BATCH_MAX_ITEMS", BATCH_MAX_ITEMS_DEFAULT))
+
+
+def get_rate_limit_requests() -> int:
+    """
+    Lấy số request tối đa mỗi client trong 1 cửa sổ (rule mặc định) từ environment hoặc mặc định.
+
+    Returns:
+        int: Số request, mặc định 100
+    """
+    return max(1, int(os.getenv("RATE_LIMIT_REQUESTS", RATE_LIMIT_REQUESTS_DEFAULT)))
+
+
+def get_rate_limit_window_seconds() -> float:
+    """
+    Lấy độ dài cửa sổ giới hạn request (giây) từ environment hoặc mặc định.
+
+    Returns:
+        float: Số giây, mặc định 60
+    """
+    return max(0.001, float(os.getenv("RATE_LIMIT_WINDOW_SECONDS", RATE_LIMIT_WINDOW_SECONDS_DEFAULT)))
+
+
+def get_rate_limit_routes() -> str:
+    """
+    Lấy giới hạn riêng theo route từ environment hoặc mặc định.
+
+    Returns:
+        str: Dạng "/chat/batch=10/60,/chat/advanced=60/60" (tiền tố route=số request/số giây),
+             mặc định rỗng (mọi route dùng rule mặc định)
+    """
+    return os.getenv("RATE_LIMIT_ROUTES", RATE_LIMIT_ROUTES_DEFAULT)
+
+
+def get_rate_limit_backend() -> str:
+    """
+    Lấy backend đếm request từ environment hoặc mặc định.
+
+    Returns:
+        str: "memory" (riêng từng worker) hoặc "redis" (dùng chung giữa các worker/máy), mặc định "memory"
+    """
+    return os.getenv("RATE_LIMIT_BACKEND", RATE_LIMIT_BACKEND_DEFAULT).strip().lower()
+
+
+def get_rate_limit_max_clients() -> int:
+    """
+    Lấy số client tối đa backend memory theo dõi cùng lúc từ environment hoặc mặc định.
+
+    Returns:
+        int: Vượt quá thì xóa client lâu nhất không gửi request, mặc định 100000
+    """
+    return max(1, int(os.getenv("RATE_LIMIT_MAX_CLIENTS", RATE_LIMIT_MAX_CLIENTS_DEFAULT)))
+
+
+def get_rate_limit_redis_url() -> str:
+    """
+    Lấy URL Redis cho backend rate limit "redis" từ environment.
+
+    Returns:
+        str: Mặc định dùng chung CONTEXT_REDIS_URL
+    """
+    return os.getenv("RATE_LIMIT_REDIS_URL") or get_context_redis_url()
+
+
+def get_health_refresh_interval_seconds() -> float:
+    """
+    Lấy chu kỳ (giây) cập nhật snapshot trạng thái cho /readyz từ environment hoặc mặc định.
+
+    Returns:
+        float: Số giây, mặc định 10
+    """
+    return max(0.1, float(os.getenv("HEALTH_REFRESH_INTERVAL_SECONDS", HEALTH_REFRESH_INTERVAL_SECONDS_DEFAULT)))
+
+
+def get_metrics_enabled() -> bool:
+    """
+    Lấy cờ bật/tắt đo thời gian từng bước (histogram cho /metrics) từ environment hoặc mặc định.
+
+    Returns:
+        bool: Mặc định True
+    """
+    enabled_str = os.getenv("METRICS_ENABLED", str(METRICS_ENABLED_DEFAULT)).lower()
+    return enabled_str in ("true", "1", "yes", "on")
+
+
+def get_profile_sample_rate() -> int:
+    """
+    Lấy tần suất lấy mẫu profile cho /chat/advanced (1 trên N request) từ environment hoặc mặc định.
+
+    Returns:
+        int: N, mặc định 0 (chỉ profile khi có header X-Debug-Profile)
+    """
+    return max(0, int(os.getenv("PROFILE_SAMPLE_RATE", PROFILE_SAMPLE_RATE_DEFAULT)))
+
+
+def get_profile_token() -> str:
+    """
+    Lấy token cho header X-Debug-Profile và các endpoint /admin/profiles từ environment.
+
+    Returns:
+        str: Mặc định rỗng (tắt header debug và endpoint admin)
+    """
+    return os.getenv("PROFILE_TOKEN", "")
+
+
+def get_profile_dir() -> str:
+    """
+    Lấy thư mục lưu file profile từ environment hoặc mặc định.
+
+    Returns:
+        str: Mặc định artifacts/profiles
+    """
+    return os.getenv("PROFILE_DIR", PROFILE_DIR_DEFAULT)
+
+
+def get_profile_max_files() -> int:
+    """
+    Lấy số file profile tối đa được giữ lại (xóa file cũ nhất khi vượt) từ environment hoặc mặc định.
+
+    Returns:
+        int: Mặc định 50
+    """
+    return max(1, int(os.getenv("PROFILE_MAX_FILES", PROFILE_MAX_FILES_DEFAULT)))
@@ -75,6 +75,9 @@ from .api_exceptions import (
     APIException,
     ValidationError,
     RateLimitError,
+    ServiceOverloadedError,
+    ServiceNotReadyError,
+    ContextConflictError,
     AuthenticationError,
     ResourceNotFoundError,
 )
@@ -99,6 +102,9 @@ __all__ = [
     "APIException",
     "ValidationError",
     "RateLimitError",
+    "ServiceOverloadedError",
+    "ServiceNotReadyError",
+    "ContextConflictError",
     "AuthenticationError",
     "ResourceNotFoundError",
 ]
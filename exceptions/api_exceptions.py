@@ -70,6 +70,71 @@ class RateLimitError(APIException):
         )
 
 
+class ServiceOverloadedError(APIException):
+    """Lỗi khi hàng đợi xử lý đã đầy (server quá tải)."""
+
+    def __init__(
+            self,
+            message: str = "Hệ thống đang quá tải, vui lòng thử lại sau",
+            max_pending: Optional[int] = None,
+            retry_after: Optional[int] = None
+    ):
+        details = {
+            "max_pending": max_pending,
+            "retry_after": retry_after
+        }
+        super().__init__(
+            message,
+            error_code="SERVICE_OVERLOADED",
+            status_code=503,
+            details={k: v for k, v in details.items() if v is not None}
+        )
+
+
+class ServiceNotReadyError(APIException):
+    """Lỗi khi NLP service chưa khởi tạo xong (đang warm-up ở thread nền)."""
+
+    def __init__(
+            self,
+            message: str = "Hệ thống đang khởi động, vui lòng thử lại sau",
+            state: Optional[str] = None,
+            retry_after: Optional[int] = None
+    ):
+        details = {
+            "state": state,
+            "retry_after": retry_after
+        }
+        super().__init__(
+            message,
+            error_code="SERVICE_NOT_READY",
+            status_code=503,
+            details={k: v for k, v in details.items() if v is not None}
+        )
+
+
+class ContextConflictError(APIException):
+    """Lỗi khi context của session đã bị request khác thay đổi (ghi đồng thời)."""
+
+    def __init__(
+            self,
+            message: str = "Hội thoại đang được cập nhật bởi yêu cầu khác, vui lòng thử lại",
+            session_id: Optional[str] = None,
+            expected_version: Optional[int] = None,
+            current_version: Optional[int] = None
+    ):
+        details = {
+            "session_id": session_id,
+            "expected_version": expected_version,
+            "current_version": current_version
+        }
+        super().__init__(
+            message,
+            error_code="CONTEXT_CONFLICT",
+            status_code=409,
+            details={k: v for k, v in details.items() if v is not None}
+        )
+
+
 class AuthenticationError(APIException):
     """Lỗi xác thực."""
 
@@ -112,6 +177,8 @@ __all__ = [
     "APIException",
     "ValidationError",
     "RateLimitError",
+    "ServiceOverloadedError",
+    "ContextConflictError",
     "AuthenticationError",
     "ResourceNotFoundError"
 ]
@@ -1,6 +1,6 @@
 """NLP Exceptions - Lỗi xử lý ngôn ngữ tự nhiên."""
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 from . import ChatbotException
 
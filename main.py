@@ -4,22 +4,35 @@ import warnings
 
 warnings.filterwarnings("ignore", category=SyntaxWarning)
 
+import asyncio
 import logging
 import os
-import uuid
-from datetime import datetime
-from collections import defaultdict
-from time import time
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
-from config import get_cors_origins, get_cors_allow_credentials, get_log_level
+from config import (get_cors_origins, get_cors_allow_credentials, get_log_level, get_context_conflict_retries,
+                    get_nlp_init_mode, get_nlp_init_wait_seconds)
 from constants import Validation, ErrorMessage, SuccessMessage
-from exceptions import ChatbotException, APIException, NLPException, DataException
-from models import AdvancedChatRequest, ContextRequest, create_success_response
-from services.nlp_service import get_nlp_service
+from exceptions import (ChatbotException, APIException, NLPException, DataException, ContextConflictError,
+                        ServiceNotReadyError)
+from models import (AdvancedChatRequest, BatchChatRequest, ContextRequest, ProfileSamplingRequest,
+                    create_success_response)
+from services.context_store import export_context
+from services.executor import EXECUTOR_MODE_PROCESS, NLPExecutor, get_nlp_executor, shutdown_nlp_executor
+from services.health import HealthMonitor
+from services.middleware import GatewayMiddleware
+from services.nlp_service import NLPService, get_nlp_service, peek_nlp_service
+from services.profiler import ADMIN_TOKEN_HEADER, PROFILE_HEADER, PROFILE_ID_HEADER, RequestProfiler
+from services.rate_limiter import create_rate_limiter
+from utils.metrics import REGISTRY, process_rss_bytes, span
+from utils.startup import STARTUP, STATE_FAILED, STATE_READY, STATE_WARMING
 
 # Logging setup
 log_dir = os.path.join(os.path.dirname(__file__), "logs")
@@ -37,8 +50,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+NLP_INIT_MODE_EAGER = "eager"
+NLP_INIT_MODE_BACKGROUND = "background"
+
+
+def _init_nlp(executor: NLPExecutor) -> None:
+    """
+    Dựng + warm-up NLPService, khởi động executor và sweeper của context store.
+
+    Chế độ process: executor.start() tự dựng + warm-up rồi mới fork worker.
+    Lỗi được ghi vào timeline khởi động (/readyz báo failed) rồi raise lại.
+    """
+    STARTUP.set_state(STATE_WARMING)
+    health.refresh()
+    started = time.perf_counter()
+    try:
+        executor.start()
+        nlp = get_nlp_service()
+        if executor.mode != EXECUTOR_MODE_PROCESS:
+            nlp.warm_up()
+        nlp.context_store.start_sweeper()
+    except Exception as e:
+        STARTUP.set_state(STATE_FAILED, f"{type(e).__name__}: {e}")
+        health.refresh()
+        raise
+    STARTUP.set_state(STATE_READY)
+    health.refresh()
+    logger.info(f"NLP Service đã khởi tạo + warm-up xong ({time.perf_counter() - started:.2f}s)")
+
+
+def _init_nlp_background(executor: NLPExecutor) -> None:
+    try:
+        _init_nlp(executor)
+    except Exception as e:
+        logger.error(f"Khởi tạo NLP Service lỗi: {e}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor = get_nlp_executor()
+    mode = get_nlp_init_mode()
+    # Không fork worker từ thread nền: chế độ process luôn khởi tạo eager
+    if mode == NLP_INIT_MODE_BACKGROUND and executor.mode != EXECUTOR_MODE_PROCESS:
+        threading.Thread(target=_init_nlp_background, args=(executor,), name="nlp-init", daemon=True).start()
+    else:
+        if mode != NLP_INIT_MODE_EAGER:
+            logger.warning(f"NLP_INIT_MODE={mode!r} không áp dụng được (executor {executor.mode}), dùng eager")
+        _init_nlp(executor)
+    health.start()
+    yield
+    health.stop()
+    nlp = peek_nlp_service()
+    if nlp is not None:
+        nlp.context_store.stop_sweeper()
+    shutdown_nlp_executor()
+
+
 # FastAPI app
-app = FastAPI(title="HUCE Chatbot API", version="1.0.0")
+app = FastAPI(title="HUCE Chatbot API", version="1.0.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -49,60 +119,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Rate limiting
-request_counts = defaultdict(list)
-RATE_LIMIT_REQUESTS = 100
-RATE_LIMIT_WINDOW = 60
-
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    client_ip = request.client.host
-    current_time = time()
-
-    request_counts[client_ip] = [
-        req_time for req_time in request_counts[client_ip]
-        if current_time - req_time < RATE_LIMIT_WINDOW
-    ]
-
-    if len(request_counts[client_ip]) >= RATE_LIMIT_REQUESTS:
-        return JSONResponse(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            content={
-                "success": False,
-                "error_code": "RATE_LIMIT_EXCEEDED",
-                "error_message": "Quá nhiều yêu cầu. Vui lòng thử lại sau.",
-                "retry_after": RATE_LIMIT_WINDOW,
-            }
-        )
-
-    request_counts[client_ip].append(current_time)
-    response = await call_next(request)
-    return response
-
-
-@app.middleware("http")
-async def add_request_id_middleware(request: Request, call_next):
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-    return response
-
-
-@app.middleware("http")
-async def add_security_headers_middleware(request: Request, call_next):
-    response = await call_next(request)
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    return response
+# Rate limiting (sliding window counter, giới hạn theo route trong RATE_LIMIT_ROUTES)
+rate_limiter = create_rate_limiter()
+
+# Request ID + rate limit + security headers: 1 middleware ASGI thuần, nằm ngoài CORS
+app.add_middleware(GatewayMiddleware, get_rate_limiter=lambda: rate_limiter)
 
 
 logger.info("HUCE Chatbot API Server đang khởi động...")
-nlp = get_nlp_service()
-logger.info("NLP Service đã khởi tạo thành công")
+# NLPService không được dựng lúc import: lifespan dựng (eager/background) hoặc request đầu tiên dựng
+health = HealthMonitor(peek_nlp_service, startup=STARTUP)
+health.refresh()
+
+# Profile theo từng request (header X-Debug-Profile hoặc lấy mẫu 1/N)
+profiler = RequestProfiler()
+
+INTENT_TOTAL = REGISTRY.counter("huce_intent_total", "Số câu hỏi đã trả lời theo intent", ("intent",))
+
+
+async def _get_nlp() -> NLPService:
+    """
+    NLPService cho endpoint: đang warm-up nền thì chờ tối đa NLP_INIT_WAIT_SECONDS,
+    quá thời gian hoặc khởi tạo lỗi thì HTTP 503. Chưa có lifespan (vd: test) thì dựng ngay.
+    """
+    deadline = time.monotonic() + get_nlp_init_wait_seconds()
+    while STARTUP.state == STATE_WARMING and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if STARTUP.state in (STATE_WARMING, STATE_FAILED):
+        raise ServiceNotReadyError(state=STARTUP.state, retry_after=1)
+    nlp = peek_nlp_service()
+    if nlp is None:
+        nlp = await asyncio.to_thread(get_nlp_service)
+    return nlp
+
+
+async def _context_io(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Gọi thao tác context store từ handler async.
+
+    Backend sqlite/redis có I/O chặn nên chạy trong thread (như RedisRateLimiter.hit_async), để
+    event loop vẫn phục vụ request khác và writer của SQLite gộp được ghi của nhiều request.
+    Backend memory chạy thẳng trên event loop.
+    """
+    nlp = peek_nlp_service()
+    if nlp is not None and not nlp.context_store.blocking:
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+def _numeric_families(prefix: str, documentation: str, stats: dict, labels: Optional[dict] = None):
+    """Chuyển các giá trị số trong dict thống kê thành metric gauge {prefix}_{key}."""
+    return [(f"{prefix}_{key}", "gauge", f"{documentation}: {key}", [(labels or {}, value)])
+            for key, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+def _collect_runtime_metrics():
+    """Giá trị tức thời cho /metrics: RSS, cache, executor, context store, rate limiter."""
+    families = []
+    rss = process_rss_bytes()
+    if rss is not None:
+        families.append(("huce_process_resident_memory_bytes", "gauge", "RSS của process chính", [({}, rss)]))
+
+    families.extend(_numeric_families("huce_executor", "NLP executor", get_nlp_executor().get_stats()))
+    families.extend(_numeric_families("huce_rate_limit", "Rate limiter", rate_limiter.get_stats()))
+    families.extend(_numeric_families("huce_profiler", "Request profiler", profiler.get_stats()))
+    nlp = peek_nlp_service()
+    if nlp is None:  # Chưa dựng xong: không ép dựng chỉ để lấy metrics
+        return families
+
+    caches = dict(nlp.pipeline.text_cache_stats())
+    ner_stats = nlp.pipeline.ner_stats()
+    if ner_stats.get("cache"):
+        caches["ner"] = ner_stats["cache"]
+    for name, kind, key in (("huce_cache_hits_total", "counter", "hits"),
+                            ("huce_cache_misses_total", "counter", "misses"),
+                            ("huce_cache_hit_ratio", "gauge", "hit_rate"),
+                            ("huce_cache_size", "gauge", "size")):
+        families.append((name, kind, f"Cache {key} theo tên cache",
+                         [({"cache": cache}, stats.get(key, 0)) for cache, stats in sorted(caches.items())]))
+
+    families.extend(_numeric_families("huce_intent_candidates", "Candidate pruning của intent detector",
+                                      nlp.pipeline.intent_stats()))
+    families.extend(_numeric_families("huce_ner", "Bước NER", {k: v for k, v in ner_stats.items() if k != "cache"}))
+    context = nlp.context_stats()
+    families.extend(_numeric_families("huce_context", "Context store", context,
+                                      {"backend": context.get("backend", "")}))
+    return families
+
+
+REGISTRY.add_collector(_collect_runtime_metrics)
 
 
 @app.exception_handler(ChatbotException)
@@ -113,7 +218,7 @@ async def chatbot_exception_handler(request: Request, exc: ChatbotException):
                                                                                                 DataException)) else 500
     return JSONResponse(status_code=status_code, content={
         "success": False, "error_code": exc.error_code, "error_message": exc.message,
-        "details": exc.details, "request_id": request_id, "timestamp": datetime.now(datetime.timezone.utc).isoformat()
+        "details": exc.details, "request_id": request_id, "timestamp": datetime.now(timezone.utc).isoformat()
     })
 
 
@@ -124,7 +229,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         "success": False, "error_code": f"HTTP_{exc.status_code}",
         "error_message": exc.detail if isinstance(exc.detail, str) else str(exc.detail),
         "details": exc.detail if isinstance(exc.detail, dict) else {},
-        "request_id": request_id, "timestamp": datetime.now(datetime.timezone.utc).isoformat()
+        "request_id": request_id, "timestamp": datetime.now(timezone.utc).isoformat()
     })
 
 
@@ -136,7 +241,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         "success": False, "error_code": "INTERNAL_SERVER_ERROR",
         "error_message": "Đã xảy ra lỗi không mong muốn. Vui lòng thử lại sau.",
         "details": {"debug_info": str(exc)} if logger.level == logging.DEBUG else {},
-        "request_id": request_id, "timestamp": datetime.now(datetime.timezone.utc).isoformat()
+        "request_id": request_id, "timestamp": datetime.now(timezone.utc).isoformat()
     })
 
 
@@ -146,57 +251,62 @@ async def root():
     return create_success_response(message="HUCE Chatbot API đang hoạt động")
 
 
+@app.get("/metrics")
+async def metrics():
+    """Metrics định dạng text của Prometheus (histogram thời gian từng bước, intent, cache, RSS...)."""
+    # Collector đọc RSS và thống kê context store (SQLite: COUNT(*), Redis: round trip) nên chạy trong thread
+    text = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/livez")
+async def liveness_probe():
+    """Liveness probe: process và event loop còn phản hồi (không I/O)."""
+    age = health.age()
+    return {"status": "alive", "snapshot_age_seconds": None if age is None else round(age, 3)}
+
+
+@app.get("/readyz")
+async def readiness_probe():
+    """Readiness probe: đọc snapshot do thread nền cập nhật (O(1), không I/O)."""
+    ready, snapshot = health.readiness()
+    return JSONResponse(status_code=200 if ready else 503,
+                        content={"status": "ready" if ready else "not_ready", **snapshot})
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint with detailed status."""
-    try:
-        # Check NLP service
-        nlp_status = "healthy" if nlp else "unhealthy"
-
-        # Check data availability
-        data_status = "healthy"
-        try:
-            from services.csv_service import CSVService
-            csv_service = CSVService()
-            majors = csv_service.get_majors()
-            data_status = "healthy" if len(majors) > 0 else "no_data"
-        except Exception as e:
-            data_status = f"error: {str(e)}"
-
-        return {
-            "status": "healthy",
-            "timestamp": datetime.now(datetime.timezone.utc).isoformat(),
-            "services": {
-                "nlp": nlp_status,
-                "data": data_status,
-            },
-            "version": "1.0.0"
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "timestamp": datetime.now(datetime.timezone.utc).isoformat(),
-                "error": str(e)
-            }
-        )
+    ready, snapshot = health.readiness()
+    # Chỉ để xem trạng thái nên luôn trả 200; chặn traffic khi chưa sẵn sàng là việc của /readyz
+    return JSONResponse(status_code=200, content={
+        "status": "healthy" if ready else "unhealthy",
+        "ready": ready,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "services": {
+            "nlp": "healthy" if snapshot.get("model", {}).get("loaded") else "unhealthy",
+            "data": "healthy" if snapshot.get("data", {}).get("files") else "no_data",
+        },
+        "snapshot": snapshot,
+        "context": snapshot.get("context", {}),  # Số session đã đếm sẵn ở thread nền, probe không I/O
+        "version": "1.0.0"
+    })
 
 
 @app.post("/chat/context")
 async def manage_chat_context(req: ContextRequest):
     """Quản lý context hội thoại - get/set/reset."""
+    nlp = await _get_nlp()
     try:
         session_id = req.session_id or "default"
         if req.action == Validation.ACTION_GET:
-            return create_success_response() | {"context": nlp.get_context(session_id)}
+            return create_success_response() | {"context": await _context_io(nlp.export_context, session_id)}
         elif req.action == Validation.ACTION_SET:
             context = req.context or {}
-            nlp.set_context(session_id, context)
+            await _context_io(nlp.set_context, session_id, context)
             return create_success_response(message=SuccessMessage.CONTEXT_UPDATED) | {"context": context}
         elif req.action == Validation.ACTION_RESET:
-            nlp.reset_context(session_id)
+            await _context_io(nlp.reset_context, session_id)
             return create_success_response(message=SuccessMessage.CONTEXT_RESET)
         else:
             raise ValueError(ErrorMessage.INVALID_ACTION)
@@ -207,53 +317,102 @@ async def manage_chat_context(req: ContextRequest):
         raise HTTPException(status_code=500, detail=ErrorMessage.INTERNAL_ERROR)
 
 
+def _get_intent_category(intent: str) -> str:
+    categories = {"diem_chuan": "diem", "diem": "diem", "hoc_phi": "hoc_phi", "hoc_bong": "hoc_bong",
+                  "nganh": "nganh_hoc", "chi_tieu": "chi_tieu", "phuong_thuc": "phuong_thuc",
+                  "dieu_kien": "dieu_kien", "thoi_gian": "thoi_gian", "lich_trinh": "thoi_gian",
+                  "to_hop": "to_hop", "khoi_thi": "to_hop"}
+    for key, cat in categories.items():
+        if key in intent:
+            return cat
+    return "other"
+
+
+def _update_context(session_id: str, message: str, analysis: dict, response: dict, current_context: dict,
+                    expected_version: Optional[int] = None) -> dict:
+    """
+    Cập nhật context sau 1 lượt hỏi đáp: lịch sử, intent và entities gần nhất.
+
+    Raises ContextConflictError nếu context đã bị request khác ghi sau khi đọc (expected_version).
+    """
+    current_intent = analysis["intent"]
+
+    current_entities = analysis["entities"]
+    has_major = any(e.get('label') in ['TEN_NGANH', 'CHUYEN_NGANH', 'MA_NGANH'] for e in current_entities)
+
+    current_category = _get_intent_category(current_intent)
+    independent_categories = ["hoc_bong", "dieu_kien", "thoi_gian", "other"]
+
+    if current_category in independent_categories:
+        last_entities = current_entities
+    elif has_major:
+        last_entities = current_entities
+    else:
+        old_major = [e for e in current_context.get("last_entities", []) if
+                     e.get('label') in ['TEN_NGANH', 'CHUYEN_NGANH', 'MA_NGANH']]
+        last_entities = old_major + current_entities
+    # Lịch sử + last_intent + last_entities ghi trong 1 thao tác (1 round trip với backend dùng chung)
+    entry = {"message": message, "intent": current_intent, "response": response}
+    context = get_nlp_service().append_history(session_id, entry,
+                                               {"last_intent": current_intent, "last_entities": last_entities},
+                                               expected_version=expected_version)
+    # Lịch sử trả về dạng rút gọn; dùng /chat/context get để lấy entry đầy đủ
+    return export_context(context, full=False)
+
+
+async def _run_turn(session_id: str, message: str, use_context: bool,
+                    handle: Callable[[dict], Awaitable[dict]]) -> Tuple[dict, dict, dict]:
+    """
+    1 lượt hỏi đáp: đọc context (kèm version) → xử lý → ghi context.
+
+    Không giữ khóa trong lúc xử lý: nếu request khác cùng session đã ghi trước (double-submit),
+    đọc lại context mới và xử lý lại (tối đa CONTEXT_CONFLICT_RETRIES lần).
+    """
+    nlp = await _get_nlp()
+    retries = get_context_conflict_retries()
+    attempt = 0
+    while True:
+        current_context, version = (await _context_io(nlp.get_context_versioned, session_id) if use_context
+                                    else ({}, None))
+        with span("turn.handle"):  # Gồm cả thời gian chờ executor
+            result = await handle(current_context)
+        analysis, response = result["analysis"], result["response"]
+        try:
+            with span("turn.update_context"):
+                new_context = await _context_io(_update_context, session_id, message, analysis, response,
+                                                current_context, version)
+            INTENT_TOTAL.inc(analysis["intent"])
+            return analysis, response, new_context
+        except ContextConflictError:
+            attempt += 1
+            if attempt > retries:
+                raise
+            logger.info(f"Context của session {session_id} vừa được cập nhật, xử lý lại (lần {attempt})")
+
+
 @app.post("/chat/advanced")
-async def advanced_chat(req: AdvancedChatRequest):
+async def advanced_chat(req: AdvancedChatRequest, request: Request, http_response: Response):
     """Chat nâng cao - NLP + dữ liệu + context + fallback."""
     try:
         logger.info(f"/chat/advanced - Session: {req.session_id} - Message: {req.message[:100]}")
         session_id = req.session_id or "default"
         use_context = req.use_context if req.use_context is not None else True
 
-        current_context = nlp.get_context(session_id) if use_context else {}
-        result = nlp.handle_message(req.message, current_context)
-        analysis, response = result["analysis"], result["response"]
-
-        logger.info(f"/chat/advanced - Intent: {analysis['intent']} (score: {analysis['score']:.2f})")
-
-        # Update context
-        new_context = nlp.append_history(session_id,
-                                         {"message": req.message, "intent": analysis["intent"], "response": response})
-        current_intent = analysis["intent"]
-        new_context["last_intent"] = current_intent
-
-        current_entities = analysis["entities"]
-        has_major = any(e.get('label') in ['TEN_NGANH', 'CHUYEN_NGANH', 'MA_NGANH'] for e in current_entities)
-
-        def get_intent_category(intent: str) -> str:
-            categories = {"diem_chuan": "diem", "diem": "diem", "hoc_phi": "hoc_phi", "hoc_bong": "hoc_bong",
-                          "nganh": "nganh_hoc", "chi_tieu": "chi_tieu", "phuong_thuc": "phuong_thuc",
-                          "dieu_kien": "dieu_kien", "thoi_gian": "thoi_gian", "lich_trinh": "thoi_gian",
-                          "to_hop": "to_hop", "khoi_thi": "to_hop"}
-            for key, cat in categories.items():
-                if key in intent:
-                    return cat
-            return "other"
-
-        current_category = get_intent_category(current_intent)
-        independent_categories = ["hoc_bong", "dieu_kien", "thoi_gian", "other"]
-
-        if current_category in independent_categories:
-            new_context["last_entities"] = current_entities
-        elif has_major:
-            new_context["last_entities"] = current_entities
+        executor = get_nlp_executor()
+        trigger = profiler.should_profile(request.headers.get(PROFILE_HEADER))
+        if trigger is None:
+            analysis, response, new_context = await _run_turn(
+                session_id, req.message, use_context,
+                lambda context: executor.call("handle_message", req.message, context))
         else:
-            old_major = [e for e in current_context.get("last_entities", []) if
-                         e.get('label') in ['TEN_NGANH', 'CHUYEN_NGANH', 'MA_NGANH']]
-            new_context["last_entities"] = old_major + current_entities
+            analysis, response, new_context = await _run_profiled_turn(
+                request, http_response, trigger, session_id, req.message, use_context)
 
+        logger.info(f"/chat/advanced - Intent: {analysis['intent']} (score: {analysis['score']:.2f})")
         return {"analysis": analysis, "response": response, "context": new_context}
 
+    except ChatbotException:
+        raise
     except Exception as e:
         logger.error(f"Error in /chat/advanced: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail={
@@ -262,6 +421,116 @@ async def advanced_chat(req: AdvancedChatRequest):
         })
 
 
+async def _run_profiled_turn(request: Request, http_response: Response, trigger: str, session_id: str,
+                             message: str, use_context: bool) -> Tuple[dict, dict, dict]:
+    """
+    Như _run_turn nhưng chạy handle_message dưới cProfile (trong worker của executor).
+
+    Profile được lưu vào thư mục xoay vòng, tên trả về trong header X-Profile-Id.
+    Nếu phải xử lý lại vì xung đột context, chỉ giữ profile của lần cuối.
+    """
+    executor = get_nlp_executor()
+    profiled = {}
+
+    async def handle(context: dict) -> dict:
+        result, profiled["stats"] = await executor.call_profiled("handle_message", message, context)
+        return result
+
+    started = time.perf_counter()
+    analysis, response, new_context = await _run_turn(session_id, message, use_context, handle)
+    meta = {
+        "request_id": getattr(request.state, "request_id", None),
+        "path": request.url.path,
+        "trigger": trigger,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "message_length": len(message),
+        "intent": analysis["intent"],
+        "executor_mode": executor.mode,
+    }
+    name = await asyncio.to_thread(profiler.save, profiled["stats"], meta)
+    if name:
+        http_response.headers[PROFILE_ID_HEADER] = name
+    return analysis, response, new_context
+
+
+@app.post("/chat/batch")
+async def batch_chat(req: BatchChatRequest):
+    """Chat theo batch - Phân tích NLP cho tất cả câu hỏi 1 lần, trả lời theo thứ tự."""
+    try:
+        logger.info(f"/chat/batch - {len(req.items)} messages")
+        await _get_nlp()
+        executor = get_nlp_executor()
+        analyses = await executor.call("analyze_many", [item.message for item in req.items])
+
+        # Xử lý tuần tự để các câu cùng session dùng context của câu trước
+        results = []
+        for item, item_analysis in zip(req.items, analyses):
+            session_id = item.session_id or "default"
+            use_context = item.use_context if item.use_context is not None else True
+
+            analysis, response, new_context = await _run_turn(
+                session_id, item.message, use_context,
+                lambda context: executor.call("handle_analysis", item.message, item_analysis, context))
+            results.append({"session_id": session_id, "analysis": analysis, "response": response,
+                            "context": new_context})
+
+        return create_success_response() | {"count": len(results), "results": results}
+
+    except ChatbotException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in /chat/batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail={
+            "error": "Internal server error",
+            "message": "Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi của bạn. Vui lòng thử lại.",
+        })
+
+
+def _require_profile_admin(request: Request) -> None:
+    """Endpoint /admin/profiles chỉ mở khi đã cấu hình PROFILE_TOKEN và request mang đúng token."""
+    if not profiler.token:
+        raise HTTPException(status_code=404, detail="Chưa bật quản lý profile (PROFILE_TOKEN)")
+    if not profiler.check_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Admin token không hợp lệ")
+
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """Danh sách profile đã lưu (mới nhất trước) và cấu hình lấy mẫu hiện tại."""
+    _require_profile_admin(request)
+    profiles = await asyncio.to_thread(profiler.store.list)
+    return create_success_response() | {"profiler": profiler.get_stats(), "count": len(profiles),
+                                         "profiles": profiles}
+
+
+@app.put("/admin/profiles/sampling")
+async def update_profile_sampling(req: ProfileSamplingRequest, request: Request):
+    """Đổi tần suất lấy mẫu (1 trên N request /chat/advanced, 0 = tắt) mà không cần khởi động lại."""
+    _require_profile_admin(request)
+    profiler.set_sample_rate(req.sample_rate)
+    logger.info(f"Profile sample rate -> {req.sample_rate}")
+    return create_success_response() | {"profiler": profiler.get_stats()}
+
+
+@app.get("/admin/profiles/{name}")
+async def get_profile(name: str, request: Request, fmt: str = Query("prof", alias="format"),
+                      sort: str = "cumulative", limit: int = 40):
+    """Tải file .prof (pstats) hoặc xem bảng pstats dạng text (?format=text&sort=tottime&limit=40)."""
+    _require_profile_admin(request)
+    if fmt == "text":
+        try:
+            text = await asyncio.to_thread(profiler.store.render_text, name, sort, max(1, limit))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Không có profile {name}")
+        return PlainTextResponse(text)
+    path = profiler.store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Không có profile {name}")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.prof")
+
+
 if __name__ == "__main__":
     import uvicorn
 
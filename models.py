@@ -1,6 +1,6 @@
 """Models - Pydantic models cho request/response validation."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 
 from pydantic import BaseModel, Field, field_validator
@@ -20,7 +20,7 @@ class ErrorResponse(BaseModel):
     error_message: str
     details: Dict[str, Any] = Field(default_factory=dict)
     request_id: Optional[str] = None
-    timestamp: str = Field(default_factory=lambda: datetime.now(datetime.timezone.utc).isoformat())
+    timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 
 class ValidationErrorResponse(ErrorResponse):
@@ -53,6 +53,32 @@ class AdvancedChatRequest(BaseModel):
         return v.strip()
 
 
+class BatchChatItem(BaseModel):
+    message: str = Field(..., min_length=1)
+    session_id: Optional[str] = "default"
+    use_context: Optional[bool] = True
+
+    @field_validator("message")
+    @classmethod
+    def validate_message(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Câu hỏi không được để trống")
+        return v.strip()
+
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem] = Field(..., min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def validate_items(cls, v: List[BatchChatItem]) -> List[BatchChatItem]:
+        from config import get_batch_max_items
+        max_items = get_batch_max_items()
+        if len(v) > max_items:
+            raise ValueError(f"Tối đa {max_items} câu hỏi trong 1 request")
+        return v
+
+
 class ContextRequest(BaseModel):
     action: str
     session_id: Optional[str] = "default"
@@ -67,6 +93,10 @@ class ContextRequest(BaseModel):
         return v
 
 
+class ProfileSamplingRequest(BaseModel):
+    sample_rate: int = Field(..., ge=0)
+
+
 class SuggestMajorsRequest(BaseModel):
     score: float = Field(..., ge=0, le=30)
     score_type: Optional[str] = "chuan"
@@ -0,0 +1,104 @@
+"""
+Aho–Corasick Automaton - So khớp nhiều keyword trong 1 lần duyệt văn bản
+
+Thay cho việc kiểm tra `kw in text` lần lượt với từng keyword:
+1. Dựng trie từ tất cả keyword
+2. Tính failure link bằng BFS và gộp sẵn output của các hậu tố
+3. Duyệt văn bản 1 lần (tổng số bước lùi theo failure link không vượt quá độ dài văn bản)
+
+Kết quả là tất cả vị trí xuất hiện (kể cả chồng lấn) của mọi keyword.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Automaton so khớp đồng thời nhiều keyword
+
+    Mỗi keyword được gán chỉ số theo thứ tự truyền vào, dùng để tra ngược
+    và làm tiêu chí ưu tiên ổn định khi có nhiều kết quả.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        """
+        Dựng automaton
+
+        Args:
+            patterns: Danh sách keyword (keyword rỗng bị bỏ qua)
+        """
+        self.patterns: List[str] = list(patterns)
+
+        # Trie: goto[state] = {ký tự: state tiếp theo}
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for idx, pat in enumerate(self.patterns):
+            if not pat:
+                continue
+            state = 0
+            for ch in pat:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(idx)
+
+        # BFS: tính failure link và gộp output của các hậu tố
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs: List[Tuple[Tuple[int, int], ...]] = [
+            tuple((idx, len(self.patterns[idx])) for idx in out) for out in outputs
+        ]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Duyệt văn bản 1 lần và trả về mọi lần xuất hiện của các keyword
+
+        Args:
+            text: Văn bản cần tìm
+
+        Yields:
+            Tuple (start, end, pattern_index) với text[start:end] == patterns[pattern_index]
+        """
+        return iter(self.find_all(text))
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """Giống iter_matches nhưng trả về list (vòng lặp chính của automaton)."""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        root = goto[0]
+        hits: List[Tuple[int, int, int]] = []
+        state, node = 0, root
+        for pos, ch in enumerate(text):
+            nxt = node.get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                node = goto[state]
+                nxt = node.get(ch)
+            if nxt is None:
+                continue  # Đang ở root và không có keyword nào bắt đầu bằng ch
+            state, node = nxt, goto[nxt]
+            out = outputs[state]
+            if out:
+                end = pos + 1
+                for idx, length in out:
+                    hits.append((end - length, end, idx))
+        return hits
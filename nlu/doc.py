@@ -0,0 +1,47 @@
+"""
+Doc - Câu hỏi đã tiền xử lý, dùng chung cho mọi bước của pipeline
+
+Mỗi câu hỏi chỉ được chuẩn hóa và tách từ 1 lần. Intent detection, entity
+extraction và heuristic của NLPPipeline đều đọc từ cùng 1 Doc thay vì tự
+chuẩn hóa lại văn bản.
+"""
+
+from typing import Dict, List
+
+from .preprocess import normalize_text, tokenize_and_map
+
+
+class Doc:
+    """
+    Câu hỏi đã tiền xử lý
+
+    Attributes:
+        text: Câu hỏi gốc (NER dùng bản gốc để giữ chữ hoa)
+        norm: Văn bản đã chuẩn hóa (lowercase, NFC, bỏ ký tự đặc biệt)
+        tokens: Các âm tiết của norm (tách theo khoảng trắng)
+        expanded_tokens: tokens sau khi thay từ đồng nghĩa bằng dạng chuẩn
+        expanded_text: expanded_tokens nối bằng khoảng trắng
+        intent_tokens: Tách từ Underthesea + mapping từ đồng nghĩa + bỏ stopwords
+        synonym_map: Synonym map đã dùng để dựng Doc
+    """
+
+    __slots__ = ("text", "norm", "tokens", "expanded_tokens", "expanded_text", "intent_tokens", "synonym_map")
+
+    def __init__(self, text: str, synonym_map: Dict[str, str]) -> None:
+        """
+        Tiền xử lý câu hỏi
+
+        Args:
+            text: Câu hỏi từ người dùng
+            synonym_map: Dict mapping từ đồng nghĩa -> từ chuẩn
+        """
+        self.text = text
+        self.synonym_map = synonym_map
+        self.norm: str = normalize_text(text)
+        self.tokens: List[str] = self.norm.split()
+        self.expanded_tokens: List[str] = [synonym_map.get(tok, tok) for tok in self.tokens]
+        self.expanded_text: str = " ".join(self.expanded_tokens)
+        self.intent_tokens: List[str] = tokenize_and_map(text, synonym_map)
+
+    def __repr__(self) -> str:
+        return f"Doc({self.text!r})"
@@ -6,20 +6,42 @@ Module này trích xuất các entity từ câu hỏi người dùng:
 - Dictionary lookup từ các file CSV
 - NER (Named Entity Recognition) từ Underthesea
 - Deduplication và normalization
+
+Patterns và dictionary phrases được biên dịch chung thành 1 gazetteer
+(Aho–Corasick), tra cứu trong 1 lần duyệt và chỉ khớp đúng ranh giới từ.
+
+NER là bước tốn thời gian nhất nên chỉ chạy khi cần (NER_MODE), trong ngân
+sách thời gian cho mỗi câu hỏi và có cache theo văn bản đã chuẩn hóa.
 """
 
 import csv
 import json
 import os
+import threading
+import time
 from typing import Any, Dict, List, Set, Tuple, Optional
 
+from config import get_ner_mode, get_ner_needed_labels, get_ner_time_budget_ms, get_ner_cache_size
+from utils.metrics import span, timed
+from .doc import Doc
+from .gazetteer import Gazetteer
 from .preprocess import normalize_text
+from .text_cache import LRUCache
+from . import uts
+
+# NER từ Underthesea (import lười ở lần gọi đầu tiên), None nếu không cài
+uts_ner = uts.ner if uts.available() else None
 
-# Import NER từ Underthesea
-try:
-    from underthesea import ner as uts_ner  # type: ignore
-except ImportError:
-    uts_ner = None  # type: ignore
+# Chế độ chạy NER
+NER_MODE_AUTO = "auto"  # Chỉ chạy khi pattern/dictionary chưa tìm thấy nhãn cần thiết
+NER_MODE_ALWAYS = "always"
+NER_MODE_OFF = "off"
+NER_MODES = (NER_MODE_AUTO, NER_MODE_ALWAYS, NER_MODE_OFF)
+# Sau ngần này lần liên tiếp bị bỏ qua vì ngân sách, chạy thử NER 1 lần để đo lại thời gian
+NER_REPROBE_EVERY = 20
+# Các bộ đếm của bước NER (get_ner_stats)
+NER_STAT_KEYS = ("calls", "runs", "cache_hits", "skipped_found", "skipped_budget", "skipped_off", "probes",
+                 "total_ms")
 
 
 def _load_entity_patterns(path: str) -> List[Tuple[str, str]]:
@@ -112,6 +134,27 @@ def _extract_by_ner(text: str) -> List[Dict[str, Any]]:
     return found
 
 
+def _map_expanded_span(tokens: List[str], expanded_tokens: List[str], start: int, end: int) -> Tuple[int, int]:
+    """
+    Đổi vị trí [start, end) trong văn bản đã expand synonym về vị trí trong văn bản gốc
+
+    Mỗi token gốc tương ứng với 1 token expand (có thể gồm nhiều từ); span được
+    mở rộng ra toàn bộ các token gốc mà nó chạm tới.
+    """
+    orig_pos = exp_pos = 0
+    orig_start = orig_end = 0
+    for tok, exp_tok in zip(tokens, expanded_tokens):
+        exp_end = exp_pos + len(exp_tok)
+        if exp_pos <= start < exp_end + 1:
+            orig_start = orig_pos
+        if exp_pos < end <= exp_end:
+            orig_end = orig_pos + len(tok)
+            break
+        orig_pos += len(tok) + 1
+        exp_pos = exp_end + 1
+    return orig_start, orig_end
+
+
 class EntityExtractor:
     """
     Entity Extractor - Trích xuất thực thể từ câu hỏi
@@ -119,10 +162,12 @@ class EntityExtractor:
     Sử dụng 3 phương pháp:
     1. Pattern matching từ entity.json
     2. Dictionary lookup từ các file CSV
-    3. NER từ Underthesea
+    3. NER từ Underthesea (chỉ khi cần, xem NER_MODE)
     """
 
-    def __init__(self, data_dir: str, patterns_path: str, synonym_map: Optional[Dict[str, str]] = None) -> None:
+    def __init__(self, data_dir: str, patterns_path: str, synonym_map: Optional[Dict[str, str]] = None,
+                 ner_mode: Optional[str] = None, ner_needed_labels: Optional[List[str]] = None,
+                 ner_budget_ms: Optional[float] = None, ner_cache_size: Optional[int] = None) -> None:
         """
         Khởi tạo Entity Extractor
 
@@ -130,10 +175,32 @@ class EntityExtractor:
             data_dir: Thư mục chứa dữ liệu CSV
             patterns_path: Đường dẫn file entity.json
             synonym_map: Dict mapping từ đồng nghĩa -> từ chuẩn (optional)
+            ner_mode: "auto", "always" hoặc "off" (mặc định lấy từ config)
+            ner_needed_labels: Nhãn cần thiết cho chế độ "auto" (mặc định lấy từ config)
+            ner_budget_ms: Ngân sách thời gian NER mỗi câu, 0 = không giới hạn (mặc định lấy từ config)
+            ner_cache_size: Kích thước cache kết quả NER (mặc định lấy từ config)
         """
         self.data_dir = data_dir
         self.synonym_map = synonym_map or {}
 
+        # Cấu hình NER
+        self.ner_mode = (ner_mode or get_ner_mode()).strip().lower()
+        if self.ner_mode not in NER_MODES:
+            raise ValueError(f"NER mode không hợp lệ: {self.ner_mode}. Chỉ chấp nhận: {', '.join(NER_MODES)}")
+        self.ner_needed_labels: Set[str] = set(
+            ner_needed_labels if ner_needed_labels is not None else get_ner_needed_labels()
+        )
+        self.ner_budget_ms = get_ner_time_budget_ms() if ner_budget_ms is None else ner_budget_ms
+        self._ner_cache = LRUCache(get_ner_cache_size() if ner_cache_size is None else ner_cache_size, name="ner")
+        self._ner_avg_ms = 0.0  # Thời gian chạy NER trung bình (EWMA), dùng để ước tính theo ngân sách
+        self._ner_cold = True  # Lần chạy đầu (nạp model) không tính vào trung bình
+        self._ner_budget_skips = 0  # Số lần liên tiếp bị bỏ qua vì ngân sách
+        # 3 trạng thái trên được đọc-ghi từ nhiều thread của executor nên đi qua khóa;
+        # bộ đếm thì mỗi thread cộng vào shard riêng, get_ner_stats() cộng các shard lại
+        self._ner_lock = threading.Lock()
+        self._stats_local = threading.local()
+        self._stats_shards: List[Dict[str, float]] = []
+
         # Load patterns từ entity.json
         self.entity_patterns: List[Tuple[str, str]] = _load_entity_patterns(
             patterns_path
@@ -142,6 +209,10 @@ class EntityExtractor:
         # Load dictionary phrases từ các file CSV
         self.dict_phrases: List[Tuple[str, str]] = self._load_dictionary_phrases()
 
+        # Biên dịch patterns + dictionary phrases thành 1 automaton
+        self._n_patterns = 0
+        self._gazetteer: Gazetteer = self._build_gazetteer()
+
         # Mapping alias cho entity labels (chuẩn hóa tên)
         self.entity_label_alias: Dict[str, str] = {
             "NAM_TUYEN_SINH": "NAM_HOC",
@@ -459,75 +530,66 @@ class EntityExtractor:
 
     # ---------- Extract - Các phương pháp trích xuất entity ----------
 
-    def _extract_by_patterns(self, norm_text: str) -> List[Dict[str, Any]]:
+    def _build_gazetteer(self) -> Gazetteer:
         """
-        Trích xuất entity bằng pattern matching từ entity.json
+        Biên dịch patterns (entity.json) và dictionary phrases (CSV) thành 1 gazetteer
 
-        Args:
-            norm_text: Văn bản đã được normalize
-
-        Returns:
-            List các entity được tìm thấy
+        Patterns đứng trước dictionary phrases; nhãn của pattern điểm sàn/chuẩn
+        được sửa sẵn tại đây thay vì mỗi lần trích xuất.
         """
-        found: List[Dict[str, Any]] = []
+        entries: List[Tuple[str, str]] = []
         for label, pat in self.entity_patterns:
-            if pat and pat in norm_text:
-                norm_pat = normalize_text(pat)
-                fixed_label = label
-
-                # Xử lý đặc biệt cho điểm sàn/chuẩn
-                if "điểm sàn" in norm_pat:
-                    fixed_label = "DIEM_SAN"
-                elif "điểm chuẩn" in norm_pat:
-                    fixed_label = "DIEM_CHUAN"
-
-                found.append({"label": fixed_label, "text": pat, "source": "pattern"})
-        return found
-
-    def _extract_by_dictionaries(self, norm_text: str) -> List[Dict[str, Any]]:
+            norm_pat = normalize_text(pat)
+            fixed_label = label
+
+            # Xử lý đặc biệt cho điểm sàn/chuẩn
+            if "điểm sàn" in norm_pat:
+                fixed_label = "DIEM_SAN"
+            elif "điểm chuẩn" in norm_pat:
+                fixed_label = "DIEM_CHUAN"
+            entries.append((fixed_label, pat))
+        self._n_patterns = len(entries)
+        entries.extend(self.dict_phrases)
+        return Gazetteer(entries)
+
+    def _extract_by_gazetteer(self, norm_text: str,
+                              expanded_tokens: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
-        Trích xuất entity bằng dictionary lookup từ CSV
+        Trích xuất entity bằng pattern matching (entity.json) và dictionary lookup (CSV) trong 1 lần duyệt
 
         Hỗ trợ synonym expansion: nếu text chứa synonym (vd: "cntt"),
-        sẽ tìm kiếm cả canonical form (vd: "công nghệ thông tin")
+        sẽ tìm kiếm cả canonical form (vd: "công nghệ thông tin") trong dictionary phrases.
 
         Args:
             norm_text: Văn bản đã được normalize
+            expanded_tokens: Các token của norm_text sau khi thay từ đồng nghĩa (tự tính nếu không truyền vào)
 
         Returns:
-            List các entity được tìm thấy
+            List các entity (pattern trước, dictionary sau) kèm vị trí start/end trong norm_text
         """
+        gaz = self._gazetteer
         found: List[Dict[str, Any]] = []
-
-        # Bước 1: Tìm kiếm trực tiếp trong text
-        for label, phrase in self.dict_phrases:
-            if phrase and phrase in norm_text:
-                found.append({"label": label, "text": phrase, "source": "dictionary"})
-
-        # Bước 2: Expand synonyms và tìm kiếm lại
-        # Tokenize text và thay thế synonyms
+        found_keys: Set[Tuple[str, str]] = set()
+        for start, end, idx in gaz.find_first(norm_text):
+            source = "pattern" if idx < self._n_patterns else "dictionary"
+            found.append({"label": gaz.labels[idx], "text": gaz.phrases[idx], "source": source,
+                          "start": start, "end": end})
+            if source == "dictionary":
+                found_keys.add((gaz.labels[idx], gaz.phrases[idx]))
+
+        # Expand synonyms và tìm kiếm lại (chỉ dictionary phrases)
         tokens = norm_text.split()
-        expanded_tokens = []
-
-        for token in tokens:
-            # Nếu token là synonym, lấy canonical form
-            canonical = self.synonym_map.get(token, token)
-            expanded_tokens.append(canonical)
-
-        # Tạo expanded text
+        if expanded_tokens is None:
+            expanded_tokens = [self.synonym_map.get(token, token) for token in tokens]
         expanded_text = " ".join(expanded_tokens)
-
-        # Tìm kiếm trong expanded text (nếu khác với original)
         if expanded_text != norm_text:
-            for label, phrase in self.dict_phrases:
-                if phrase and phrase in expanded_text:
-                    # Check xem đã tìm thấy chưa
-                    already_found = any(
-                        e["label"] == label and e["text"] == phrase
-                        for e in found
-                    )
-                    if not already_found:
-                        found.append({"label": label, "text": phrase, "source": "dictionary"})
+            for start, end, idx in gaz.find_first(expanded_text):
+                key = (gaz.labels[idx], gaz.phrases[idx])
+                if idx < self._n_patterns or key in found_keys:
+                    continue
+                found_keys.add(key)
+                start, end = _map_expanded_span(tokens, expanded_tokens, start, end)
+                found.append({"label": key[0], "text": key[1], "source": "dictionary", "start": start, "end": end})
 
         return found
 
@@ -541,14 +603,130 @@ class EntityExtractor:
         Returns:
             List các entity đã được deduplicate và normalize
         """
-        # Chuẩn hóa văn bản
-        norm = normalize_text(text)
+        return self._extract(text, normalize_text(text), None)
+
+    def extract_doc(self, doc: Doc) -> List[Dict[str, Any]]:
+        """
+        Trích xuất tất cả entities từ câu hỏi đã tiền xử lý
+
+        Args:
+            doc: Câu hỏi đã tiền xử lý (dùng doc.norm, doc.expanded_text và doc.text cho NER)
+
+        Returns:
+            List các entity đã được deduplicate và normalize
+        """
+        # Doc dựng với synonym map khác thì tự expand lại
+        expanded_tokens = doc.expanded_tokens if doc.synonym_map is self.synonym_map else None
+        return self._extract(doc.text, doc.norm, expanded_tokens)
 
-        # Trích xuất bằng 3 phương pháp
+    def _extract_by_ner_lazy(self, text: str, norm: str, found: List[Dict[str, Any]],
+                             started: float) -> List[Dict[str, Any]]:
+        """
+        Chạy NER khi thực sự cần (theo ner_mode), trong ngân sách thời gian, có cache
+
+        Args:
+            text: Văn bản gốc (NER cần giữ chữ hoa)
+            norm: Văn bản đã normalize (key của cache)
+            found: Entity đã tìm được bằng pattern/dictionary
+            started: Thời điểm (perf_counter) bắt đầu trích xuất câu hỏi này
+
+        Returns:
+            List các entity do NER tìm được (rỗng nếu bỏ qua)
+        """
+        stats = self._ner_stats_shard()
+        stats["calls"] += 1
+        if self.ner_mode == NER_MODE_OFF or uts_ner is None:
+            stats["skipped_off"] += 1
+            return []
+        if self.ner_mode == NER_MODE_AUTO and any(self._is_needed_label(ent["label"]) for ent in found):
+            stats["skipped_found"] += 1
+            return []
+
+        cached = self._ner_cache.get(norm)
+        if cached is not None:
+            stats["cache_hits"] += 1
+            return [dict(ent) for ent in cached]
+
+        # Bỏ qua nếu thời gian đã dùng + thời gian NER ước tính vượt ngân sách (chỉ là ước tính trước
+        # khi chạy, NER không bị ngắt giữa chừng). Cứ NER_REPROBE_EVERY lần bỏ qua liên tiếp thì chạy
+        # thử 1 lần để ước tính hồi phục sau 1 lần chạy chậm bất thường (GC, tranh CPU...)
+        probe = False
+        with self._ner_lock:
+            if self.ner_budget_ms > 0:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if elapsed_ms + self._ner_avg_ms > self.ner_budget_ms:
+                    if self._ner_budget_skips < NER_REPROBE_EVERY:
+                        self._ner_budget_skips += 1
+                        stats["skipped_budget"] += 1
+                        return []
+                    probe = True
+                    stats["probes"] += 1
+            self._ner_budget_skips = 0
+
+        t0 = time.perf_counter()
+        result = _extract_by_ner(text)
+        duration_ms = (time.perf_counter() - t0) * 1000
+        stats["runs"] += 1
+        stats["total_ms"] += duration_ms
+        with self._ner_lock:
+            if self._ner_cold:
+                self._ner_cold = False  # Lần đầu gồm cả thời gian nạp model, không đại diện
+            elif probe or self._ner_avg_ms == 0.0:
+                self._ner_avg_ms = duration_ms
+            else:
+                self._ner_avg_ms = 0.8 * self._ner_avg_ms + 0.2 * duration_ms
+
+        self._ner_cache.put(norm, tuple(dict(ent) for ent in result))
+        return result
+
+    def _ner_stats_shard(self) -> Dict[str, float]:
+        """Bộ đếm NER của thread hiện tại (tạo và đăng ký ở lần dùng đầu)."""
+        try:
+            return self._stats_local.shard
+        except AttributeError:
+            shard = self._stats_local.shard = dict.fromkeys(NER_STAT_KEYS, 0)
+            shard["total_ms"] = 0.0
+            with self._ner_lock:
+                self._stats_shards.append(shard)
+            return shard
+
+    def _is_needed_label(self, label: str) -> bool:
+        """Nhãn có nằm trong ner_needed_labels không ("*" = mọi nhãn)."""
+        needed = self.ner_needed_labels
+        return "*" in needed or label in needed or self.entity_label_alias.get(label) in needed
+
+    def warm_up(self) -> None:
+        """Nạp sẵn model NER của Underthesea (lần gọi đầu tiên mất vài giây)."""
+        if self.ner_mode != NER_MODE_OFF and uts_ner is not None:
+            _extract_by_ner("Trường Đại học Xây dựng Hà Nội")
+
+    def get_ner_stats(self) -> Dict[str, float]:
+        """
+        Thống kê bước NER
+
+        Returns:
+            Dict gồm số lần gọi, số lần thực sự chạy, số lần bỏ qua theo lý do,
+            cache hits, thời gian trung bình và thống kê cache
+        """
+        with self._ner_lock:
+            shards = list(self._stats_shards)
+        stats: Dict[str, Any] = {key: sum(shard[key] for shard in shards) for key in NER_STAT_KEYS}
+        stats["total_ms"] = float(stats["total_ms"])
+        stats["avg_ms"] = stats["total_ms"] / stats["runs"] if stats["runs"] else 0.0
+        stats["run_ratio"] = stats["runs"] / stats["calls"] if stats["calls"] else 0.0
+        stats["mode"] = self.ner_mode
+        stats["cache"] = self._ner_cache.get_stats()
+        return stats
+
+    @timed("nlp.entities")
+    def _extract(self, text: str, norm: str, expanded_tokens: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Trích xuất bằng 3 phương pháp rồi deduplicate (text gốc dùng cho NER)."""
+        started = time.perf_counter()
         results: List[Dict[str, Any]] = []
-        results.extend(self._extract_by_patterns(norm))  # Pattern matching
-        results.extend(self._extract_by_dictionaries(norm))  # Dictionary lookup
-        results.extend(_extract_by_ner(text))  # NER
+        with span("nlp.entities.gazetteer"):
+            results.extend(self._extract_by_gazetteer(norm, expanded_tokens))  # Pattern matching + Dictionary lookup
+        with span("nlp.entities.ner"):
+            results.extend(self._extract_by_ner_lazy(text, norm, results, started))  # NER (khi cần)
 
         # Deduplication và normalization
         seen: Set[Tuple[str, str]] = set()
@@ -570,12 +748,13 @@ class EntityExtractor:
             key = (canon_label, norm_t)
             if key not in seen:
                 seen.add(key)
-                dedup.append(
-                    {
-                        "label": canon_label,
-                        "text": raw_text,
-                        "source": ent.get("source"),
-                    }
-                )
+                item = {
+                    "label": canon_label,
+                    "text": raw_text,
+                    "source": ent.get("source"),
+                }
+                if "start" in ent:
+                    item["start"], item["end"] = ent["start"], ent["end"]
+                dedup.append(item)
 
         return dedup
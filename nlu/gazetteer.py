@@ -0,0 +1,77 @@
+"""
+Gazetteer - Tra cứu đồng thời mọi cụm từ đã biết (tên ngành, mã ngành, phương thức...)
+
+Tất cả cụm từ được biên dịch 1 lần thành automaton Aho–Corasick. Mỗi lần tra cứu
+chỉ duyệt văn bản 1 lần, chi phí không tăng theo số cụm từ trong từ điển.
+
+Kết quả chỉ gồm các lần xuất hiện đúng ranh giới từ (giống \\b của regex):
+"a00" khớp trong "khối a00" nhưng không khớp trong "a001".
+"""
+
+from typing import Iterable, List, Tuple
+
+from .automaton import AhoCorasick
+
+
+def _is_word_char(ch: str) -> bool:
+    # "_" được coi là dấu phân cách: "7580101_02" (mã xét tuyển) vẫn chứa mã ngành "7580101"
+    return ch.isalnum()
+
+
+class Gazetteer:
+    """
+    Từ điển cụm từ có nhãn
+
+    Mỗi cụm từ được gán chỉ số theo thứ tự truyền vào (một cụm từ có thể xuất
+    hiện nhiều lần với các nhãn khác nhau).
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """
+        Biên dịch gazetteer
+
+        Args:
+            entries: Danh sách (label, phrase), phrase đã được normalize
+        """
+        entries = list(entries)
+        self.labels: List[str] = [label for label, _ in entries]
+        self.phrases: List[str] = [phrase for _, phrase in entries]
+        self._automaton = AhoCorasick(self.phrases)
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Tìm mọi cụm từ xuất hiện trong văn bản (đúng ranh giới từ)
+
+        Args:
+            text: Văn bản đã normalize
+
+        Returns:
+            List (start, end, index) với text[start:end] == phrases[index],
+            sắp xếp theo vị trí kết thúc
+        """
+        n = len(text)
+        spans: List[Tuple[int, int, int]] = []
+        for start, end, idx in self._automaton.find_all(text):
+            if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                continue
+            if end < n and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                continue
+            spans.append((start, end, idx))
+        return spans
+
+    def find_first(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Giống find() nhưng mỗi cụm từ chỉ lấy lần xuất hiện đầu tiên
+
+        Returns:
+            List (start, end, index) sắp xếp theo index (thứ tự khai báo)
+        """
+        first = {}
+        for span in self.find(text):
+            idx = span[2]
+            if idx not in first or span[0] < first[idx][0]:
+                first[idx] = span
+        return [first[idx] for idx in sorted(first)]
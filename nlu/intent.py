@@ -6,16 +6,54 @@ Module này sử dụng TF-IDF + Cosine Similarity để nhận diện intent:
 2. Tính centroid (trọng tâm) cho mỗi intent
 3. So sánh câu hỏi với các centroid bằng cosine similarity
 4. Fallback bằng keyword matching nếu không đạt ngưỡng
+
+Có 2 engine tính điểm cho bước 3 (kết quả giống nhau):
+- "dict": duyệt từng centroid dạng dict (thuần Python)
+- "sparse": ma trận centroid dạng CSR (NumPy), 1 phép nhân sparse cho mỗi câu hỏi
+
+Cả 2 engine chỉ chấm điểm các intent có chung ít nhất 1 token với câu hỏi
+(inverted index token -> intents), các intent còn lại chắc chắn có cosine = 0.
+
+Keyword backoff (bước 4) được biên dịch thành automaton Aho–Corasick, tìm mọi
+keyword trong 1 lần duyệt. Quy tắc chọn khi có nhiều keyword khớp:
+- "priority": keyword khai báo trước trong dict có độ ưu tiên cao hơn. Kết quả
+  giống hệt cách cũ duyệt `kw in text` theo thứ tự (alias "compat")
+- "longest": keyword dài nhất; bằng nhau thì xuất hiện sớm hơn, rồi thứ tự khai báo
 """
 
 import math
-from typing import Dict, List, Tuple
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 
+from utils.metrics import span
+from .automaton import AhoCorasick
+from .doc import Doc
+from .model_store import IntentModel
 from .preprocess import tokenize_and_map
 
+# Import NumPy cho engine "sparse"
+try:
+    import numpy as np
+except ImportError:  # fallback về engine "dict" nếu không cài đặt được
+    np = None
+
 # Ngưỡng confidence cho intent detection
 DEFAULT_INTENT_THRESHOLD = 0.35
 
+# Các engine tính điểm được hỗ trợ
+SCORING_ENGINE_DICT = "dict"
+SCORING_ENGINE_SPARSE = "sparse"
+SCORING_ENGINES = (SCORING_ENGINE_DICT, SCORING_ENGINE_SPARSE)
+
+# Hệ số nhân điểm cosine (giữ nguyên như engine gốc)
+SCORE_BONUS = 1.05
+
+# Quy tắc ưu tiên của keyword backoff
+BACKOFF_MODE_PRIORITY = "priority"
+BACKOFF_MODE_LONGEST = "longest"
+BACKOFF_MODE_COMPAT = "compat"  # Alias của "priority" (hành vi cũ)
+BACKOFF_MODES = (BACKOFF_MODE_PRIORITY, BACKOFF_MODE_LONGEST, BACKOFF_MODE_COMPAT)
+
 
 def _compute_idf(samples: List[List[str]]) -> Dict[str, float]:
     """
@@ -120,6 +158,8 @@ class IntentDetector:
             intent_samples: Dict[str, List[List[str]]],
             intent_keyword_backoff: Dict[str, str],
             threshold: float = DEFAULT_INTENT_THRESHOLD,
+            engine: str = SCORING_ENGINE_SPARSE,
+            backoff_mode: str = BACKOFF_MODE_PRIORITY,
     ) -> None:
         """
         Khởi tạo Intent Detector
@@ -128,16 +168,123 @@ class IntentDetector:
             intent_samples: Dict mapping intent -> list of tokenized samples
             intent_keyword_backoff: Dict mapping keyword -> intent (fallback)
             threshold: Ngưỡng confidence cho TF-IDF matching
+            engine: Engine tính điểm ("dict" hoặc "sparse").
+                Tự động dùng "dict" nếu không có NumPy.
+            backoff_mode: Quy tắc chọn keyword backoff ("priority"/"compat" hoặc "longest")
         """
+        if engine not in SCORING_ENGINES:
+            raise ValueError(f"Engine không hợp lệ: {engine}. Chỉ chấp nhận: {', '.join(SCORING_ENGINES)}")
+        if backoff_mode not in BACKOFF_MODES:
+            raise ValueError(
+                f"Backoff mode không hợp lệ: {backoff_mode}. Chỉ chấp nhận: {', '.join(BACKOFF_MODES)}"
+            )
+
         self.intent_samples = intent_samples
         self.intent_keyword_backoff = intent_keyword_backoff
         self.threshold = threshold
+        self.engine = engine if np is not None else SCORING_ENGINE_DICT
+        self.backoff_mode = BACKOFF_MODE_PRIORITY if backoff_mode == BACKOFF_MODE_COMPAT else backoff_mode
+
+        # Biên dịch keyword backoff thành automaton (chỉ số keyword = thứ tự khai báo)
+        self._backoff_intents: List[str] = list(intent_keyword_backoff.values())
+        self._backoff_automaton = AhoCorasick(intent_keyword_backoff.keys())
 
         # Precompute TF-IDF và centroids
         self.idf: Dict[str, float] = {}
         self.intent_centroids: Dict[str, Dict[str, float]] = {}
+
+        # Thứ tự intent cố định (theo intent_centroids) và inverted index token -> vị trí intent
+        self.intent_names: List[str] = []
+        self.postings: Dict[str, Tuple[int, ...]] = {}
+
+        # Thống kê pruning: số câu hỏi, số intent được chấm điểm / bị loại.
+        # Mỗi thread cộng vào shard riêng [queries, scored, pruned] (giống utils.metrics)
+        # nên detect() không cần khóa; get_stats() cộng các shard lại.
+        self._stats_local = threading.local()
+        self._stats_shards: List[List[int]] = []
+        self._stats_lock = threading.Lock()
+
+        # Ma trận centroid dạng CSR theo token (chỉ dùng cho engine "sparse"):
+        # hàng = token trong vocab, cột = intent (theo thứ tự của intent_names).
+        # Lưu theo token (chính là posting list có trọng số) để mỗi câu hỏi
+        # chỉ gom các hàng ứng với token của nó.
+        self.vocab: Dict[str, int] = {}
+        self._csr_indptr: Optional["np.ndarray"] = None
+        self._csr_indices: Optional["np.ndarray"] = None
+        self._csr_data: Optional["np.ndarray"] = None
+
         self._build_intent_centroids()
 
+    @classmethod
+    def from_model(
+            cls,
+            model: IntentModel,
+            intent_keyword_backoff: Dict[str, str],
+            threshold: float = DEFAULT_INTENT_THRESHOLD,
+            engine: str = SCORING_ENGINE_SPARSE,
+            backoff_mode: str = BACKOFF_MODE_PRIORITY,
+    ) -> "IntentDetector":
+        """
+        Khởi tạo Intent Detector từ model đã biên dịch sẵn (không cần mẫu câu)
+
+        Args:
+            model: IntentModel đọc từ artifact (xem nlu.model_store)
+            intent_keyword_backoff: Dict mapping keyword -> intent (fallback)
+            threshold: Ngưỡng confidence cho TF-IDF matching
+            engine: Engine tính điểm ("dict" hoặc "sparse")
+            backoff_mode: Quy tắc chọn keyword backoff ("priority"/"compat" hoặc "longest")
+
+        Returns:
+            IntentDetector cho kết quả giống với detector đã tạo ra model
+        """
+        detector = cls({}, intent_keyword_backoff, threshold, engine=engine, backoff_mode=backoff_mode)
+
+        vocab_list = list(model.vocab)
+        detector.idf = dict(zip(vocab_list, model.idf.tolist()))
+        detector.vocab = {t: i for i, t in enumerate(vocab_list)}
+        detector.intent_names = list(model.intent_names)
+        detector._csr_indptr = model.csr_indptr
+        detector._csr_indices = model.csr_indices
+        detector._csr_data = model.csr_data
+
+        # Dựng lại centroids dạng dict (engine "dict" và các hàm cần tra cứu theo intent)
+        centroids: Dict[str, Dict[str, float]] = {intent: {} for intent in detector.intent_names}
+        indptr = model.csr_indptr.tolist()
+        indices = model.csr_indices.tolist()
+        data = model.csr_data.tolist()
+        for row, tok in enumerate(vocab_list):
+            for k in range(indptr[row], indptr[row + 1]):
+                centroids[detector.intent_names[indices[k]]][tok] = data[k]
+        detector.intent_centroids = centroids
+        detector._build_postings()
+        return detector
+
+    def to_model(self, source_hash: str) -> IntentModel:
+        """
+        Xuất vocab, IDF và ma trận centroid để ghi ra artifact
+
+        Args:
+            source_hash: Content hash của dữ liệu nguồn (intent.csv + synonym.csv)
+
+        Returns:
+            IntentModel tương ứng với detector hiện tại
+        """
+        if np is None:
+            raise RuntimeError("Cần NumPy để xuất intent model")
+        if self._csr_data is None:
+            self._build_centroid_matrix()
+
+        vocab_list = list(self.vocab)
+        return IntentModel(
+            source_hash,
+            vocab_list,
+            list(self.intent_names),
+            np.asarray([self.idf[t] for t in vocab_list], dtype=np.float64),
+            self._csr_indptr,
+            self._csr_indices,
+            self._csr_data,
+        )
+
     # ---------- TF-IDF utilities ----------
 
     def _tfidf_vec(self, toks: List[str]) -> Dict[str, float]:
@@ -178,6 +325,201 @@ class IntentDetector:
             centroids[intent] = _centroid(vecs) if vecs else {}
 
         self.intent_centroids = centroids
+        self.intent_names = list(centroids)
+        self._build_postings()
+
+        if self.engine == SCORING_ENGINE_SPARSE:
+            self._build_centroid_matrix()
+
+    def _build_postings(self) -> None:
+        """
+        Dựng inverted index: token -> vị trí các intent có token đó trong centroid
+        """
+        postings: Dict[str, List[int]] = {}
+        for col, intent in enumerate(self.intent_names):
+            for tok, val in self.intent_centroids[intent].items():
+                if val:
+                    postings.setdefault(tok, []).append(col)
+        self.postings = {tok: tuple(cols) for tok, cols in postings.items()}
+
+    def _record_candidates(self, n_candidates: int) -> None:
+        """Cập nhật thống kê pruning cho 1 câu hỏi (vào shard của thread hiện tại)."""
+        try:
+            shard = self._stats_local.shard
+        except AttributeError:
+            shard = self._stats_local.shard = [0, 0, 0]
+            with self._stats_lock:
+                self._stats_shards.append(shard)
+        shard[0] += 1
+        shard[1] += n_candidates
+        shard[2] += len(self.intent_names) - n_candidates
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Thống kê candidate pruning kể từ khi khởi tạo
+
+        Returns:
+            Dict gồm queries, candidates_scored, candidates_pruned và pruned_ratio
+        """
+        with self._stats_lock:
+            shards = list(self._stats_shards)
+        queries, scored, pruned = (sum(column) for column in zip(*shards)) if shards else (0, 0, 0)
+        stats: Dict[str, float] = {"queries": queries, "candidates_scored": scored, "candidates_pruned": pruned}
+        total = stats["candidates_scored"] + stats["candidates_pruned"]
+        stats["pruned_ratio"] = stats["candidates_pruned"] / total if total else 0.0
+        return stats
+
+    def _build_centroid_matrix(self) -> None:
+        """
+        Đóng gói centroids thành ma trận CSR (indptr, indices, data) theo token
+
+        Vocab được cố định theo IDF nên token ngoài vocab luôn có trọng số 0.
+        """
+        self.vocab = {t: i for i, t in enumerate(self.idf)}
+
+        # Gom (intent, weight) theo từng token
+        rows: List[List[Tuple[int, float]]] = [[] for _ in self.vocab]
+        for col, intent in enumerate(self.intent_names):
+            for tok, val in self.intent_centroids[intent].items():
+                rows[self.vocab[tok]].append((col, val))
+
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for entries in rows:
+            for col, val in entries:
+                indices.append(col)
+                data.append(val)
+            indptr.append(len(indices))
+
+        self._csr_indptr = np.asarray(indptr, dtype=np.int64)
+        self._csr_indices = np.asarray(indices, dtype=np.int64)
+        self._csr_data = np.asarray(data, dtype=np.float64)
+
+    # ---------- Scoring engines ----------
+
+    def _score_dict(self, q_vec: Dict[str, float]) -> Tuple[str, float]:
+        """
+        Engine "dict": so sánh với centroid của các intent ứng viên bằng cosine similarity
+
+        Args:
+            q_vec: TF-IDF vector của câu hỏi
+
+        Returns:
+            Tuple (best_intent, best_score), best_intent rỗng nếu không có điểm > 0
+        """
+        # Ứng viên = các intent có chung ít nhất 1 token với câu hỏi
+        candidates = set()
+        for tok, val in q_vec.items():
+            if val:
+                candidates.update(self.postings.get(tok, ()))
+        self._record_candidates(len(candidates))
+
+        best_intent = ""
+        best_score = 0.0
+        # Duyệt theo thứ tự intent gốc để giữ nguyên quy tắc chọn khi bằng điểm
+        for col in sorted(candidates):
+            intent = self.intent_names[col]
+            score = (
+                    _cosine(q_vec, self.intent_centroids[intent]) * SCORE_BONUS
+            )  # Bonus cho intent bắt đầu bằng "hoi_"
+            if score > best_score:
+                best_score = score
+                best_intent = intent
+        return best_intent, best_score
+
+    def _score_sparse(self, q_vec: Dict[str, float]) -> Tuple[str, float]:
+        """
+        Engine "sparse": 1 phép nhân sparse (q^T x ma trận centroid) cho tất cả intents
+
+        Args:
+            q_vec: TF-IDF vector của câu hỏi
+
+        Returns:
+            Tuple (best_intent, best_score), cùng quy tắc chọn với engine "dict"
+        """
+        return self._score_sparse_many([q_vec])[0]
+
+    def _score_sparse_many(self, q_vecs: List[Dict[str, float]]) -> List[Tuple[str, float]]:
+        """
+        Engine "sparse" cho nhiều câu hỏi: chấm điểm cả batch bằng 1 phép nhân Q x ma trận centroid
+
+        Args:
+            q_vecs: TF-IDF vector của từng câu hỏi
+
+        Returns:
+            List (best_intent, best_score) theo thứ tự câu hỏi
+        """
+        n_intents = len(self.intent_names)
+        n_queries = len(q_vecs)
+
+        # Lấy các hàng (token) có trong vocab của từng câu hỏi
+        query_ids: List[int] = []
+        starts: List[int] = []
+        ends: List[int] = []
+        weights: List[float] = []
+        if n_intents:
+            indptr = self._csr_indptr
+            for qi, q_vec in enumerate(q_vecs):
+                for tok, val in q_vec.items():
+                    idx = self.vocab.get(tok)
+                    if idx is not None and val:
+                        query_ids.append(qi)
+                        starts.append(int(indptr[idx]))
+                        ends.append(int(indptr[idx + 1]))
+                        weights.append(val)
+        if not weights:
+            for _ in q_vecs:
+                self._record_candidates(0)
+            return [("", 0.0)] * n_queries
+
+        # Vị trí mọi phần tử khác 0 thuộc các hàng trên (ghép các đoạn [start, end) liên tiếp)
+        starts_arr = np.asarray(starts, dtype=np.int64)
+        lengths = np.asarray(ends, dtype=np.int64) - starts_arr
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(starts_arr - offsets, lengths)
+
+        # Cộng dồn theo ô (câu hỏi, intent) của ma trận điểm
+        cells = np.repeat(np.asarray(query_ids, dtype=np.int64), lengths) * n_intents + self._csr_indices[positions]
+        prod = self._csr_data[positions] * np.repeat(weights, lengths)
+        size = n_queries * n_intents
+        scores = np.bincount(cells, weights=prod, minlength=size).reshape(n_queries, n_intents) * SCORE_BONUS
+        # Trọng số TF-IDF đều dương nên ô có điểm > 0 đúng là intent có chung token với câu hỏi
+        n_candidates = np.count_nonzero(scores, axis=1)
+
+        # argmax lấy intent đầu tiên có điểm cao nhất (giống thứ tự duyệt dict)
+        best_cols = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(n_queries), best_cols]
+        results: List[Tuple[str, float]] = []
+        for qi in range(n_queries):
+            self._record_candidates(int(n_candidates[qi]))
+            best_score = float(best_scores[qi])
+            results.append((self.intent_names[int(best_cols[qi])], best_score) if best_score > 0.0 else ("", 0.0))
+        return results
+
+    # ---------- Keyword backoff ----------
+
+    def _match_backoff(self, norm_text: str) -> str:
+        """
+        Tìm intent theo keyword backoff trong 1 lần duyệt văn bản
+
+        Args:
+            norm_text: Văn bản đã được chuẩn hóa
+
+        Returns:
+            Intent của keyword được chọn, hoặc chuỗi rỗng nếu không khớp keyword nào
+        """
+        with span("nlp.keyword_backoff"):
+            hits = self._backoff_automaton.find_all(norm_text)
+        if not hits:
+            return ""
+        if self.backoff_mode == BACKOFF_MODE_PRIORITY:
+            # Keyword khai báo trước thắng (giống duyệt dict theo thứ tự)
+            idx = min(h[2] for h in hits)
+        else:
+            # Dài nhất thắng, bằng nhau thì xuất hiện sớm hơn, rồi thứ tự khai báo
+            _, _, idx = min(hits, key=lambda h: (h[0] - h[1], h[0], h[2]))
+        return self._backoff_intents[idx]
 
     # ---------- Public API ----------
     def detect(
@@ -199,27 +541,97 @@ class IntentDetector:
         q_vec = self._tfidf_vec(q_tokens)  # Tính TF-IDF vector
 
         # So sánh với tất cả centroids
-        best_intent = ""
-        best_score = 0.0
-        for intent, centroid in self.intent_centroids.items():
-            score = (
-                    _cosine(q_vec, centroid) * 1.05
-            )  # Bonus cho intent bắt đầu bằng "hoi_"
-            if score > best_score:
-                best_score = score
-                best_intent = intent
+        if self.engine == SCORING_ENGINE_SPARSE:
+            best_intent, best_score = self._score_sparse(q_vec)
+        else:
+            best_intent, best_score = self._score_dict(q_vec)
+
+        return self._resolve(best_intent, best_score, lambda: normalize_for_kw_fn(text))
+
+    def detect_doc(self, doc: Doc) -> Tuple[str, float]:
+        """
+        Nhận diện intent của câu hỏi đã tiền xử lý
+
+        Dùng doc.intent_tokens cho TF-IDF và doc.norm cho keyword backoff,
+        không chuẩn hóa hay tách từ lại.
 
+        Args:
+            doc: Câu hỏi đã tiền xử lý
+
+        Returns:
+            Tuple (intent, confidence_score)
+        """
+        return self.detect_docs([doc])[0]
+
+    def detect_docs(self, docs: List[Doc]) -> List[Tuple[str, float]]:
+        """
+        Nhận diện intent cho nhiều câu hỏi đã tiền xử lý (chấm điểm theo batch)
+
+        Args:
+            docs: Danh sách câu hỏi đã tiền xử lý
+
+        Returns:
+            List (intent, confidence_score) theo thứ tự câu hỏi
+        """
+        best = self._score_many([self._tfidf_vec(doc.intent_tokens) for doc in docs])
+        return [
+            self._resolve(intent, score, lambda doc=doc: doc.norm)
+            for doc, (intent, score) in zip(docs, best)
+        ]
+
+    def detect_many(
+            self, texts: List[str], synonym_map: Dict[str, str], normalize_for_kw_fn
+    ) -> List[Tuple[str, float]]:
+        """
+        Nhận diện intent cho nhiều câu hỏi cùng lúc
+
+        Tokenize tất cả câu hỏi trong 1 lượt rồi chấm điểm cả batch với ma trận centroid.
+        Kết quả giống hệt việc gọi detect() cho từng câu.
+
+        Args:
+            texts: Danh sách câu hỏi
+            synonym_map: Mapping từ đồng nghĩa
+            normalize_for_kw_fn: Function chuẩn hóa văn bản cho keyword matching
+
+        Returns:
+            List (intent, confidence_score) theo thứ tự câu hỏi
+        """
+        best = self._score_many([self._tfidf_vec(tokenize_and_map(text, synonym_map)) for text in texts])
+        return [
+            self._resolve(intent, score, lambda text=text: normalize_for_kw_fn(text))
+            for text, (intent, score) in zip(texts, best)
+        ]
+
+    def _score_many(self, q_vecs: List[Dict[str, float]]) -> List[Tuple[str, float]]:
+        """Chấm điểm nhiều TF-IDF vector bằng engine đang dùng."""
+        with span("nlp.intent_scoring"):
+            if self.engine == SCORING_ENGINE_SPARSE:
+                return self._score_sparse_many(q_vecs)
+            return [self._score_dict(q_vec) for q_vec in q_vecs]
+
+    def _resolve(self, best_intent: str, best_score: float, get_norm_text: Callable[[], str]) -> Tuple[str, float]:
+        """
+        Chốt intent: dùng kết quả TF-IDF nếu đạt ngưỡng, ngược lại fallback bằng keyword
+
+        Args:
+            best_intent: Intent có điểm TF-IDF cao nhất (rỗng nếu không có)
+            best_score: Điểm TF-IDF cao nhất
+            get_norm_text: Trả về văn bản đã chuẩn hóa cho keyword matching (chỉ gọi khi cần)
+
+        Returns:
+            Tuple (intent, confidence_score)
+        """
         # Nếu đạt ngưỡng: trả về kết quả TF-IDF
         if best_intent and best_score >= self.threshold:
             return best_intent, best_score
 
         # Bước 2: Fallback bằng keyword matching
-        norm_text = normalize_for_kw_fn(text)
-        for kw, mapped_intent in self.intent_keyword_backoff.items():
-            if kw in norm_text:
-                # Trả về score cao hơn threshold để pass check
-                # Score = threshold + 0.01 để đảm bảo được chấp nhận
-                return mapped_intent, self.threshold + 0.01
+        norm_text = get_norm_text()
+        mapped_intent = self._match_backoff(norm_text)
+        if mapped_intent:
+            # Trả về score cao hơn threshold để pass check
+            # Score = threshold + 0.01 để đảm bảo được chấp nhận
+            return mapped_intent, self.threshold + 0.01
 
         # Nếu không match gì: trả về fallback
         return "fallback", best_score
@@ -0,0 +1,198 @@
+"""
+Intent Model Store - Lưu/đọc intent model đã biên dịch sẵn
+
+Tokenize ~34k mẫu câu trong intent.csv bằng Underthesea chiếm phần lớn thời
+gian khởi động. Module này ghi vocab, IDF và ma trận centroid (CSR theo token)
+ra một file nhị phân có version, gắn với content hash của intent.csv và
+synonym.csv. Khi khởi động, file được memory-map (không copy) thay vì tokenize lại.
+
+Định dạng file:
+    MAGIC (8 bytes) | độ dài header (uint32 LE) | header JSON (UTF-8) | các mảng
+Header chứa format_version, source_hash, vocab, intent_names và vị trí từng mảng.
+Các mảng được căn lề 8 bytes để đọc trực tiếp bằng np.frombuffer.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Không có NumPy thì luôn build lại từ intent.csv
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Tăng version khi thay đổi định dạng file hoặc cách tiền xử lý mẫu câu
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_MAGIC = b"HUCEINTM"
+ARTIFACT_PREFIX = "intent_model"
+
+_ALIGN = 8
+_ARRAY_DTYPES = {
+    "idf": "<f8",
+    "csr_indptr": "<i8",
+    "csr_indices": "<i8",
+    "csr_data": "<f8",
+}
+
+
+class IntentModel:
+    """Dữ liệu đã biên dịch của IntentDetector (vocab, IDF, ma trận centroid CSR)."""
+
+    __slots__ = ("source_hash", "vocab", "intent_names", "idf", "csr_indptr", "csr_indices", "csr_data")
+
+    def __init__(self, source_hash: str, vocab: List[str], intent_names: List[str], idf, csr_indptr,
+                 csr_indices, csr_data) -> None:
+        self.source_hash = source_hash
+        self.vocab = vocab
+        self.intent_names = intent_names
+        self.idf = idf
+        self.csr_indptr = csr_indptr
+        self.csr_indices = csr_indices
+        self.csr_data = csr_data
+
+
+def _tokenizer_version() -> str:
+    """Version của Underthesea (kết quả tách từ phụ thuộc vào version)."""
+    try:
+        from importlib.metadata import version
+        return version("underthesea")
+    except Exception:  # noqa: BLE001 - không có package thì dùng fallback split()
+        return "none"
+
+
+def compute_source_hash(*paths: str) -> str:
+    """
+    Tính content hash của các file nguồn (intent.csv, synonym.csv)
+
+    Hash còn gồm ARTIFACT_FORMAT_VERSION và version tokenizer để artifact
+    tự động bị bỏ qua khi cách tiền xử lý thay đổi.
+
+    Args:
+        paths: Đường dẫn các file nguồn (file không tồn tại được tính là rỗng)
+
+    Returns:
+        Chuỗi hex SHA-256
+    """
+    h = hashlib.sha256()
+    h.update(f"format={ARTIFACT_FORMAT_VERSION};tokenizer={_tokenizer_version()}".encode())
+    for path in paths:
+        h.update(b"\0" + os.path.basename(path).encode() + b"\0")
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+    return h.hexdigest()
+
+
+def artifact_path(artifact_dir: str, source_hash: str) -> str:
+    """Đường dẫn file artifact ứng với source hash."""
+    return os.path.join(artifact_dir, f"{ARTIFACT_PREFIX}-v{ARTIFACT_FORMAT_VERSION}-{source_hash[:16]}.bin")
+
+
+def save_intent_model(path: str, model: IntentModel) -> None:
+    """
+    Ghi intent model ra file (ghi file tạm rồi rename để không bao giờ đọc phải file dở dang)
+
+    Các artifact cũ (hash khác) trong cùng thư mục sẽ bị xóa.
+
+    Args:
+        path: Đường dẫn file đích
+        model: Intent model cần ghi
+    """
+    if np is None:
+        raise RuntimeError("Cần NumPy để ghi intent model")
+
+    arrays = {name: np.ascontiguousarray(getattr(model, name), dtype=dtype) for name, dtype in _ARRAY_DTYPES.items()}
+
+    # Tính offset (tương đối so với đầu vùng dữ liệu) cho từng mảng
+    layout: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {"offset": offset, "count": int(arr.size)}
+        offset += arr.nbytes
+        offset += (-offset) % _ALIGN
+
+    header = json.dumps({
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "source_hash": model.source_hash,
+        "vocab": list(model.vocab),
+        "intent_names": list(model.intent_names),
+        "arrays": layout,
+    }, ensure_ascii=False).encode("utf-8")
+    prefix_len = len(ARTIFACT_MAGIC) + 4 + len(header)
+    padding = (-prefix_len) % _ALIGN
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(ARTIFACT_MAGIC)
+        f.write(struct.pack("<I", len(header) + padding))
+        f.write(header + b" " * padding)
+        for name, arr in arrays.items():
+            f.write(arr.tobytes())
+            f.write(b"\0" * ((-arr.nbytes) % _ALIGN))
+    os.replace(tmp_path, path)
+
+    # Dọn các artifact cũ
+    pattern = os.path.join(directory or ".", f"{ARTIFACT_PREFIX}-v*.bin")
+    for old in glob.glob(pattern):
+        if os.path.abspath(old) != os.path.abspath(path):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def load_intent_model(path: str, expected_hash: str) -> Optional[IntentModel]:
+    """
+    Memory-map intent model từ file
+
+    Args:
+        path: Đường dẫn file artifact
+        expected_hash: Source hash hiện tại của intent.csv + synonym.csv
+
+    Returns:
+        IntentModel (các mảng trỏ thẳng vào vùng nhớ mmap, chỉ đọc),
+        hoặc None nếu file không tồn tại, sai version/hash hoặc bị hỏng
+    """
+    if np is None or not os.path.isfile(path):
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic_len = len(ARTIFACT_MAGIC)
+        if mm[:magic_len] != ARTIFACT_MAGIC:
+            raise ValueError("sai magic")
+        (header_len,) = struct.unpack("<I", mm[magic_len:magic_len + 4])
+        data_start = magic_len + 4 + header_len
+        header = json.loads(bytes(mm[magic_len + 4:data_start]).decode("utf-8"))
+
+        if header.get("format_version") != ARTIFACT_FORMAT_VERSION or header.get("source_hash") != expected_hash:
+            return None
+
+        arrays = {}
+        for name, dtype in _ARRAY_DTYPES.items():
+            spec = header["arrays"][name]
+            arrays[name] = np.frombuffer(mm, dtype=dtype, count=spec["count"], offset=data_start + spec["offset"])
+
+        vocab, intent_names = header["vocab"], header["intent_names"]
+        if (len(arrays["idf"]) != len(vocab) or len(arrays["csr_indptr"]) != len(vocab) + 1
+                or len(arrays["csr_indices"]) != len(arrays["csr_data"])):
+            raise ValueError("kích thước mảng không khớp")
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        logger.warning(f"Bỏ qua intent model artifact hỏng {path}: {e}")
+        return None
+
+    return IntentModel(expected_hash, vocab, intent_names, arrays["idf"], arrays["csr_indptr"],
+                       arrays["csr_indices"], arrays["csr_data"])
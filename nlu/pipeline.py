@@ -1,26 +1,20 @@
 """NLP Pipeline - Intent detection và Entity extraction."""
 
 import csv
+import logging
 import os
 from typing import List, Dict, Tuple, Any, Optional
 
-try:
-    from underthesea import word_tokenize
-except ImportError:
-    def word_tokenize(text: str):
-        return text.split()
-
-try:
-    from underthesea import ner as uts_ner
-except ImportError:
-    uts_ner = None
-
 try:
     from .preprocess import normalize_text as ext_normalize_text
     from .preprocess import tokenize_and_map as ext_tokenize_and_map
+    from .preprocess import get_text_cache_stats
+    from .preprocess import SynonymMap
 except ImportError:
     ext_normalize_text = None
     ext_tokenize_and_map = None
+    get_text_cache_stats = None
+    SynonymMap = dict
 
 try:
     from .intent import IntentDetector
@@ -32,9 +26,30 @@ try:
 except ImportError:
     EntityExtractor = None
 
-from config import DATA_DIR, get_intent_threshold
+from config import (
+    DATA_DIR, get_intent_threshold, get_intent_scoring_engine, get_intent_backoff_mode,
+    get_intent_model_cache_enabled, get_artifact_dir,
+)
+from utils.metrics import span
+from utils.startup import phase
+from .doc import Doc
+from .model_store import compute_source_hash, artifact_path, load_intent_model, save_intent_model
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_INTENT_THRESHOLD = get_intent_threshold()
+DEFAULT_INTENT_SCORING_ENGINE = get_intent_scoring_engine()
+DEFAULT_INTENT_BACKOFF_MODE = get_intent_backoff_mode()
+
+# Heuristic câu hỏi về ngành: không override nếu câu hỏi nhắc tới mã ngành, điểm, học phí, tuyển sinh...
+# (Với câu hỏi ngắn, ~40 lần `kw in text` ở tầng C nhanh hơn automaton thuần Python)
+MAJOR_EXCLUSION_KEYWORDS = ("ma nganh", "mã ngành", "ma ", " ma", "diem chuan", "điểm chuẩn", "diem ", "điểm ",
+                            "hoc phi", "học phí", "tien hoc", "tiền học", "chi phi", "chi phí",
+                            "chi tieu", "chỉ tiêu", "tuyen sinh", "tuyển sinh", "tuyen", "tuyển",
+                            "to hop", "tổ hợp", "khoi thi", "khối thi", "mon thi", "môn thi",
+                            "phuong thuc", "phương thức", "xet tuyen", "xét tuyển")
+MAJOR_INTRO_KEYWORDS = ("gioi thieu", "tim hieu", "mo ta", "la gi", "hoc gi", "ve nganh", "thong tin ve",
+                        "cho biet ve", "muon biet")
 
 
 def _normalize_text(text) -> str:
@@ -47,8 +62,8 @@ def _normalize_text(text) -> str:
 
 
 def _load_synonyms(path: str) -> Dict[str, str]:
-    """Load từ điển từ đồng nghĩa từ file CSV."""
-    mapping: Dict[str, str] = {}
+    """Load từ điển từ đồng nghĩa từ file CSV (SynonymMap: version được tính 1 lần)."""
+    mapping: Dict[str, str] = SynonymMap()
     if not os.path.isfile(path):
         return mapping
 
@@ -70,13 +85,22 @@ def _load_synonyms(path: str) -> Dict[str, str]:
 class NLPPipeline:
     """Pipeline xử lý ngôn ngữ tự nhiên chính."""
 
-    def __init__(self, data_dir: str = DATA_DIR, intent_threshold: float = DEFAULT_INTENT_THRESHOLD) -> None:
+    def __init__(self, data_dir: str = DATA_DIR, intent_threshold: float = DEFAULT_INTENT_THRESHOLD,
+                 intent_engine: str = DEFAULT_INTENT_SCORING_ENGINE, artifact_dir: Optional[str] = None,
+                 use_model_cache: Optional[bool] = None,
+                 intent_backoff_mode: str = DEFAULT_INTENT_BACKOFF_MODE) -> None:
         self.data_dir = data_dir
         self.intent_threshold = intent_threshold
-        self.syn_map = _load_synonyms(os.path.join(data_dir, "synonym.csv"))
-        self.intent_samples = self._load_intent_samples(os.path.join(data_dir, "intent.csv"))
+        self.intent_engine = intent_engine
+        self.intent_backoff_mode = intent_backoff_mode
+        self.artifact_dir = artifact_dir or get_artifact_dir()
+        self.use_model_cache = get_intent_model_cache_enabled() if use_model_cache is None else use_model_cache
+        with phase("pipeline.synonyms"):
+            self.syn_map = _load_synonyms(os.path.join(data_dir, "synonym.csv"))
+        self._intent_samples: Optional[Dict[str, List[List[str]]]] = None
+        self.intent_model_source = "none"  # "artifact" | "rebuilt" | "none"
 
-        # Keyword backoff rules
+        # Keyword backoff rules (thứ tự khai báo = độ ưu tiên khi nhiều keyword cùng khớp)
         self.intent_keyword_backoff: Dict[str, str] = {
             "điểm chuẩn": "hoi_diem_chuan", "diem chuan": "hoi_diem_chuan",
             "chỉ tiêu": "hoi_chi_tieu", "chi tieu": "hoi_chi_tieu",
@@ -119,14 +143,49 @@ class NLPPipeline:
             "liên hệ": "hoi_lien_he", "v-sat": "hoi_phuong_thuc", "vsat": "hoi_phuong_thuc",
         }
 
-        self._intent_detector: Optional[IntentDetector] = (
-            IntentDetector(self.intent_samples, self.intent_keyword_backoff, self.intent_threshold)
-            if IntentDetector is not None else None
-        )
-        self._entity_extractor: Optional[EntityExtractor] = (
-            EntityExtractor(self.data_dir, os.path.join(data_dir, "entity.json"), self.syn_map)
-            if EntityExtractor is not None else None
-        )
+        with phase("pipeline.intent_model"):
+            self._intent_detector: Optional[IntentDetector] = (
+                self._load_or_build_intent_detector() if IntentDetector is not None else None
+            )
+        with phase("pipeline.entity_extractor"):
+            self._entity_extractor: Optional[EntityExtractor] = (
+                EntityExtractor(self.data_dir, os.path.join(data_dir, "entity.json"), self.syn_map)
+                if EntityExtractor is not None else None
+            )
+
+    @property
+    def intent_samples(self) -> Dict[str, List[List[str]]]:
+        """Mẫu câu đã tokenize theo intent (chỉ tokenize khi thực sự cần)."""
+        if self._intent_samples is None:
+            self._intent_samples = self._load_intent_samples(os.path.join(self.data_dir, "intent.csv"))
+        return self._intent_samples
+
+    def _load_or_build_intent_detector(self) -> IntentDetector:
+        """
+        Dựng IntentDetector từ artifact biên dịch sẵn nếu hash khớp,
+        ngược lại tokenize intent.csv, build lại và ghi artifact mới.
+        """
+        source_hash, path = None, None
+        if self.use_model_cache:
+            source_hash = compute_source_hash(os.path.join(self.data_dir, "intent.csv"),
+                                              os.path.join(self.data_dir, "synonym.csv"))
+            path = artifact_path(self.artifact_dir, source_hash)
+            model = load_intent_model(path, source_hash)
+            if model is not None:
+                self.intent_model_source = "artifact"
+                return IntentDetector.from_model(model, self.intent_keyword_backoff, self.intent_threshold,
+                                                 engine=self.intent_engine, backoff_mode=self.intent_backoff_mode)
+
+        detector = IntentDetector(self.intent_samples, self.intent_keyword_backoff, self.intent_threshold,
+                                  engine=self.intent_engine, backoff_mode=self.intent_backoff_mode)
+        self.intent_model_source = "rebuilt"
+        if self.use_model_cache:
+            try:
+                save_intent_model(path, detector.to_model(source_hash))
+                logger.info(f"Đã ghi intent model artifact: {path}")
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Không ghi được intent model artifact {path}: {e}")
+        return detector
 
     def _load_intent_samples(self, path: str) -> Dict[str, List[List[str]]]:
         """Load mẫu câu cho intent detection."""
@@ -141,7 +200,7 @@ class NLPPipeline:
                 intent = (r.get("intent") or "").strip()
                 if not utt or not intent:
                     continue
-                toks = ext_tokenize_and_map(utt, self.syn_map) if ext_tokenize_and_map else utt.split()
+                toks = ext_tokenize_and_map(utt, self.syn_map, use_cache=False) if ext_tokenize_and_map else utt.split()
                 intent_to_samples.setdefault(intent, []).append(toks)
         return intent_to_samples
 
@@ -151,37 +210,123 @@ class NLPPipeline:
             return "fallback", 0.0
         return self._intent_detector.detect(text, self.syn_map, _normalize_text)
 
+    def text_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Thống kê cache chuẩn hóa/tách từ."""
+        if get_text_cache_stats is None:
+            return {}
+        return get_text_cache_stats()
+
+    def intent_stats(self) -> Dict[str, float]:
+        """Thống kê candidate pruning của intent detector."""
+        if self._intent_detector is None:
+            return {}
+        return self._intent_detector.get_stats()
+
+    def ner_stats(self) -> Dict[str, Any]:
+        """Thống kê bước NER (số lần chạy/bỏ qua, cache)."""
+        if self._entity_extractor is None:
+            return {}
+        return self._entity_extractor.get_ner_stats()
+
     def extract_entities(self, text: str) -> List[Dict[str, Any]]:
         """Trích xuất các entity trong câu hỏi."""
         if self._entity_extractor is None:
             return []
         return self._entity_extractor.extract(text)
 
+    def warm_up(self, texts: List[str]) -> None:
+        """Chạy thử pipeline để nạp sẵn các model lười (tách từ, NER) trước khi phục vụ request."""
+        with phase("warm_up.tokenizer"):  # Import underthesea + model tách từ
+            self.analyze_many(texts)
+        if self._entity_extractor is not None:
+            with phase("warm_up.ner"):
+                self._entity_extractor.warm_up()
+
+    def make_doc(self, text: str) -> Doc:
+        """Tiền xử lý câu hỏi 1 lần (chuẩn hóa, bỏ dấu, tách từ, mapping từ đồng nghĩa)."""
+        with span("nlp.preprocess"):
+            return Doc(text, self.syn_map)
+
+    def detect_intents(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """Nhận diện intent cho nhiều câu hỏi (chấm điểm theo batch)."""
+        return self.detect_intent_docs([self.make_doc(text) for text in texts])
+
+    def detect_intent_docs(self, docs: List[Doc]) -> List[Tuple[str, float]]:
+        """Nhận diện intent cho nhiều câu hỏi đã tiền xử lý."""
+        if self._intent_detector is None:
+            return [("fallback", 0.0) for _ in docs]
+        return self._intent_detector.detect_docs(docs)
+
+    def extract_doc_entities(self, doc: Doc) -> List[Dict[str, Any]]:
+        """Trích xuất các entity từ câu hỏi đã tiền xử lý."""
+        if self._entity_extractor is None:
+            return []
+        return self._entity_extractor.extract_doc(doc)
+
     def analyze(self, text: str) -> Dict[str, Any]:
         """Phân tích toàn diện câu hỏi từ người dùng."""
-        intent, score = self.detect_intent(text)
-        entities = self.extract_entities(text)
+        return self.analyze_doc(self.make_doc(text))
+
+    def analyze_doc(self, doc: Doc) -> Dict[str, Any]:
+        """Phân tích câu hỏi đã tiền xử lý (mọi bước dùng chung Doc)."""
+        return self._analyze_docs([doc])[0]
+
+    def analyze_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Phân tích nhiều câu hỏi cùng lúc
+
+        Các câu trùng nhau sau khi chuẩn hóa chỉ được phân tích 1 lần (dùng câu xuất hiện
+        đầu tiên làm đại diện); intent của các câu còn lại được chấm điểm theo batch.
+
+        Args:
+            texts: Danh sách câu hỏi
+
+        Returns:
+            List kết quả theo đúng thứ tự đầu vào, mỗi phần tử có dạng như analyze()
+        """
+        unique_texts: List[str] = []
+        slot_of: Dict[str, int] = {}
+        slots: List[int] = []
+        for text in texts:
+            key = _normalize_text(text)
+            if key not in slot_of:
+                slot_of[key] = len(unique_texts)
+                unique_texts.append(text)
+            slots.append(slot_of[key])
+
+        analyses = self._analyze_docs([self.make_doc(text) for text in unique_texts])
+
+        # Mỗi đầu vào nhận bản sao riêng để caller có thể sửa kết quả mà không ảnh hưởng câu trùng
+        return [
+            {**analyses[i], "entities": [dict(e) for e in analyses[i]["entities"]]}
+            for i in slots
+        ]
+
+    def _analyze_docs(self, docs: List[Doc]) -> List[Dict[str, Any]]:
+        """Intent (theo batch) + entities + heuristic cho từng Doc (stage nlp.analyze đo theo lần gọi/batch)."""
+        with span("nlp.analyze"):
+            analyses = []
+            for doc, (intent, score) in zip(docs, self.detect_intent_docs(docs)):
+                entities = self.extract_doc_entities(doc)
+                intent, score = self._apply_major_heuristic(doc, intent, score, entities)
+                analyses.append({"intent": intent, "score": score, "entities": entities})
+            return analyses
 
-        # Heuristic: Override intent cho câu hỏi rõ ràng về ngành học
-        norm_text = _normalize_text(text)
+    def _apply_major_heuristic(self, doc: Doc, intent: str, score: float,
+                               entities: List[Dict[str, Any]]) -> Tuple[str, float]:
+        """Heuristic: Override intent cho câu hỏi rõ ràng về ngành học."""
+        norm_text = doc.norm
         uncertain_intents = ["fallback", "tro_giup", "chao_hoi"]
         is_uncertain = intent in uncertain_intents or score < (self.intent_threshold + 0.15)
 
         if is_uncertain and entities:
             has_major = any(e.get("label") in ["TEN_NGANH", "CHUYEN_NGANH"] for e in entities)
             has_nganh_keyword = "nganh" in norm_text
-            exclusion_keywords = ["ma nganh", "mã ngành", "ma ", " ma", "diem chuan", "điểm chuẩn", "diem ", "điểm ",
-                                  "hoc phi", "học phí", "tien hoc", "tiền học", "chi phi", "chi phí",
-                                  "chi tieu", "chỉ tiêu", "tuyen sinh", "tuyển sinh", "tuyen", "tuyển",
-                                  "to hop", "tổ hợp", "khoi thi", "khối thi", "mon thi", "môn thi",
-                                  "phuong thuc", "phương thức", "xet tuyen", "xét tuyển"]
-            has_exclusion = any(kw in norm_text for kw in exclusion_keywords)
-            major_intro_keywords = ["gioi thieu", "tim hieu", "mo ta", "la gi", "hoc gi", "ve nganh", "thong tin ve",
-                                    "cho biet ve", "muon biet"]
-            has_intro_keyword = any(kw in norm_text for kw in major_intro_keywords)
+            has_exclusion = any(kw in norm_text for kw in MAJOR_EXCLUSION_KEYWORDS)
+            has_intro_keyword = any(kw in norm_text for kw in MAJOR_INTRO_KEYWORDS)
 
             if (has_major or (has_nganh_keyword and has_intro_keyword)) and not has_exclusion:
                 intent = "hoi_nganh_hoc"
                 score = self.intent_threshold + 0.15
 
-        return {"intent": intent, "score": score, "entities": entities}
+        return intent, score
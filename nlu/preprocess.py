@@ -6,20 +6,23 @@ Module này xử lý:
 - Tách từ bằng Underthesea
 - Mapping từ đồng nghĩa
 - Loại bỏ stopwords
+
+Kết quả chuẩn hóa và tách từ được cache (LRU, kích thước cấu hình qua
+TEXT_CACHE_SIZE). Cache tách từ có key gồm văn bản gốc và version của
+synonym map, nên đổi synonym map không bao giờ trả về kết quả cũ.
 """
 
+import hashlib
 import re
 from typing import Dict, List, Set
 
 import unicodedata
 
-# Import Underthesea cho tokenization tiếng Việt
-try:
-    from underthesea import word_tokenize
-except ImportError:  # fallback nếu không cài đặt được
-
-    def word_tokenize(text: str):
-        return text.split()
+from config import get_text_cache_size
+from utils.metrics import timed
+from .text_cache import LRUCache
+# Underthesea chỉ được import ở lần tách từ đầu tiên (giữ nguyên text nếu không cài)
+from .uts import word_tokenize
 
 # Từ dừng tiếng Việt (có thể mở rộng)
 VI_STOPWORDS: Set[str] = {
@@ -57,9 +60,107 @@ VI_STOPWORDS: Set[str] = {
 }
 
 
+# Cache dùng chung cho mọi caller trong process
+_normalize_cache = LRUCache(get_text_cache_size(), name="normalize")
+_tokenize_cache = LRUCache(get_text_cache_size(), name="tokenize")
+
+class SynonymMap(dict):
+    """
+    Dict từ đồng nghĩa -> từ chuẩn, nhớ sẵn version (content hash) của chính nó
+
+    Version được tính 1 lần ở lần hỏi đầu tiên và tự tính lại khi map bị sửa,
+    nên pipeline load map 1 lần rồi tách từ bao nhiêu câu cũng không hash lại.
+    """
+
+    __slots__ = ("_version", "__weakref__")
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._version = None
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = _hash_synonyms(self)
+        return self._version
+
+    def _invalidate(self) -> None:
+        self._version = None
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._invalidate()
+
+    def __ior__(self, other):
+        super().update(other)
+        self._invalidate()
+        return self
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._invalidate()
+
+    def setdefault(self, key, default=None):
+        self._invalidate()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._invalidate()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._invalidate()
+        return super().popitem()
+
+    def clear(self) -> None:
+        super().clear()
+        self._invalidate()
+
+
+def _hash_synonyms(synonym_map: Dict[str, str]) -> str:
+    h = hashlib.sha1()
+    for src, dst in sorted(synonym_map.items()):
+        h.update(f"{src}\0{dst}\0".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def synonym_map_version(synonym_map: Dict[str, str]) -> str:
+    """
+    Version (content hash) của synonym map, dùng làm 1 phần key của cache tách từ
+
+    SynonymMap trả version đã nhớ sẵn; dict thường bị hash lại mỗi lần gọi
+    (không giữ tham chiếu nào tới map), nên caller gọi thường xuyên nên bọc
+    map bằng SynonymMap như NLPPipeline.
+
+    Args:
+        synonym_map: Dict mapping từ đồng nghĩa -> từ chuẩn
+
+    Returns:
+        Chuỗi hex ngắn
+    """
+    if isinstance(synonym_map, SynonymMap):
+        return synonym_map.version
+    return _hash_synonyms(synonym_map)
+
+
+def get_text_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Thống kê hit/miss/eviction của cache chuẩn hóa và cache tách từ."""
+    return {"normalize": _normalize_cache.get_stats(), "tokenize": _tokenize_cache.get_stats()}
+
+
+def clear_text_caches() -> None:
+    """Xóa cache chuẩn hóa/tách từ."""
+    _normalize_cache.clear()
+    _tokenize_cache.clear()
+
+
 def normalize_text(text) -> str:
     """
-    Chuẩn hóa văn bản tiếng Việt
+    Chuẩn hóa văn bản tiếng Việt (có cache)
 
     Args:
         text: Văn bản cần chuẩn hóa
@@ -71,6 +172,18 @@ def normalize_text(text) -> str:
         - Loại bỏ ký tự đặc biệt (giữ lại chữ cái, số, khoảng trắng)
         - Chuẩn hóa khoảng trắng
     """
+    if not isinstance(text, str):
+        return _normalize_uncached(text)
+
+    norm = _normalize_cache.get(text)
+    if norm is None:
+        norm = _normalize_uncached(text)
+        _normalize_cache.put(text, norm)
+    return norm
+
+
+def _normalize_uncached(text) -> str:
+    """Chuẩn hóa văn bản tiếng Việt (không qua cache)."""
     if not isinstance(text, str):
         text = str(text) if text is not None else ""
 
@@ -93,13 +206,15 @@ def normalize_text(text) -> str:
     return text
 
 
-def tokenize_and_map(text: str, synonym_map: Dict[str, str]) -> List[str]:
+@timed("nlp.tokenize_and_map")
+def tokenize_and_map(text: str, synonym_map: Dict[str, str], use_cache: bool = True) -> List[str]:
     """
-    Tách từ và mapping từ đồng nghĩa
+    Tách từ và mapping từ đồng nghĩa (có cache)
 
     Args:
         text: Văn bản cần xử lý
         synonym_map: Dict mapping từ đồng nghĩa -> từ chuẩn
+        use_cache: False để bỏ qua cache (dùng khi xử lý hàng loạt mẫu câu lúc build model)
 
     Returns:
         List tokens đã được xử lý:
@@ -108,6 +223,19 @@ def tokenize_and_map(text: str, synonym_map: Dict[str, str]) -> List[str]:
         - Mapping từ đồng nghĩa
         - Loại bỏ stopwords
     """
+    if not use_cache or not isinstance(text, str):
+        return _tokenize_uncached(text, synonym_map)
+
+    key = (text, synonym_map_version(synonym_map))
+    toks = _tokenize_cache.get(key)
+    if toks is None:
+        toks = tuple(_tokenize_uncached(text, synonym_map))
+        _tokenize_cache.put(key, toks)
+    return list(toks)  # Bản sao để caller sửa list không làm hỏng cache
+
+
+def _tokenize_uncached(text: str, synonym_map: Dict[str, str]) -> List[str]:
+    """Tách từ và mapping từ đồng nghĩa (không qua cache)."""
     # Bước 1: Chuẩn hóa văn bản
     norm = normalize_text(text)
 
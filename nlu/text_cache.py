@@ -0,0 +1,109 @@
+"""
+LRU Cache - Cache có giới hạn kích thước cho các bước tiền xử lý văn bản
+
+Người dùng thường gửi lặp lại cùng 1 câu hỏi ("điểm chuẩn ngành ..."), trong khi
+tách từ bằng Underthesea là bước tốn thời gian nhất của mỗi lần phân tích.
+Cache giữ kết quả của các câu gần đây nhất (LRU) và thống kê hit/miss/eviction.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Cache LRU an toàn với nhiều thread
+
+    maxsize <= 0 nghĩa là tắt cache (mọi lần get đều là miss và không lưu gì).
+    """
+
+    def __init__(self, maxsize: int, name: str = "") -> None:
+        """
+        Khởi tạo cache
+
+        Args:
+            maxsize: Số phần tử tối đa
+            name: Tên cache (dùng khi báo cáo thống kê)
+        """
+        self.name = name
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Lấy giá trị theo key (đánh dấu là vừa được dùng)
+
+        Args:
+            key: Key cần tra
+            default: Giá trị trả về khi không có trong cache
+
+        Returns:
+            Giá trị đã cache hoặc default
+        """
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Lưu giá trị, loại bỏ phần tử lâu nhất chưa dùng nếu vượt maxsize
+
+        Args:
+            key: Key
+            value: Giá trị (nên là immutable vì được trả về cho nhiều caller)
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize: int) -> None:
+        """Đổi kích thước tối đa (các phần tử thừa bị loại bỏ ngay)."""
+        with self._lock:
+            self.maxsize = max(0, int(maxsize))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Xóa toàn bộ cache và đặt lại thống kê."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Thống kê cache
+
+        Returns:
+            Dict gồm size, maxsize, hits, misses, evictions, hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,60 @@
+"""
+Underthesea lười - Chỉ import underthesea (kéo theo nltk, scipy, sklearn... ~1.5s) khi thật sự cần
+
+Import module này không tốn gì: `import main`, thu thập test và các tool CLI không phải
+trả chi phí của underthesea nếu không tách từ/NER.
+
+Underthesea tự nạp model vào biến global ở lần gọi đầu tiên nhưng không có khóa: nhiều
+thread cùng gọi lần đầu có thể thấy model mới nạp 1 nửa (featurizer=None → lỗi). Lần gọi
+đầu của mỗi hàm vì vậy được tuần tự hóa bằng 1 khóa; các lần sau không qua khóa.
+"""
+
+import importlib.util
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+_lock = threading.Lock()
+_funcs: Dict[str, Callable[..., Any]] = {}  # Chỉ chứa hàm đã gọi xong lần đầu (model đã nạp)
+_available: Optional[bool] = None
+
+
+def available() -> bool:
+    """Underthesea có được cài không (chỉ tìm package, không import)."""
+    global _available
+    if _available is None:
+        _available = importlib.util.find_spec("underthesea") is not None
+    return _available
+
+
+def is_loaded(name: str) -> bool:
+    """Model của hàm name ("word_tokenize" / "ner") đã được nạp chưa."""
+    return name in _funcs
+
+
+def _call(name: str, text: str) -> Any:
+    func = _funcs.get(name)
+    if func is not None:
+        return func(text)
+    with _lock:
+        func = _funcs.get(name)
+        if func is None:
+            import underthesea
+            func = getattr(underthesea, name)
+            result = func(text)  # Lần gọi đầu nạp model, giữ khóa cho tới khi xong
+            _funcs[name] = func
+            return result
+    return func(text)
+
+
+def word_tokenize(text: str) -> str:
+    """underthesea.word_tokenize(text, format mặc định); fallback giữ nguyên text nếu không cài."""
+    if not available():
+        return text
+    return _call("word_tokenize", text)
+
+
+def ner(text: str) -> List[Any]:
+    """underthesea.ner(text): list các tuple (word, pos, chunk, tag); rỗng nếu không cài."""
+    if not available():
+        return []
+    return _call("ner", text)
@@ -4,13 +4,15 @@ Services Package - Các dịch vụ xử lý nghiệp vụ cho backend
 Package này chứa:
 - nlp_service: Xử lý NLP và quản lý context hội thoại
 - csv_service: Xử lý dữ liệu từ các file CSV
+- context_backends: Lưu context hội thoại (memory, SQLite, Redis)
 """
 
 from . import csv_service
-from .nlp_service import get_nlp_service, NLPService
+from .nlp_service import get_nlp_service, peek_nlp_service, NLPService
 
 __all__ = [
     "get_nlp_service",
+    "peek_nlp_service",
     "NLPService",
     "csv_service",
 ]
@@ -0,0 +1,51 @@
+"""
+Context Backends - Các backend lưu context hội thoại
+
+- memory: ContextStore trong RAM (mặc định, chỉ dùng được với 1 process)
+- sqlite: File SQLite WAL dùng chung giữa các worker trên cùng 1 máy
+- redis: Redis (hoặc server tương thích RESP) dùng chung giữa nhiều máy
+
+Chọn backend qua biến môi trường CONTEXT_BACKEND.
+"""
+
+from typing import Optional
+
+from config import get_context_backend, get_context_sqlite_path, get_context_redis_url
+from services.context_store import ContextBackend, ContextStore
+from .resp import RespClient, RespError
+from .sqlite import SQLiteContextStore
+from .redis import RedisContextStore
+
+CONTEXT_BACKENDS = ("memory", "sqlite", "redis")
+
+
+def create_context_store(backend: Optional[str] = None) -> ContextBackend:
+    """
+    Tạo backend lưu context theo cấu hình
+
+    Args:
+        backend: memory/sqlite/redis (mặc định từ CONTEXT_BACKEND)
+
+    Returns:
+        ContextBackend
+    """
+    backend = (backend or get_context_backend()).strip().lower()
+    if backend == "memory":
+        return ContextStore()
+    if backend == "sqlite":
+        return SQLiteContextStore(get_context_sqlite_path())
+    if backend == "redis":
+        return RedisContextStore(RespClient.from_url(get_context_redis_url()))
+    raise ValueError(f"CONTEXT_BACKEND không hợp lệ: {backend!r} (chọn {', '.join(CONTEXT_BACKENDS)})")
+
+
+__all__ = [
+    "CONTEXT_BACKENDS",
+    "ContextBackend",
+    "ContextStore",
+    "RedisContextStore",
+    "RespClient",
+    "RespError",
+    "SQLiteContextStore",
+    "create_context_store",
+]
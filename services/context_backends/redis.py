@@ -0,0 +1,228 @@
+"""
+Redis Context Backend - Context dùng chung giữa nhiều instance
+
+Mỗi session gồm 2 key:
+- {prefix}{session_id}:f  hash các key của context (giá trị JSON) và version (__version__)
+- {prefix}{session_id}:h  list HistoryRecord.to_bytes(), giữ CONTEXT_HISTORY_LIMIT câu mới nhất (LTRIM)
+
+Mọi thao tác (kể cả thêm lịch sử + cập nhật fields + gia hạn TTL + đọc lại context)
+được gửi dạng pipeline: đúng 1 round trip mạng mỗi lượt hội thoại. TTL do Redis tự
+xử lý (PEXPIRE, gia hạn ở mỗi lần đọc/ghi), không cần sweeper.
+
+Ghi có kiểm tra version (expected_version) dùng WATCH/MULTI/EXEC: 2 round trip.
+
+Giá trị lưu dạng JSON (lịch sử: JSON nén zlib), đọc lại không bao giờ chạy code.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import get_context_history_limit, get_context_ttl_seconds
+from exceptions import ContextConflictError
+from services.context_store import (
+    ContextBackend,
+    HISTORY_KEY,
+    HistoryRecord,
+    HistoryView,
+    _dumps_json,
+    _loads_field,
+    _new_version,
+    _records_from_bytes,
+    _to_records,
+)
+from .resp import RespClient
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX_DEFAULT = "huce:ctx:"
+VERSION_FIELD = "__version__"
+
+Command = Tuple[Any, ...]
+
+
+class RedisContextStore(ContextBackend):
+    """
+    Backend context lưu trên Redis (hoặc server tương thích giao thức RESP)
+
+    Ví dụ:
+        store = RedisContextStore(RespClient.from_url("redis://localhost:6379/0"))
+    """
+
+    name = "redis"
+
+    def __init__(self, client: RespClient, ttl_seconds: Optional[float] = None,
+                 prefix: str = KEY_PREFIX_DEFAULT) -> None:
+        """
+        Khởi tạo backend
+
+        Args:
+            client: RespClient đã cấu hình
+            ttl_seconds: Thời gian không hoạt động tối đa (mặc định từ CONTEXT_TTL_SECONDS, 0 = không hết hạn)
+            prefix: Tiền tố key
+        """
+        super().__init__()
+        self.client = client
+        self.ttl_seconds = max(0.0, ttl_seconds if ttl_seconds is not None else get_context_ttl_seconds())
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"round_trips": 0, "commands": 0, "conflicts": 0}
+
+    # ---------- API ----------
+
+    def get_versioned(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        return self._read_many([session_id])[0]
+
+    def get_many(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        return [context for context, _ in self._read_many(session_ids)]
+
+    def _read_many(self, session_ids: List[str]) -> List[Tuple[Dict[str, Any], int]]:
+        if not session_ids:
+            return []
+        commands: List[Command] = []
+        for session_id in session_ids:
+            commands += self._expire_commands(session_id)
+            commands += self._read_commands(session_id)
+        replies = self._pipeline(commands)
+        step = len(commands) // len(session_ids)  # Số lệnh của mỗi session
+        return [self._parse(replies[i * step + step - 2], replies[i * step + step - 1])
+                for i in range(len(session_ids))]
+
+    def set(self, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        fields_key, history_key = self._keys(session_id)
+        fields = {key: value for key, value in context.items() if key != HISTORY_KEY}
+        records = _to_records(context.get(HISTORY_KEY)) if HISTORY_KEY in context else []
+        commands: List[Command] = [("DEL", fields_key, history_key)]
+        commands += self._write_commands(session_id, records, fields)
+        self._pipeline(commands)
+        return context
+
+    def update(self, session_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        history = fields.get(HISTORY_KEY) if HISTORY_KEY in fields else None
+        fields = {key: value for key, value in fields.items() if key != HISTORY_KEY}
+        commands: List[Command] = []
+        records: List[HistoryRecord] = []
+        if history is not None:
+            commands.append(("DEL", self._keys(session_id)[1]))
+            records = _to_records(history)
+        commands += self._write_commands(session_id, records, fields)
+        commands += self._read_commands(session_id)
+        replies = self._pipeline(commands)
+        return self._parse(replies[-2], replies[-1])[0]
+
+    def append_history(self, session_id: str, entry: Dict[str, Any],
+                       fields: Optional[Dict[str, Any]] = None,
+                       expected_version: Optional[int] = None) -> Dict[str, Any]:
+        commands = self._append_commands(session_id, entry, fields)
+        commands += self._read_commands(session_id)
+        if expected_version is None:
+            replies = self._pipeline(commands)
+            return self._parse(replies[-2], replies[-1])[0]
+
+        fields_key, history_key = self._keys(session_id)
+        current: List[int] = []
+
+        def build(reads: List[Any]) -> Optional[List[Command]]:
+            current.append(int(reads[0] or 0))
+            return commands if current[0] == expected_version else None
+
+        with self._lock:
+            self.stats["round_trips"] += 2
+            self.stats["commands"] += len(commands) + 4
+        replies = self.client.transaction([fields_key, history_key], [("HGET", fields_key, VERSION_FIELD)], build)
+        if replies is None:  # Version khác hoặc bị client khác ghi trước EXEC
+            with self._lock:
+                self.stats["conflicts"] += 1
+            raise ContextConflictError(session_id=session_id, expected_version=expected_version,
+                                       current_version=current[0] if current else None)
+        return self._parse(replies[-2], replies[-1])[0]
+
+    def append_many(self, items: List[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]) -> None:
+        """Thêm nhiều entry trong 1 pipeline."""
+        commands: List[Command] = []
+        for session_id, entry, fields in items:
+            commands += self._append_commands(session_id, entry, fields)
+        self._pipeline(commands)
+
+    def reset(self, session_id: str) -> None:
+        self._pipeline([("DEL", *self._keys(session_id))])
+
+    def __len__(self) -> int:
+        """Số session (duyệt SCAN toàn bộ key, chỉ dùng để thống kê/kiểm thử)."""
+        sessions = set()
+        cursor = b"0"
+        while True:
+            cursor, keys = self._pipeline([("SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", 1000)])[0]
+            sessions.update(key.decode("utf-8").rsplit(":", 1)[0] for key in keys)
+            if cursor == b"0":
+                return len(sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return bool(self._pipeline([("EXISTS", *self._keys(session_id))])[0])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        return {"backend": self.name, "server": f"{self.client.host}:{self.client.port}/{self.client.db}",
+                "ttl_seconds": self.ttl_seconds, **stats}
+
+    def close(self) -> None:
+        super().close()
+        self.client.close()
+
+    # ---------- Nội bộ ----------
+
+    def _keys(self, session_id: str) -> Tuple[str, str]:
+        base = f"{self.prefix}{session_id}"
+        return f"{base}:f", f"{base}:h"
+
+    def _pipeline(self, commands: Sequence[Command]) -> List[Any]:
+        with self._lock:
+            self.stats["round_trips"] += 1
+            self.stats["commands"] += len(commands)
+        return self.client.pipeline(commands)
+
+    def _expire_commands(self, session_id: str) -> List[Command]:
+        if not self.ttl_seconds:
+            return []
+        ttl_ms = int(self.ttl_seconds * 1000)
+        return [("PEXPIRE", key, ttl_ms) for key in self._keys(session_id)]
+
+    def _read_commands(self, session_id: str) -> List[Command]:
+        fields_key, history_key = self._keys(session_id)
+        return [("HGETALL", fields_key), ("LRANGE", history_key, 0, -1)]
+
+    def _write_commands(self, session_id: str, records: List[HistoryRecord],
+                        fields: Dict[str, Any]) -> List[Command]:
+        fields_key, history_key = self._keys(session_id)
+        commands: List[Command] = []
+        if records:
+            commands.append(("RPUSH", history_key, *(record.to_bytes() for record in records)))
+            commands.append(("LTRIM", history_key, -max(1, get_context_history_limit()), -1))
+        flat: List[Any] = [VERSION_FIELD, _new_version()]
+        for key, value in fields.items():
+            flat += [key, _dumps_json(value)]
+        commands.append(("HSET", fields_key, *flat))
+        return commands + self._expire_commands(session_id)
+
+    def _append_commands(self, session_id: str, entry: Dict[str, Any],
+                         fields: Optional[Dict[str, Any]]) -> List[Command]:
+        fields = {key: value for key, value in (fields or {}).items() if key != HISTORY_KEY}
+        return self._write_commands(session_id, [HistoryRecord(entry)], fields)
+
+    @staticmethod
+    def _parse(flat_fields: List[bytes], history: List[bytes]) -> Tuple[Dict[str, Any], int]:
+        context: Dict[str, Any] = {}
+        version = 0
+        records = _records_from_bytes(history or [])
+        if records:
+            context[HISTORY_KEY] = HistoryView(records)
+        for i in range(0, len(flat_fields or []), 2):
+            key = flat_fields[i].decode("utf-8")
+            if key == VERSION_FIELD:
+                version = int(flat_fields[i + 1])
+            else:
+                ok, value = _loads_field(key, flat_fields[i + 1])
+                if ok:
+                    context[key] = value
+        return context, version
@@ -0,0 +1,226 @@
+"""
+RESP Client - Client tối giản cho giao thức Redis (RESP2)
+
+Chỉ cần socket của thư viện chuẩn, không phụ thuộc redis-py. Hỗ trợ gửi lệnh đơn,
+pipeline (nhiều lệnh gửi 1 lần, đọc kết quả 1 lần = 1 round trip) và giao dịch
+WATCH/MULTI/EXEC. Dùng pool kết nối nhỏ để nhiều thread gửi lệnh song song.
+"""
+
+import socket
+import threading
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+from urllib.parse import unquote, urlparse
+
+RespValue = Union[None, int, bytes, List[Any], "RespError"]
+
+
+class RespError(Exception):
+    """Lỗi do server trả về (dòng bắt đầu bằng "-")."""
+
+
+def _encode_arg(arg: Any) -> bytes:
+    if isinstance(arg, bytes):
+        return arg
+    if isinstance(arg, str):
+        return arg.encode("utf-8")
+    if isinstance(arg, (int, float)):
+        return repr(arg).encode("ascii")
+    raise TypeError(f"Tham số RESP không hợp lệ: {type(arg).__name__}")
+
+
+def encode_command(args: Sequence[Any]) -> bytes:
+    """Mã hóa 1 lệnh thành mảng bulk string."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = _encode_arg(arg)
+        parts.append(b"$%d\r\n" % len(data))
+        parts.append(data)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+class _Connection:
+    """1 kết nối TCP kèm bộ đệm đọc."""
+
+    def __init__(self, host: str, port: int, timeout: float) -> None:
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rb")
+
+    def send(self, data: bytes) -> None:
+        self.sock.sendall(data)
+
+    def read_reply(self) -> RespValue:
+        line = self.file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Kết nối RESP bị đóng")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body
+        if kind == b"-":
+            return RespError(body.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.file.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Kết nối RESP bị đóng")
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [self.read_reply() for _ in range(length)]
+        raise ConnectionError(f"Phản hồi RESP không hợp lệ: {line[:20]!r}")
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespClient:
+    """
+    Client RESP an toàn với nhiều thread
+
+    Ví dụ:
+        client = RespClient.from_url("redis://localhost:6379/0")
+        client.execute("SET", "k", "v")
+        client.pipeline([("GET", "k"), ("TTL", "k")])
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, username: Optional[str] = None,
+                 timeout: float = 5.0, max_idle: int = 8) -> None:
+        self.host, self.port, self.db = host, port, db
+        self.username, self.password = username, password
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: List[_Connection] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RespClient":
+        """Tạo client từ URL dạng redis://[user:password@]host:port/db."""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", ""):
+            raise ValueError(f"URL Redis không hợp lệ: {url!r} (chỉ hỗ trợ redis://)")
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(host=parsed.hostname or "localhost", port=parsed.port or 6379, db=db,
+                   username=unquote(parsed.username) if parsed.username else None,
+                   password=unquote(parsed.password) if parsed.password else None, **kwargs)
+
+    def execute(self, *args: Any) -> RespValue:
+        """Gửi 1 lệnh, trả về kết quả (RespError được raise)."""
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands: Sequence[Sequence[Any]], raise_on_error: bool = True) -> List[RespValue]:
+        """
+        Gửi nhiều lệnh trong 1 lần ghi và đọc toàn bộ kết quả (1 round trip)
+
+        Args:
+            commands: Danh sách lệnh, mỗi lệnh là tuple (tên, tham số...)
+            raise_on_error: True = raise RespError đầu tiên, False = trả RespError trong list
+
+        Returns:
+            List kết quả theo thứ tự lệnh
+        """
+        if not commands:
+            return []
+        payload = b"".join(encode_command(command) for command in commands)
+        conn = self._acquire()
+        try:
+            conn.send(payload)
+            replies = [conn.read_reply() for _ in commands]
+        except BaseException:
+            conn.close()  # Kết nối hỏng hoặc đọc dở phản hồi: không trả về pool
+            raise
+        self._release(conn)
+        if raise_on_error:
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise reply
+        return replies
+
+    def transaction(self, watch: Sequence[str], reads: Sequence[Sequence[Any]],
+                    build: Callable[[List[RespValue]], Optional[Sequence[Sequence[Any]]]]) -> Optional[List[RespValue]]:
+        """
+        Giao dịch optimistic: WATCH + đọc, rồi MULTI/EXEC các lệnh ghi (2 round trip, cùng 1 kết nối)
+
+        Args:
+            watch: Các key cần theo dõi
+            reads: Lệnh đọc chạy sau WATCH
+            build: Nhận kết quả đọc, trả về lệnh ghi (None = hủy giao dịch)
+
+        Returns:
+            Kết quả các lệnh ghi, None nếu bị hủy hoặc key bị client khác sửa trước EXEC
+        """
+        conn = self._acquire()
+        try:
+            conn.send(b"".join(encode_command(command) for command in [("WATCH", *watch), *reads]))
+            replies = [conn.read_reply() for _ in range(len(reads) + 1)]
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise reply
+            commands = build(replies[1:])
+            if commands is None:
+                conn.send(encode_command(("UNWATCH",)))
+                conn.read_reply()
+                result = None
+            else:
+                conn.send(b"".join(encode_command(command) for command in [("MULTI",), *commands, ("EXEC",)]))
+                queued = [conn.read_reply() for _ in range(len(commands) + 1)]
+                result = conn.read_reply()
+                errors = [reply for reply in queued if isinstance(reply, RespError)]
+                if errors:
+                    raise errors[0]
+        except BaseException:
+            conn.close()  # Không biết kết nối đang ở trạng thái nào (WATCH/MULTI dở dang)
+            raise
+        self._release(conn)
+        # Lệnh lỗi lúc chạy (vd: sai kiểu key) nằm trong kết quả EXEC, các lệnh khác vẫn đã chạy
+        for reply in result or ():
+            if isinstance(reply, RespError):
+                raise reply
+        return result
+
+    def close(self) -> None:
+        """Đóng mọi kết nối đang rảnh."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _acquire(self) -> _Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn = _Connection(self.host, self.port, self.timeout)
+        handshake: List[Tuple[Any, ...]] = []
+        if self.password:
+            handshake.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            handshake.append(("SELECT", self.db))
+        if handshake:
+            try:
+                conn.send(b"".join(encode_command(command) for command in handshake))
+                for _ in handshake:
+                    reply = conn.read_reply()
+                    if isinstance(reply, RespError):
+                        raise reply
+            except BaseException:
+                conn.close()
+                raise
+        return conn
+
+    def _release(self, conn: _Connection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
@@ -0,0 +1,381 @@
+"""
+SQLite Context Backend - Context dùng chung giữa các worker trên cùng 1 máy
+
+File SQLite chạy ở chế độ WAL: nhiều process đọc song song trong khi 1 process ghi.
+Mọi thao tác ghi đi qua 1 thread ghi duy nhất (group commit): các thao tác đến trong
+lúc transaction trước đang commit được gộp vào transaction kế tiếp, nên khi tải cao
+số lần commit nhỏ hơn nhiều so với số request. Hàm ghi chỉ trả về sau khi commit
+xong, nên request sau (ở bất kỳ worker nào) luôn đọc được dữ liệu mới.
+
+TTL tính theo thời gian thực (time.time) vì được so sánh giữa nhiều process;
+hạn của session được gia hạn ở mỗi lần ghi.
+
+Version của session là số ngẫu nhiên 63 bit tạo mới ở mỗi lần ghi (không cần bộ đếm
+chung giữa các process), kiểm tra expected_version nằm trong transaction ghi.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import get_context_history_limit, get_context_ttl_seconds
+from exceptions import ContextConflictError
+from services.context_store import (
+    ContextBackend,
+    HISTORY_KEY,
+    HistoryRecord,
+    HistoryView,
+    _dumps_json,
+    _loads_field,
+    _new_version,
+    _records_from_bytes,
+    _to_records,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS context_sessions (
+    session_id TEXT PRIMARY KEY,
+    expires_at REAL,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS context_fields (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (session_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS context_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_context_history_session ON context_history (session_id, id);
+"""
+
+# Chu kỳ kiểm tra thread ghi còn sống trong lúc chờ 1 thao tác ghi
+_WRITER_POLL_SECONDS = 0.5
+
+_EXPIRED = "SELECT 1 FROM context_sessions WHERE session_id = ? AND expires_at IS NOT NULL AND expires_at <= ?"
+
+
+class _WriteOp:
+    """1 thao tác ghi chờ thread ghi thực hiện."""
+
+    __slots__ = ("fn", "done", "result", "error")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any]) -> None:
+        self.fn = fn
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SQLiteContextStore(ContextBackend):
+    """
+    Backend context lưu trong file SQLite (WAL + group commit)
+
+    Ví dụ:
+        store = SQLiteContextStore("artifacts/context.sqlite3")
+        store.append_history("s1", {"message": "...", "intent": "...", "response": {...}})
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, sweep_interval: Optional[float] = None,
+                 max_batch: int = 256, timeout: float = 30.0) -> None:
+        """
+        Mở (hoặc tạo) file SQLite
+
+        Args:
+            path: Đường dẫn file
+            ttl_seconds: Thời gian không hoạt động tối đa (mặc định từ CONTEXT_TTL_SECONDS, 0 = không hết hạn)
+            sweep_interval: Chu kỳ quét session hết hạn (mặc định từ CONTEXT_SWEEP_INTERVAL_SECONDS)
+            max_batch: Số thao tác ghi tối đa gộp trong 1 transaction
+            timeout: Thời gian chờ khóa ghi (giây) khi nhiều process cùng ghi
+        """
+        super().__init__(sweep_interval)
+        self.path = path
+        self.ttl_seconds = max(0.0, ttl_seconds if ttl_seconds is not None else get_context_ttl_seconds())
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[_WriteOp]]" = queue.Queue()
+        self.stats: Dict[str, int] = {"writes": 0, "transactions": 0, "max_batch_seen": 0, "conflicts": 0}
+
+        writer_conn = self._connect()
+        writer_conn.execute("PRAGMA journal_mode=WAL")
+        writer_conn.executescript(_SCHEMA)
+        columns = {row[1] for row in writer_conn.execute("PRAGMA table_info(context_sessions)")}
+        if "version" not in columns:  # File tạo bởi phiên bản cũ
+            writer_conn.execute("ALTER TABLE context_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._writer = threading.Thread(target=self._write_loop, args=(writer_conn,),
+                                        name="context-sqlite-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- API ----------
+
+    def get_versioned(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        return self._read_many([session_id])[0]
+
+    def get_many(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        return [context for context, _ in self._read_many(session_ids)]
+
+    def set(self, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        fields = {key: value for key, value in context.items() if key != HISTORY_KEY}
+        records = _to_records(context.get(HISTORY_KEY)) if HISTORY_KEY in context else []
+        expires_at = self._expires_at()
+
+        def write(conn: sqlite3.Connection) -> None:
+            self._delete(conn, session_id)
+            self._write_session(conn, session_id, records, fields, expires_at)
+
+        self._submit(write)
+        return context
+
+    def update(self, session_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        history = fields.get(HISTORY_KEY) if HISTORY_KEY in fields else None
+        records = _to_records(history) if history is not None else None
+        fields = {key: value for key, value in fields.items() if key != HISTORY_KEY}
+        now, expires_at = time.time(), self._expires_at()
+
+        def write(conn: sqlite3.Connection) -> None:
+            self._drop_if_expired(conn, session_id, now)
+            if records is not None:
+                conn.execute("DELETE FROM context_history WHERE session_id = ?", (session_id,))
+            self._write_session(conn, session_id, records or [], fields, expires_at)
+
+        self._submit(write)
+        return self.get(session_id)
+
+    def append_history(self, session_id: str, entry: Dict[str, Any],
+                       fields: Optional[Dict[str, Any]] = None,
+                       expected_version: Optional[int] = None) -> Dict[str, Any]:
+        records = [HistoryRecord(entry)]
+        fields = {key: value for key, value in (fields or {}).items() if key != HISTORY_KEY}
+        now, expires_at = time.time(), self._expires_at()
+
+        def write(conn: sqlite3.Connection) -> None:
+            if expected_version is not None:
+                row = conn.execute("SELECT version, expires_at FROM context_sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+                current = row[0] if row is not None and (row[1] is None or row[1] > now) else 0
+                if current != expected_version:
+                    self.stats["conflicts"] += 1
+                    raise ContextConflictError(session_id=session_id, expected_version=expected_version,
+                                               current_version=current)
+            self._drop_if_expired(conn, session_id, now)
+            self._write_session(conn, session_id, records, fields, expires_at)
+
+        self._submit(write)
+        return self.get(session_id)
+
+    def append_many(self, items: List[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]) -> None:
+        """Thêm nhiều entry trong 1 transaction."""
+        prepared = [(session_id, [HistoryRecord(entry)],
+                     {key: value for key, value in (fields or {}).items() if key != HISTORY_KEY})
+                    for session_id, entry, fields in items]
+        now, expires_at = time.time(), self._expires_at()
+
+        def write(conn: sqlite3.Connection) -> None:
+            for session_id, records, session_fields in prepared:
+                self._drop_if_expired(conn, session_id, now)
+                self._write_session(conn, session_id, records, session_fields, expires_at)
+
+        self._submit(write)
+
+    def reset(self, session_id: str) -> None:
+        self._submit(lambda conn: self._delete(conn, session_id))
+
+    def sweep(self) -> int:
+        """Xóa mọi session đã hết hạn."""
+        now = time.time()
+
+        def write(conn: sqlite3.Connection) -> int:
+            expired = "SELECT session_id FROM context_sessions WHERE expires_at IS NOT NULL AND expires_at <= ?"
+            conn.execute(f"DELETE FROM context_history WHERE session_id IN ({expired})", (now,))
+            conn.execute(f"DELETE FROM context_fields WHERE session_id IN ({expired})", (now,))
+            return conn.execute("DELETE FROM context_sessions WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                                (now,)).rowcount
+
+        removed = self._submit(write)
+        if removed:
+            logger.debug(f"Context sweeper: xóa {removed} session hết hạn")
+        return removed
+
+    def __len__(self) -> int:
+        row = self._reader().execute(
+            "SELECT COUNT(*) FROM context_sessions WHERE expires_at IS NULL OR expires_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+    def __contains__(self, session_id: str) -> bool:
+        row = self._reader().execute(
+            "SELECT 1 FROM context_sessions WHERE session_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (session_id, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "path": self.path, "sessions": len(self), "ttl_seconds": self.ttl_seconds,
+                "pending_writes": self._queue.qsize(), **self.stats}
+
+    def close(self) -> None:
+        super().close()
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+
+    # ---------- Đọc ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: tự quản lý transaction (BEGIN/COMMIT)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")  # Đủ an toàn với WAL, không fsync mỗi commit
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _read_many(self, session_ids: List[str]) -> List[Tuple[Dict[str, Any], int]]:
+        conn = self._reader()
+        now = time.time()
+        conn.execute("BEGIN")  # Đọc mọi bảng trong cùng 1 snapshot
+        try:
+            return [self._read(conn, session_id, now) for session_id in session_ids]
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _read(conn: sqlite3.Connection, session_id: str, now: float) -> Tuple[Dict[str, Any], int]:
+        row = conn.execute("SELECT expires_at, version FROM context_sessions WHERE session_id = ?",
+                           (session_id,)).fetchone()
+        if row is None or (row[0] is not None and row[0] <= now):
+            return {}, 0
+        records = _records_from_bytes([blob for (blob,) in conn.execute(
+            "SELECT record FROM context_history WHERE session_id = ? ORDER BY id", (session_id,))])
+        context: Dict[str, Any] = {HISTORY_KEY: HistoryView(records)} if records else {}
+        for key, value in conn.execute("SELECT key, value FROM context_fields WHERE session_id = ?", (session_id,)):
+            ok, value = _loads_field(key, value)
+            if ok:
+                context[key] = value
+        return context, row[1]
+
+    # ---------- Ghi (chạy trong thread ghi) ----------
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, session_id: str) -> None:
+        for table in ("context_history", "context_fields", "context_sessions"):
+            conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+
+    def _drop_if_expired(self, conn: sqlite3.Connection, session_id: str, now: float) -> None:
+        # Session hết hạn nhưng sweeper chưa xóa: không để dữ liệu cũ "sống lại"
+        if conn.execute(_EXPIRED, (session_id, now)).fetchone():
+            self._delete(conn, session_id)
+
+    @staticmethod
+    def _write_session(conn: sqlite3.Connection, session_id: str, records: List[HistoryRecord],
+                       fields: Dict[str, Any], expires_at: Optional[float]) -> None:
+        if records:
+            conn.executemany("INSERT INTO context_history (session_id, record) VALUES (?, ?)",
+                             [(session_id, record.to_bytes()) for record in records])
+            # Chỉ giữ CONTEXT_HISTORY_LIMIT câu mới nhất
+            conn.execute(
+                "DELETE FROM context_history WHERE session_id = ? AND id <= ("
+                "SELECT id FROM context_history WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (session_id, session_id, max(1, get_context_history_limit())),
+            )
+        if fields:
+            conn.executemany("INSERT OR REPLACE INTO context_fields (session_id, key, value) VALUES (?, ?, ?)",
+                             [(session_id, key, _dumps_json(value))
+                              for key, value in fields.items()])
+        conn.execute("INSERT OR REPLACE INTO context_sessions (session_id, expires_at, version) VALUES (?, ?, ?)",
+                     (session_id, expires_at, _new_version()))
+
+    def _submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        if not self._writer.is_alive():
+            raise RuntimeError("SQLiteContextStore đã đóng")
+        op = _WriteOp(fn)
+        self._queue.put(op)
+        # Không chờ vô hạn: thread ghi chết hoặc bị treo thì request báo lỗi thay vì treo theo
+        deadline = time.monotonic() + 2 * self.timeout
+        while not op.done.wait(_WRITER_POLL_SECONDS):
+            if not self._writer.is_alive() and not op.done.is_set():
+                raise RuntimeError("SQLiteContextStore: thread ghi đã dừng")
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"SQLiteContextStore: thao tác ghi quá {2 * self.timeout:.0f}s")
+        if op.error is not None:
+            raise op.error
+        return op.result
+
+    def _write_loop(self, conn: sqlite3.Connection) -> None:
+        try:
+            while True:
+                op = self._queue.get()
+                if op is None:
+                    return
+                batch = [op]
+                # Gộp mọi thao tác đang chờ vào cùng 1 transaction
+                while len(batch) < self.max_batch:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        self._queue.put(None)  # Dừng sau khi ghi xong batch này
+                        break
+                    batch.append(nxt)
+                self._run_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: List[_WriteOp]) -> None:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    op.result = op.fn(conn)
+                    conn.execute("RELEASE op")
+                except sqlite3.OperationalError:
+                    raise  # Lỗi cả transaction (khóa, ổ đĩa...): báo lỗi cho cả batch
+                except Exception as e:  # Lỗi riêng của 1 thao tác: chỉ hủy thao tác đó
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    op.error = e
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"SQLite context: ghi thất bại ({len(batch)} thao tác): {e}", exc_info=True)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for op in batch:
+                op.error = op.error or e
+        finally:
+            self.stats["writes"] += len(batch)
+            self.stats["transactions"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            for op in batch:  # Luôn đánh thức request đang chờ, kể cả khi ROLLBACK lỗi
+                op.done.set()
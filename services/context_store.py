@@ -0,0 +1,654 @@
+"""
+Context Store - Lưu context hội thoại trong RAM có giới hạn
+
+Mỗi session (frontend tạo session_id mới mỗi lần tải trang) giữ tối đa
+CONTEXT_HISTORY_LIMIT câu hỏi kèm toàn bộ câu trả lời (có thể gồm hàng chục
+dòng dữ liệu). Để bộ nhớ không tăng mãi, store giới hạn:
+- Số session tối đa (vượt quá thì loại session lâu nhất không dùng - LRU)
+- Thời gian không hoạt động (TTL): session hết hạn bị xóa khi truy cập hoặc khi sweeper quét
+- Tổng dung lượng ước tính (byte): vượt quá thì loại session theo LRU
+
+Lịch sử hội thoại được lưu gọn: mỗi câu là 1 HistoryRecord (__slots__) gồm câu hỏi
+(cắt ngắn), intent, loại câu trả lời và payload đầy đủ đã nén (JSON + zlib). Intent/loại
+câu trả lời được dùng chung 1 chuỗi cho mọi session qua bảng intern có giới hạn.
+Mỗi session giữ lịch sử trong ring buffer (deque có maxlen) thay vì nối list mỗi lượt.
+Payload chỉ được giải nén khi cần (vd: /chat/context get). Dữ liệu lưu ở backend dùng chung
+(SQLite/Redis) đều là JSON, không dùng pickle: ai ghi được vào Redis/file SQLite cũng không
+chạy được code trong worker.
+
+Dung lượng được ước tính tăng dần: mỗi entry lịch sử chỉ được đo 1 lần khi thêm vào,
+các key khác được đo lại khi cập nhật qua set()/update().
+
+ContextBackend là interface chung; ContextStore là backend trong RAM (1 process).
+Backend dùng chung giữa nhiều worker/instance (SQLite, Redis) nằm trong services/context_backends.
+
+Ghi đồng thời (optimistic versioning): mỗi lần ghi gán cho session 1 version mới.
+Request đọc context kèm version (get_versioned), xử lý xong thì ghi kèm expected_version;
+nếu request khác đã ghi trước, append_history raise ContextConflictError và request
+đọc lại context rồi xử lý lại. Không có khóa nào được giữ trong lúc xử lý NLP,
+các session khác nhau không chờ nhau.
+"""
+
+import itertools
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from config import (
+    get_context_history_limit,
+    get_context_max_sessions,
+    get_context_ttl_seconds,
+    get_context_max_memory_mb,
+    get_context_sweep_interval_seconds,
+)
+from exceptions import ContextConflictError
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEY = "conversation_history"
+
+# Số ký tự câu hỏi giữ trong HistoryRecord (câu dài hơn được lưu đầy đủ trong payload)
+MESSAGE_PREVIEW_CHARS = 200
+
+
+def _json_default(obj: Any) -> Any:
+    if hasattr(obj, "item"):  # Số kiểu numpy
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _dumps_json(value: Any) -> bytes:
+    """Giá trị context -> JSON UTF-8 (tuple thành list, object lạ thành chuỗi)."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _loads_json(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Ước tính dung lượng bộ nhớ (byte) của object JSON-like (dict/list/str/số)
+
+    Args:
+        obj: Object cần đo
+
+    Returns:
+        Tổng sys.getsizeof của object và mọi phần tử con
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+# Bảng intern intent/loại câu trả lời (mỗi chuỗi chỉ lưu 1 lần cho mọi session). Nhãn do client
+# gửi lên (/chat/context set) là tùy ý nên bảng có giới hạn: đầy rồi thì nhãn mới được giữ
+# nguyên là chuỗi riêng của record (tính vào dung lượng session, được giải phóng cùng session)
+MAX_INTERNED_LABELS = 256
+MAX_INTERNED_LABEL_CHARS = 64
+_LABELS: Dict[str, str] = {}
+_LABEL_LOCK = threading.Lock()
+
+
+def _intern_label(label: Any) -> Tuple[Optional[str], bool]:
+    """
+    Chuỗi dùng chung cho nhãn nếu có thể
+
+    Returns:
+        (nhãn, True nếu là chuỗi dùng chung trong bảng intern)
+    """
+    if label is None:
+        return None, True
+    if not isinstance(label, str):
+        return label, False
+    shared = _LABELS.get(label)
+    if shared is not None:
+        return shared, True
+    if len(label) > MAX_INTERNED_LABEL_CHARS or len(_LABELS) >= MAX_INTERNED_LABELS:
+        return label, False
+    with _LABEL_LOCK:
+        if len(_LABELS) < MAX_INTERNED_LABELS:
+            return _LABELS.setdefault(label, label), True
+    return label, False
+
+
+class HistoryRecord:
+    """
+    1 câu trong lịch sử hội thoại (dạng gọn)
+
+    Entry gốc {"message", "intent", "response", ...} được tách thành câu hỏi (cắt ngắn),
+    intent, loại câu trả lời và payload nén chứa phần còn lại. raw=True: entry không phải
+    dict, được lưu nguyên trong payload.
+    """
+
+    __slots__ = ("message", "intent", "response_type", "raw", "payload", "nbytes")
+
+    def __init__(self, entry: Any) -> None:
+        """
+        Đóng gói 1 entry lịch sử
+
+        Args:
+            entry: Dict {"message", "intent", "response", ...} (object khác được lưu nguyên trong payload)
+        """
+        if isinstance(entry, dict):
+            message = entry.get("message")
+            rest = {k: v for k, v in entry.items() if k not in ("message", "intent")}
+            if isinstance(message, str) and len(message) > MESSAGE_PREVIEW_CHARS:
+                rest["message"] = message
+                message = message[:MESSAGE_PREVIEW_CHARS]
+            response = entry.get("response")
+            response_type = response.get("type") if isinstance(response, dict) else None
+            self._set_fields(message, entry.get("intent"), response_type, False,
+                             zlib.compress(_dumps_json(rest), 1))
+        else:
+            self._set_fields(None, None, None, True,
+                             zlib.compress(_dumps_json(entry), 1))
+
+    def _set_fields(self, message: Optional[str], intent: Any, response_type: Any, raw: bool,
+                    payload: bytes) -> None:
+        self.message = message
+        self.intent, intent_shared = _intern_label(intent)
+        self.response_type, type_shared = _intern_label(response_type)
+        self.raw = raw
+        self.payload = payload
+        # Nhãn dùng chung không tính vào record; nhãn riêng thì tính
+        self.nbytes = (sys.getsizeof(self) + sys.getsizeof(payload)
+                       + (sys.getsizeof(message) if message is not None else 0)
+                       + (0 if intent_shared else sys.getsizeof(self.intent))
+                       + (0 if type_shared else sys.getsizeof(self.response_type)))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HistoryRecord":
+        """
+        Đọc record đã ghi bằng to_bytes() (dùng cho backend SQLite/Redis)
+
+        Raises:
+            ValueError: Dữ liệu không đúng định dạng
+        """
+        header, sep, payload = bytes(data).partition(b"\n")
+        fields = _loads_json(header) if sep else None
+        if not isinstance(fields, list) or len(fields) != 4:
+            raise ValueError("HistoryRecord không đúng định dạng")
+        message, intent, response_type, raw = fields
+        if message is not None and not isinstance(message, str):
+            raise ValueError("HistoryRecord không đúng định dạng")
+        record = cls.__new__(cls)
+        raw = bool(raw)
+        record._set_fields(message, None if raw else intent, None if raw else response_type, raw, payload)
+        return record
+
+    def to_bytes(self) -> bytes:
+        """Ghi record thành bytes: 1 dòng JSON [message, intent, response_type, raw] + payload JSON đã nén."""
+        return _dumps_json([self.message, self.intent, self.response_type, self.raw]) + b"\n" + self.payload
+
+    def to_dict(self) -> Any:
+        """Dựng lại entry đầy đủ (giải nén payload)."""
+        payload = _loads_json(zlib.decompress(self.payload))
+        if self.raw:
+            return payload
+        entry = {"message": payload.pop("message", self.message), "intent": self.intent}
+        entry.update(payload)
+        return entry
+
+    def to_summary(self) -> Dict[str, Any]:
+        """Entry rút gọn (không giải nén payload): câu hỏi, intent, loại câu trả lời."""
+        return {"message": self.message, "intent": self.intent, "response_type": self.response_type}
+
+
+class HistoryView(Sequence):
+    """
+    Lịch sử hội thoại dạng chỉ đọc, giải nén từng entry khi được truy cập
+
+    Là ảnh chụp tại thời điểm lấy context: các câu thêm sau đó không làm thay đổi view.
+    """
+
+    __slots__ = ("records",)
+
+    def __init__(self, records: Sequence[HistoryRecord]) -> None:
+        self.records: Tuple[HistoryRecord, ...] = tuple(records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [record.to_dict() for record in self.records[index]]
+        return self.records[index].to_dict()
+
+    def __iter__(self) -> Iterator[Any]:
+        return (record.to_dict() for record in self.records)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, HistoryView):
+            return self.records == other.records
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"HistoryView({len(self.records)} entries)"
+
+
+_random = random.SystemRandom()
+
+
+def _new_version() -> int:
+    """Version ngẫu nhiên 63 bit cho backend dùng chung (không cần bộ đếm chung giữa các process)."""
+    return _random.getrandbits(63) or 1
+
+
+def _records_from_bytes(blobs: Sequence[bytes]) -> List[HistoryRecord]:
+    """Đọc các record từ backend dùng chung, bỏ qua record hỏng hoặc định dạng cũ (pickle)."""
+    records = []
+    for blob in blobs:
+        try:
+            records.append(HistoryRecord.from_bytes(blob))
+        except ValueError:
+            logger.warning("Bỏ qua 1 câu trong lịch sử hội thoại không đọc được")
+    return records
+
+
+def _loads_field(key: str, data: bytes) -> Tuple[bool, Any]:
+    """Đọc 1 key context từ backend dùng chung: (True, giá trị) hoặc (False, None) nếu không đọc được."""
+    try:
+        return True, _loads_json(data)
+    except ValueError:
+        logger.warning(f"Bỏ qua key context không đọc được: {key}")
+        return False, None
+
+
+def _to_records(history: Any, limit: Optional[int] = None) -> List[HistoryRecord]:
+    """
+    Lịch sử (list entry hoặc HistoryView) -> HistoryRecord của limit câu mới nhất
+
+    Cắt trước khi đóng gói: client gửi lịch sử dài (/chat/context set) không tốn công nén
+    các câu sẽ bị bỏ ngay sau đó.
+    """
+    limit = max(1, get_context_history_limit() if limit is None else limit)
+    if isinstance(history, HistoryView):
+        return list(history.records[-limit:])
+    return [HistoryRecord(entry) for entry in list(history or [])[-limit:]]
+
+
+def export_context(context: Dict[str, Any], full: bool = True) -> Dict[str, Any]:
+    """
+    Chuyển context (kết quả get()) thành dict JSON được
+
+    Args:
+        context: Context có conversation_history là HistoryView
+        full: True = dựng lại entry đầy đủ (giải nén), False = chỉ câu hỏi/intent/loại câu trả lời
+    """
+    context = dict(context)
+    history = context.get(HISTORY_KEY)
+    if isinstance(history, HistoryView):
+        context[HISTORY_KEY] = [r.to_dict() if full else r.to_summary() for r in history.records]
+    return context
+
+
+class ContextBackend:
+    """
+    Interface chung của các backend lưu context
+
+    get()/set()/update()/append_history()/reset() là bắt buộc. get_many()/append_many()
+    mặc định gọi lần lượt; backend qua mạng ghi đè để gộp thành 1 round trip (pipeline).
+    """
+
+    name = "base"
+    # I/O chặn (đĩa/mạng): handler async gọi qua thread thay vì chạy thẳng trên event loop
+    blocking = True
+
+    def __init__(self, sweep_interval: Optional[float] = None) -> None:
+        self.sweep_interval = max(0.1, sweep_interval if sweep_interval is not None
+                                  else get_context_sweep_interval_seconds())
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Lấy context của session ({} nếu chưa có hoặc đã hết hạn)."""
+        return self.get_versioned(session_id)[0]
+
+    def get_versioned(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        """Lấy context kèm version hiện tại (0 nếu session chưa có hoặc đã hết hạn)."""
+        raise NotImplementedError
+
+    def set(self, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Ghi đè toàn bộ context của session."""
+        raise NotImplementedError
+
+    def update(self, session_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Cập nhật 1 số key của context."""
+        raise NotImplementedError
+
+    def append_history(self, session_id: str, entry: Dict[str, Any],
+                       fields: Optional[Dict[str, Any]] = None,
+                       expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Thêm entry vào lịch sử hội thoại và cập nhật fields trong cùng 1 thao tác
+
+        Args:
+            session_id: ID session
+            entry: {"message", "intent", "response", ...}
+            fields: Các key khác cần cập nhật cùng lúc (vd: last_intent, last_entities)
+            expected_version: Version đọc được từ get_versioned (None = không kiểm tra)
+
+        Returns:
+            Context sau khi cập nhật
+
+        Raises:
+            ContextConflictError: Version hiện tại khác expected_version
+        """
+        raise NotImplementedError
+
+    def reset(self, session_id: str) -> None:
+        """Xóa context của session."""
+        raise NotImplementedError
+
+    def get_many(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        """Lấy context của nhiều session (cùng thứ tự)."""
+        return [self.get(session_id) for session_id in session_ids]
+
+    def append_many(self, items: List[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]) -> None:
+        """Thêm nhiều entry (session_id, entry, fields) vào lịch sử."""
+        for session_id, entry, fields in items:
+            self.append_history(session_id, entry, fields)
+
+    def export(self, session_id: str, full: bool = True) -> Dict[str, Any]:
+        """Lấy context dạng JSON được (xem export_context)."""
+        return export_context(self.get(session_id), full)
+
+    def sweep(self) -> int:
+        """Xóa session hết hạn, trả về số session bị xóa (backend tự hết hạn thì không làm gì)."""
+        return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê backend."""
+        return {"backend": self.name}
+
+    def close(self) -> None:
+        """Giải phóng kết nối/tài nguyên."""
+        self.stop_sweeper()
+
+    def start_sweeper(self) -> None:
+        """Chạy thread nền quét session hết hạn theo chu kỳ sweep_interval."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="context-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        """Dừng thread quét."""
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def _sweep_loop(self) -> None:
+        while not self._stop_sweeper.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:  # Thread nền không được chết vì 1 lỗi
+                logger.error(f"Context sweeper lỗi: {e}", exc_info=True)
+
+
+class _Session:
+    """Context của 1 session kèm dung lượng ước tính và thời điểm truy cập gần nhất."""
+
+    __slots__ = ("context", "key_sizes", "history", "size", "last_access", "version")
+
+    def __init__(self, now: float) -> None:
+        self.version = 0
+        self.context: Dict[str, Any] = {}  # Các key khác ngoài lịch sử
+        self.key_sizes: Dict[str, int] = {}  # Dung lượng của từng key trong context
+        self.history: Optional[Deque[HistoryRecord]] = None  # Ring buffer lịch sử
+        self.size = 0
+        self.last_access = now
+
+    def set_history(self, records: List[HistoryRecord], limit: int) -> None:
+        self.history = deque(records, maxlen=max(1, limit))
+
+    def view(self) -> Dict[str, Any]:
+        if self.history is None:
+            return dict(self.context)
+        return {HISTORY_KEY: HistoryView(self.history), **self.context}
+
+
+class ContextStore(ContextBackend):
+    """
+    Lưu trữ context hội thoại trong RAM (LRU + TTL + giới hạn dung lượng)
+
+    An toàn với nhiều thread. Chạy nhiều worker/instance thì dùng backend sqlite hoặc redis.
+    """
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None, sweep_interval: Optional[float] = None) -> None:
+        """
+        Khởi tạo store
+
+        Args:
+            max_sessions: Số session tối đa (mặc định từ CONTEXT_MAX_SESSIONS, 0 = không giới hạn)
+            ttl_seconds: Thời gian không hoạt động tối đa (mặc định từ CONTEXT_TTL_SECONDS, 0 = không hết hạn)
+            max_bytes: Tổng dung lượng tối đa (mặc định từ CONTEXT_MAX_MEMORY_MB, 0 = không giới hạn)
+            sweep_interval: Chu kỳ quét session hết hạn (mặc định từ CONTEXT_SWEEP_INTERVAL_SECONDS)
+        """
+        self.max_sessions = max(0, max_sessions if max_sessions is not None else get_context_max_sessions())
+        self.ttl_seconds = max(0.0, ttl_seconds if ttl_seconds is not None else get_context_ttl_seconds())
+        if max_bytes is None:
+            max_bytes = int(get_context_max_memory_mb() * 1024 * 1024)
+        self.max_bytes = max(0, max_bytes)
+        super().__init__(sweep_interval)
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        # Version tăng dần cho cả store: session bị xóa rồi tạo lại không trùng version cũ
+        self._versions = itertools.count(1)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evicted_lru": 0, "evicted_ttl": 0,
+                                      "evicted_bytes": 0, "sweeps": 0, "conflicts": 0}
+
+    # ---------- API ----------
+
+    def get_versioned(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Lấy context của session kèm version ({}, 0 nếu chưa có hoặc đã hết hạn)
+
+        Returns:
+            Dict mới (sửa dict này không ảnh hưởng store, dùng set()/update() để lưu),
+            conversation_history là HistoryView chỉ đọc
+        """
+        now = time.monotonic()
+        with self._lock:
+            rec = self._touch(session_id, now)
+            if rec is None:
+                self.stats["misses"] += 1
+                return {}, 0
+            self.stats["hits"] += 1
+            return rec.view(), rec.version
+
+    def set(self, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Đặt context cho session."""
+        history = _to_records(context.get(HISTORY_KEY)) if HISTORY_KEY in context else None
+        now = time.monotonic()
+        with self._lock:
+            rec = _Session(now)
+            rec.context = {key: value for key, value in context.items() if key != HISTORY_KEY}
+            rec.key_sizes = {key: estimate_size(value) for key, value in rec.context.items()}
+            if history is not None:
+                rec.set_history(history, get_context_history_limit())
+            rec.version = next(self._versions)
+            self._replace(session_id, rec)
+            self._enforce_limits(now)
+        return context
+
+    def update(self, session_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Cập nhật 1 số key của context (chỉ đo lại dung lượng các key này)."""
+        history = _to_records(fields[HISTORY_KEY]) if HISTORY_KEY in fields else None
+        sizes = {key: estimate_size(value) for key, value in fields.items() if key != HISTORY_KEY}
+        now = time.monotonic()
+        with self._lock:
+            rec = self._get_or_create(session_id, now)
+            for key, value in fields.items():
+                if key != HISTORY_KEY:
+                    rec.context[key] = value
+            rec.key_sizes.update(sizes)
+            if history is not None:
+                rec.set_history(history, get_context_history_limit())
+            rec.version = next(self._versions)
+            self._resize(rec)
+            self._enforce_limits(now)
+            return rec.view()
+
+    def reset(self, session_id: str) -> None:
+        """Xóa context của session."""
+        with self._lock:
+            self._remove(session_id)
+
+    def append_history(self, session_id: str, entry: Dict[str, Any],
+                       fields: Optional[Dict[str, Any]] = None,
+                       expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Thêm entry vào lịch sử hội thoại (giới hạn CONTEXT_HISTORY_LIMIT câu) và cập nhật fields."""
+        record = HistoryRecord(entry)  # Nén ngoài lock
+        fields = {key: value for key, value in (fields or {}).items() if key != HISTORY_KEY}
+        sizes = {key: estimate_size(value) for key, value in fields.items()}
+        limit = max(1, get_context_history_limit())
+        now = time.monotonic()
+        with self._lock:
+            if expected_version is not None:
+                current = self._touch(session_id, now, update=False)
+                current_version = current.version if current is not None else 0
+                if current_version != expected_version:
+                    self.stats["conflicts"] += 1
+                    raise ContextConflictError(session_id=session_id, expected_version=expected_version,
+                                               current_version=current_version)
+            rec = self._get_or_create(session_id, now)
+            if rec.history is None or rec.history.maxlen != limit:
+                rec.set_history(list(rec.history or ())[-limit:], limit)
+            rec.history.append(record)  # deque(maxlen) tự bỏ câu cũ nhất
+            if fields:
+                rec.context.update(fields)
+                rec.key_sizes.update(sizes)
+            rec.version = next(self._versions)
+            self._resize(rec)
+            self._enforce_limits(now)
+            return rec.view()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._touch(session_id, time.monotonic(), update=False) is not None
+
+    # ---------- Dọn dẹp ----------
+
+    def sweep(self) -> int:
+        """
+        Xóa mọi session đã hết hạn
+
+        Returns:
+            Số session bị xóa
+        """
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            self._last_sweep = now
+            self.stats["sweeps"] += 1
+            if not self.ttl_seconds:
+                return 0
+            # OrderedDict xếp theo thời điểm truy cập: session lâu nhất nằm đầu
+            while self._sessions:
+                session_id, rec = next(iter(self._sessions.items()))
+                if now - rec.last_access <= self.ttl_seconds:
+                    break
+                self._remove(session_id)
+                self.stats["evicted_ttl"] += 1
+                removed += 1
+        if removed:
+            logger.debug(f"Context sweeper: xóa {removed} session hết hạn")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Thống kê store
+
+        Returns:
+            Dict gồm sessions, bytes, các giới hạn, hits/misses và số session bị loại theo từng lý do
+        """
+        with self._lock:
+            return {
+                "backend": self.name,
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                **self.stats,
+            }
+
+    # ---------- Nội bộ (gọi khi đã giữ lock) ----------
+
+    def _touch(self, session_id: str, now: float, update: bool = True) -> Optional[_Session]:
+        rec = self._sessions.get(session_id)
+        if rec is None:
+            return None
+        if self.ttl_seconds and now - rec.last_access > self.ttl_seconds:
+            self._remove(session_id)
+            self.stats["evicted_ttl"] += 1
+            return None
+        if update:
+            rec.last_access = now
+            self._sessions.move_to_end(session_id)
+        return rec
+
+    def _get_or_create(self, session_id: str, now: float) -> _Session:
+        rec = self._touch(session_id, now)
+        if rec is None:
+            rec = _Session(now)
+            self._sessions[session_id] = rec
+        return rec
+
+    def _replace(self, session_id: str, rec: _Session) -> None:
+        self._remove(session_id)
+        self._sessions[session_id] = rec
+        self._resize(rec)
+
+    def _remove(self, session_id: str) -> None:
+        rec = self._sessions.pop(session_id, None)
+        if rec is not None:
+            self._bytes -= rec.size
+
+    def _resize(self, rec: _Session) -> None:
+        size = sum(rec.key_sizes.values()) + sum(record.nbytes for record in rec.history or ())
+        self._bytes += size - rec.size
+        rec.size = size
+
+    def _enforce_limits(self, now: float) -> None:
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+        while self.max_sessions and len(self._sessions) > self.max_sessions:
+            self._remove(next(iter(self._sessions)))
+            self.stats["evicted_lru"] += 1
+        # Giữ lại ít nhất session vừa được ghi (nằm cuối)
+        while self.max_bytes and self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove(next(iter(self._sessions)))
+            self.stats["evicted_bytes"] += 1
@@ -0,0 +1,288 @@
+"""
+NLP Executor - Chạy xử lý NLP ngoài event loop
+
+Tách từ Underthesea, NER và xử lý CSV đều là việc nặng CPU và đồng bộ. Nếu gọi
+trực tiếp trong endpoint async, 1 request chậm sẽ chặn mọi kết nối khác (kể cả
+health check). Executor đẩy các việc này sang thread pool hoặc process pool và
+giới hạn số tác vụ đang chờ: khi hàng đợi đầy, request bị từ chối ngay (HTTP 503)
+thay vì xếp hàng vô hạn.
+
+Chế độ process (worker farm): NLPService được dựng và warm-up 1 lần trong process
+chính, sau đó mới fork các worker. Vocabulary, ma trận TF-IDF, gazetteer, model
+Underthesea... được chia sẻ copy-on-write giữa các worker; gc.freeze() trước khi
+fork để GC của worker không ghi vào (và làm bẩn) các trang nhớ dùng chung.
+Kết quả phân tích được gửi về dưới dạng tuple gọn thay vì dict, kèm phần histogram
+thời gian từng bước mà worker vừa ghi để /metrics của process chính thấy cả các bước NLP.
+"""
+
+import asyncio
+import functools
+import gc
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import get_nlp_executor_mode, get_nlp_executor_workers, get_nlp_executor_max_pending
+from exceptions import ServiceOverloadedError
+from services.profiler import run_profiled
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODE_THREAD = "thread"
+EXECUTOR_MODE_PROCESS = "process"
+EXECUTOR_MODE_INLINE = "inline"
+EXECUTOR_MODES = (EXECUTOR_MODE_THREAD, EXECUTOR_MODE_PROCESS, EXECUTOR_MODE_INLINE)
+
+
+def _call_service(method: str, *args: Any) -> Any:
+    """Gọi method của NLPService singleton (chạy trong thread/process worker)."""
+    from services.nlp_service import get_nlp_service
+    return getattr(get_nlp_service(), method)(*args)
+
+
+# ---------- Đóng gói kết quả gửi từ process worker về ----------
+
+PackedEntity = Tuple[str, str, Optional[str], Optional[int], Optional[int]]
+PackedAnalysis = Tuple[str, float, Tuple[PackedEntity, ...]]
+
+
+def pack_analysis(analysis: Dict[str, Any]) -> PackedAnalysis:
+    """Dict kết quả phân tích -> (intent, score, ((label, text, source, start, end), ...))."""
+    return (analysis["intent"], analysis["score"],
+            tuple((e["label"], e["text"], e.get("source"), e.get("start"), e.get("end"))
+                  for e in analysis["entities"]))
+
+
+def unpack_analysis(packed: PackedAnalysis) -> Dict[str, Any]:
+    """Ngược lại của pack_analysis."""
+    intent, score, packed_entities = packed
+    entities = []
+    for label, text, source, start, end in packed_entities:
+        entity = {"label": label, "text": text, "source": source}
+        if start is not None:
+            entity["start"], entity["end"] = start, end
+        entities.append(entity)
+    return {"intent": intent, "score": score, "entities": entities}
+
+
+def _pack_handled(result: Dict[str, Any]) -> Tuple[PackedAnalysis, Dict[str, Any]]:
+    return pack_analysis(result["analysis"]), result["response"]
+
+
+def _unpack_handled(packed: Tuple[PackedAnalysis, Dict[str, Any]]) -> Dict[str, Any]:
+    return {"analysis": unpack_analysis(packed[0]), "response": packed[1]}
+
+
+def _pack_many(results: List[Dict[str, Any]]) -> List[PackedAnalysis]:
+    return [pack_analysis(analysis) for analysis in results]
+
+
+def _unpack_many(packed: List[PackedAnalysis]) -> List[Dict[str, Any]]:
+    return [unpack_analysis(p) for p in packed]
+
+
+# method -> (hàm đóng gói trong worker, hàm mở gói trong process chính)
+_RESULT_CODECS: Dict[str, Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "analyze_message": (pack_analysis, unpack_analysis),
+    "analyze_many": (_pack_many, _unpack_many),
+    "handle_message": (_pack_handled, _unpack_handled),
+    "handle_analysis": (_pack_handled, _unpack_handled),
+}
+
+
+def _call_service_packed(method: str, *args: Any) -> Tuple[Any, Dict[str, list]]:
+    """Gọi method của NLPService trong process worker, đóng gói kết quả kèm histogram mới ghi."""
+    result = _call_service(method, *args)
+    codec = _RESULT_CODECS.get(method)
+    return (codec[0](result) if codec else result), REGISTRY.drain_histograms()
+
+
+def _init_worker() -> None:
+    """Khởi tạo process worker (sau khi fork)."""
+    # Các object kế thừa từ process chính đã nằm trong generation "permanent" (gc.freeze),
+    # GC của worker chỉ quét object mới tạo
+    # Giá trị metric kế thừa lúc fork đã có ở process chính: xóa để không bị cộng 2 lần khi gửi về
+    REGISTRY.reset()
+    logger.debug(f"NLP worker {os.getpid()} sẵn sàng")
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+class NLPExecutor:
+    """
+    Executor có giới hạn hàng đợi cho các method của NLPService
+
+    Ví dụ:
+        result = await executor.call("handle_message", message, context)
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None) -> None:
+        """
+        Khởi tạo executor (pool được tạo ở lần gọi đầu tiên)
+
+        Args:
+            mode: thread/process/inline (mặc định từ NLP_EXECUTOR_MODE)
+            max_workers: Số thread/process (mặc định từ NLP_EXECUTOR_WORKERS)
+            max_pending: Số tác vụ tối đa đang chờ + đang chạy (mặc định từ NLP_EXECUTOR_MAX_PENDING)
+        """
+        self.mode = (mode or get_nlp_executor_mode()).strip().lower()
+        if self.mode not in EXECUTOR_MODES:
+            raise ValueError(f"NLP_EXECUTOR_MODE không hợp lệ: {self.mode!r} (chọn {', '.join(EXECUTOR_MODES)})")
+        self.max_workers = max(1, max_workers if max_workers is not None else get_nlp_executor_workers())
+        self.max_pending = max(1, max_pending if max_pending is not None else get_nlp_executor_max_pending())
+
+        self._pool: Optional[Executor] = None
+        self.worker_pids: List[int] = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats: Dict[str, int] = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+                                      "max_pending_seen": 0}
+
+    def start(self) -> None:
+        """Tạo pool ngay (nên gọi lúc app khởi động, trước khi có request)."""
+        if self.mode != EXECUTOR_MODE_INLINE:
+            self._get_pool()
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.mode == EXECUTOR_MODE_PROCESS:
+                        self._pool = self._start_worker_farm()
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="nlp-worker")
+                    logger.info(f"NLP executor: {self.mode} x {self.max_workers}, max_pending={self.max_pending}")
+        return self._pool
+
+    def _start_worker_farm(self) -> ProcessPoolExecutor:
+        """Dựng + warm-up NLPService rồi fork toàn bộ worker (chia sẻ copy-on-write)."""
+        from services.nlp_service import get_nlp_service
+        get_nlp_service().warm_up()
+
+        # "fork" để worker kế thừa NLPService đã dựng sẵn (spawn/forkserver sẽ dựng lại từ đầu)
+        start_methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context("fork") if "fork" in start_methods else None
+
+        gc.collect()
+        gc.freeze()
+        try:
+            pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context,
+                                       initializer=_init_worker)
+            # Với "fork", mọi worker được tạo ngay ở lần submit đầu tiên
+            pool.submit(_worker_pid).result()
+            self.worker_pids = sorted(pool._processes)
+        finally:
+            gc.unfreeze()  # Process chính tiếp tục thu gom rác như bình thường
+        return pool
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise ServiceOverloadedError(max_pending=self.max_pending, retry_after=1)
+            self._pending += 1
+            self.stats["submitted"] += 1
+            self.stats["max_pending_seen"] = max(self.stats["max_pending_seen"], self._pending)
+
+    def _release(self, ok: bool) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.stats["completed" if ok else "failed"] += 1
+
+    async def call(self, method: str, *args: Any) -> Any:
+        """
+        Chạy 1 method của NLPService trên worker và chờ kết quả
+
+        Args:
+            method: Tên method (vd: "handle_message", "analyze_many")
+            *args: Tham số (phải pickle được ở chế độ process)
+
+        Returns:
+            Kết quả của method
+
+        Raises:
+            ServiceOverloadedError: Số tác vụ đang chờ đã đạt max_pending
+        """
+        return await self._submit(method, args, profile=False)
+
+    async def call_profiled(self, method: str, *args: Any) -> Tuple[Any, bytes]:
+        """
+        Như call() nhưng bật cProfile bên trong worker quanh lời gọi method
+
+        Returns:
+            (kết quả của method, pstats đã marshal - xem services.profiler)
+        """
+        return await self._submit(method, args, profile=True)
+
+    async def _submit(self, method: str, args: Tuple[Any, ...], profile: bool) -> Any:
+        self._acquire()
+        ok = False
+        try:
+            target = _call_service_packed if self.mode == EXECUTOR_MODE_PROCESS else _call_service
+            job = (functools.partial(run_profiled, target, method, *args) if profile
+                   else functools.partial(target, method, *args))
+            if self.mode == EXECUTOR_MODE_INLINE:
+                outcome = job()
+            else:
+                loop = asyncio.get_running_loop()
+                outcome = await loop.run_in_executor(self._get_pool(), job)
+            result, stats_data = outcome if profile else (outcome, None)
+            if self.mode == EXECUTOR_MODE_PROCESS:
+                result, histograms = result
+                REGISTRY.merge_histograms(histograms)
+                codec = _RESULT_CODECS.get(method)
+                result = codec[1](result) if codec else result
+            ok = True
+            return (result, stats_data) if profile else result
+        finally:
+            self._release(ok)
+
+    @property
+    def pending(self) -> int:
+        """Số tác vụ đang chờ + đang chạy."""
+        return self._pending
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê executor."""
+        with self._lock:
+            return {"mode": self.mode, "workers": self.max_workers, "max_pending": self.max_pending,
+                    "pending": self._pending, **self.stats}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Dừng pool (tạo lại ở lần gọi tiếp theo)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self.worker_pids = []
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor: Optional[NLPExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_nlp_executor() -> NLPExecutor:
+    """Trả về executor NLP dùng chung (tạo ở lần gọi đầu tiên)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = NLPExecutor()
+    return _executor
+
+
+def shutdown_nlp_executor() -> None:
+    """Dừng executor NLP dùng chung (gọi khi app tắt)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
@@ -0,0 +1,149 @@
+"""
+Health Monitor - Snapshot trạng thái cho /livez, /readyz và /health
+
+Thread nền cập nhật snapshot theo chu kỳ (model đã nạp chưa, version dữ liệu CSV,
+thời điểm dựng chỉ mục, số session trong context store, trạng thái khởi động). Probe chỉ đọc snapshot
+đã tính sẵn: O(1), không I/O, không đụng tới CSV hay backend context.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import DATA_DIR, get_health_refresh_interval_seconds
+from services.processors.indexes import index_stats
+from utils.startup import STATE_FAILED, STATE_WARMING, StartupTimeline
+
+logger = logging.getLogger(__name__)
+
+# Snapshot cũ hơn STALE_FACTOR chu kỳ = thread nền đã chết hoặc bị treo
+STALE_FACTOR = 3
+
+
+def data_version(data_dir: str = DATA_DIR) -> Tuple[str, int]:
+    """
+    Version của thư mục dữ liệu: hash của (tên, kích thước, mtime) từng file, không đọc nội dung
+
+    Returns:
+        (version 12 ký tự hex, số file)
+    """
+    digest = hashlib.sha1()
+    count = 0
+    for entry in sorted(os.scandir(data_dir), key=lambda e: e.name):
+        if entry.is_file():
+            st = entry.stat()
+            digest.update(f"{entry.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+            count += 1
+    return digest.hexdigest()[:12], count
+
+
+class HealthMonitor:
+    """
+    Giữ snapshot trạng thái của service, thay nguyên snapshot mỗi lần refresh
+
+    Args:
+        nlp: NLPService cần theo dõi, hoặc hàm trả về NLPService/None (None = chưa dựng xong)
+        data_dir: Thư mục dữ liệu CSV
+        interval: Chu kỳ refresh (giây, mặc định từ HEALTH_REFRESH_INTERVAL_SECONDS)
+        startup: Timeline khởi động (trạng thái warm-up + thời gian từng bước) đưa vào snapshot
+    """
+
+    def __init__(self, nlp: Any, data_dir: str = DATA_DIR, interval: Optional[float] = None,
+                 startup: Optional[StartupTimeline] = None) -> None:
+        self.nlp = nlp
+        self.startup = startup
+        self.data_dir = data_dir
+        self.interval = get_health_refresh_interval_seconds() if interval is None else interval
+        self.started_at = time.time()
+        self._snapshot: Dict[str, Any] = {"ready": False, "errors": ["Chưa kiểm tra trạng thái"]}
+        self._refreshed_at: Optional[float] = None  # time.monotonic() của lần refresh gần nhất
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        """Snapshot gần nhất (không được sửa: refresh() tạo dict mới)."""
+        return self._snapshot
+
+    def age(self) -> Optional[float]:
+        """Số giây từ lần refresh gần nhất (None nếu chưa refresh)."""
+        return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Trả về (sẵn sàng nhận request, snapshot). Snapshot quá cũ được coi là chưa sẵn sàng."""
+        snapshot, age = self._snapshot, self.age()
+        return (snapshot["ready"] and age is not None and age <= self.interval * STALE_FACTOR), snapshot
+
+    def refresh(self) -> Dict[str, Any]:
+        """Tính lại snapshot (chạy trong thread nền, được phép I/O)."""
+        errors: List[str] = []
+        nlp = self.nlp() if callable(self.nlp) else self.nlp
+        startup = self.startup.snapshot() if self.startup is not None else None
+        if startup is not None and startup["state"] == STATE_FAILED:
+            errors.append(f"Khởi tạo NLP lỗi: {startup['error']}")
+        elif startup is not None and startup["state"] == STATE_WARMING:
+            errors.append("NLP service đang khởi tạo")
+        elif nlp is None:
+            errors.append("NLP service chưa được khởi tạo")
+
+        model_source = nlp.pipeline.intent_model_source if nlp is not None else "none"
+        if nlp is not None and model_source == "none":
+            errors.append("Intent model chưa được nạp")
+
+        version, files = None, 0
+        try:
+            version, files = data_version(self.data_dir)
+            if not files:
+                errors.append(f"Không có file dữ liệu trong {self.data_dir}")
+        except OSError as e:
+            errors.append(f"Không đọc được thư mục dữ liệu: {e}")
+
+        context: Dict[str, Any] = {}
+        try:
+            if nlp is not None:
+                stats = nlp.context_stats()
+                context = {"backend": stats.get("backend"), "sessions": stats.get("sessions")}
+        except Exception as e:  # Backend context (SQLite/Redis) không truy cập được
+            errors.append(f"Context store lỗi: {e}")
+
+        snapshot = {
+            "ready": not errors,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "model": {"loaded": model_source != "none", "source": model_source},
+            "data": {"version": version, "files": files},
+            "indexes": index_stats(),
+            "context": context,
+            "errors": errors,
+        }
+        if startup is not None:
+            snapshot["startup"] = startup
+        self._snapshot, self._refreshed_at = snapshot, time.monotonic()
+        return snapshot
+
+    def start(self) -> None:
+        """Refresh ngay 1 lần rồi chạy thread nền refresh theo chu kỳ."""
+        self.refresh()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Dừng thread nền."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:  # Thread nền không được chết vì 1 lỗi
+                logger.error(f"Health monitor lỗi: {e}", exc_info=True)
@@ -0,0 +1,91 @@
+"""
+Middleware - Request ID, rate limit và security headers trong 1 lớp ASGI
+
+Thay cho 3 hàm @app.middleware("http") (mỗi hàm là 1 BaseHTTPMiddleware: tạo task,
+stream và bọc lại response ở từng lớp). Lớp này chỉ bọc hàm send để chèn header
+vào message "http.response.start", body đi thẳng từ endpoint ra server.
+"""
+
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, MutableMapping, Tuple
+
+from fastapi.responses import JSONResponse
+
+from services.rate_limiter import RateLimiter, retry_after_seconds
+from utils.metrics import REGISTRY, observe_stage
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+SECURITY_HEADERS: Dict[str, str] = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+}
+
+_SECURITY_RAW: List[Tuple[bytes, bytes]] = [
+    (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in SECURITY_HEADERS.items()
+]
+
+HTTP_RESPONSES = REGISTRY.counter("huce_http_responses_total", "Số response HTTP theo status code", ("status",))
+
+
+class GatewayMiddleware:
+    """
+    Middleware ASGI thuần cho mọi request HTTP
+
+    - Gán request id (request.state.request_id, header X-Request-ID)
+    - Kiểm tra rate limit, vượt giới hạn thì trả 429 kèm Retry-After
+    - Thêm security headers vào mọi response (kể cả 429)
+
+    Args:
+        app: ASGI app bên trong
+        get_rate_limiter: Hàm trả về rate limiter (gọi mỗi request để có thể thay khi chạy)
+    """
+
+    def __init__(self, app: ASGIApp, get_rate_limiter: Callable[[], RateLimiter]) -> None:
+        self.app = app
+        self.get_rate_limiter = get_rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        extra_headers = [(b"x-request-id", request_id.encode("latin-1")), *_SECURITY_RAW]
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *extra_headers]
+                HTTP_RESPONSES.inc(str(message["status"]))
+            await send(message)
+
+        client = scope.get("client")
+        decision = await self.get_rate_limiter().hit_async(client[0] if client else "unknown", scope["path"])
+        if not decision.allowed:
+            retry_after = retry_after_seconds(decision)
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "success": False,
+                    "error_code": "RATE_LIMIT_EXCEEDED",
+                    "error_message": "Quá nhiều yêu cầu. Vui lòng thử lại sau.",
+                    "retry_after": retry_after,
+                },
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send_with_headers)
+            return
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            observe_stage("http.request", time.perf_counter() - started)
@@ -1,43 +1,23 @@
 """NLP Service - Xử lý ngôn ngữ tự nhiên và quản lý context hội thoại."""
 
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 
-from config import get_intent_threshold, get_context_history_limit
+from config import get_intent_threshold
 from nlu.pipeline import NLPPipeline
+from services.context_backends import create_context_store
+from utils.metrics import span
+from utils.startup import phase
 
 
-class ContextStore:
-    """Lưu trữ context hội thoại trong RAM. Production nên dùng Redis."""
-
-    def __init__(self) -> None:
-        self._store: Dict[str, Dict[str, Any]] = {}
-
-    def get(self, session_id: str) -> Dict[str, Any]:
-        """Lấy context của session."""
-        return self._store.get(session_id, {})
-
-    def set(self, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Đặt context cho session."""
-        self._store[session_id] = context
-        return context
-
-    def reset(self, session_id: str) -> None:
-        """Xóa context của session."""
-        if session_id in self._store:
-            del self._store[session_id]
-
-    def append_history(self, session_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
-        """Thêm entry vào lịch sử hội thoại (giới hạn 10 câu)."""
-        ctx = self.get(session_id)
-        hist = ctx.get("conversation_history", []) + [entry]
-
-        limit = get_context_history_limit()
-        if len(hist) > limit:
-            hist = hist[-limit:]
-
-        ctx["conversation_history"] = hist
-        self.set(session_id, ctx)
-        return ctx
+# Câu hỏi mẫu dùng để nạp sẵn model, dữ liệu CSV và các chỉ mục
+WARM_UP_MESSAGES = [
+    "Điểm chuẩn ngành Kiến trúc năm 2024?",
+    "Học phí ngành Công nghệ thông tin",
+    "Chỉ tiêu ngành 7480201",
+    "Phương thức xét tuyển ngành Kỹ thuật xây dựng",
+    "Xin chào",
+]
 
 
 class NLPService:
@@ -46,7 +26,8 @@ class NLPService:
     def __init__(self) -> None:
         """Khởi tạo NLP Service (chỉ gọi 1 lần khi app khởi động)."""
         self.pipeline = NLPPipeline()
-        self.context_store = ContextStore()
+        with phase("service.context_store"):
+            self.context_store = create_context_store()
         self.intent_threshold = get_intent_threshold()
 
     def analyze_message(self, message: str) -> Dict[str, Any]:
@@ -59,39 +40,106 @@ class NLPService:
 
         Flow: Analyze NLP → Check confidence → Get data hoặc Fallback
         """
-        from services import csv_service as csvs
+        with span("service.handle_message"):
+            analysis = self.pipeline.analyze(message)
+            return self.handle_analysis(message, analysis, current_context)
 
-        analysis = self.pipeline.analyze(message)
+    def handle_analysis(self, message: str, analysis: Dict[str, Any],
+                        current_context: Dict[str, Any]) -> Dict[str, Any]:
+        """Lấy dữ liệu hoặc fallback từ kết quả phân tích NLP có sẵn."""
+        from services import csv_service as csvs
 
+        # Mỗi intent 1 stage handler.<intent> để thấy handler nào chậm
         if analysis["intent"] == "fallback" or analysis["score"] < self.intent_threshold:
-            response = csvs.handle_fallback_query(message, current_context)
+            with span("handler.fallback"):
+                response = csvs.handle_fallback_query(message, current_context)
             analysis["intent"] = "fallback_response"
         else:
-            response = csvs.handle_intent_query(analysis, current_context, message)
+            with span(f"handler.{analysis['intent']}"):
+                response = csvs.handle_intent_query(analysis, current_context, message)
 
         return {"analysis": analysis, "response": response}
 
+    def analyze_many(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Phân tích NLP nhiều câu hỏi cùng lúc (các câu trùng nhau chỉ phân tích 1 lần)."""
+        return self.pipeline.analyze_many(messages)
+
+    def handle_many(self, messages: List[str],
+                    contexts: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Xử lý hoàn chỉnh nhiều câu hỏi: phân tích theo batch rồi lấy dữ liệu cho từng câu.
+
+        contexts[i] là context dùng cho messages[i] (mặc định: context rỗng).
+        """
+        if contexts is None:
+            contexts = [{} for _ in messages]
+        analyses = self.pipeline.analyze_many(messages)
+        return [self.handle_analysis(message, analysis, ctx)
+                for message, analysis, ctx in zip(messages, analyses, contexts)]
+
+    def warm_up(self) -> None:
+        """Nạp sẵn model lười, CSV và chỉ mục bằng vài câu hỏi mẫu (gọi trước khi fork worker)."""
+        self.pipeline.warm_up(WARM_UP_MESSAGES)
+        with phase("warm_up.handlers"):  # CSV + chỉ mục dữ liệu
+            for message in WARM_UP_MESSAGES:
+                self.handle_message(message, {})
+
     def get_context(self, session_id: str) -> Dict[str, Any]:
         """Lấy context của session."""
         return self.context_store.get(session_id)
 
+    def get_context_versioned(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        """Lấy context kèm version (dùng cho append_history(expected_version=...))."""
+        with span("context.get"):
+            return self.context_store.get_versioned(session_id)
+
+    def export_context(self, session_id: str, full: bool = True) -> Dict[str, Any]:
+        """Lấy context dạng JSON (full=False: lịch sử chỉ gồm câu hỏi, intent, loại câu trả lời)."""
+        return self.context_store.export(session_id, full)
+
     def set_context(self, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Lưu context cho session."""
         return self.context_store.set(session_id, context)
 
+    def update_context(self, session_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Cập nhật 1 số key của context (vd: last_intent, last_entities)."""
+        return self.context_store.update(session_id, fields)
+
+    def context_stats(self) -> Dict[str, Any]:
+        """Thống kê context store (số session, dung lượng, số lần bị loại)."""
+        return self.context_store.get_stats()
+
     def reset_context(self, session_id: str) -> None:
         """Xóa context (bắt đầu hội thoại mới)."""
         self.context_store.reset(session_id)
 
-    def append_history(self, session_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
-        """Thêm entry vào lịch sử hội thoại."""
-        return self.context_store.append_history(session_id, entry)
+    def append_history(self, session_id: str, entry: Dict[str, Any], fields: Optional[Dict[str, Any]] = None,
+                       expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Thêm entry vào lịch sử hội thoại và cập nhật fields (1 thao tác với backend).
+
+        expected_version: version từ get_context_versioned, raise ContextConflictError nếu context đã đổi.
+        """
+        with span("context.append"):
+            return self.context_store.append_history(session_id, entry, fields, expected_version)
 
 
-# Singleton instance
-nlp_service = NLPService()
+# Singleton instance: dựng ở lần gọi get_nlp_service() đầu tiên, không dựng lúc import
+_nlp_service: Optional[NLPService] = None
+_nlp_service_lock = threading.Lock()
 
 
 def get_nlp_service() -> NLPService:
-    """Trả về singleton instance của NLPService."""
-    return nlp_service
+    """Trả về singleton instance của NLPService (dựng ở lần gọi đầu, an toàn giữa các thread)."""
+    global _nlp_service
+    if _nlp_service is None:
+        with _nlp_service_lock:
+            if _nlp_service is None:
+                with phase("service.build"):
+                    _nlp_service = NLPService()
+    return _nlp_service
+
+
+def peek_nlp_service() -> Optional[NLPService]:
+    """Trả về singleton nếu đã dựng, None nếu chưa (không bao giờ dựng)."""
+    return _nlp_service
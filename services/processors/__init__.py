@@ -13,6 +13,7 @@ from .admissions import (
     search_combinations,
 )
 from .cache import read_csv, clear_cache
+from .indexes import clear_indexes
 from .cefr import get_cefr_conversion, convert_certificate_score
 from .contact import get_contact_info
 from .majors import list_majors
@@ -28,7 +29,7 @@ from .utils import (
 )
 
 __all__ = [
-    "read_csv", "clear_cache",
+    "read_csv", "clear_cache", "clear_indexes",
     "strip_diacritics", "normalize_text", "canonicalize_vi_ascii",
     "clean_program_name", "infer_major_from_message", "format_data_to_text", "add_contact_suggestion",
     "list_majors",
@@ -1,10 +1,11 @@
 """Admissions Module - Xử lý thông tin xét tuyển."""
 
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from config import DATA_DIR
 from .cache import read_csv
+from .indexes import TargetRecord, get_method_index, search_targets
 
 
 def list_admission_conditions(phuong_thuc: Optional[str] = None, year: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -20,16 +21,12 @@ def list_admission_conditions(phuong_thuc: Optional[str] = None, year: Optional[
 
 def list_admission_quota(major: Optional[str] = None, year: Optional[str] = None) -> List[Dict[str, Any]]:
     """Tìm kiếm chỉ tiêu tuyển sinh."""
-    targets = get_admission_targets(ma_nganh=major if major and len(major) == 7 else None)
-
-    if major and len(major) != 7:
-        from .utils import strip_diacritics
-        mq = strip_diacritics(major.lower())
-        targets = [t for t in targets if mq in strip_diacritics(t.get("major_name", "").lower())
-                   or mq in strip_diacritics(t.get("program_name", "").lower())]
+    targets = _find_targets_for_major(major)
 
     major_quotas = {}
-    for t in targets:
+    ma_xt_quotas: Dict[str, Dict[str, int]] = {}  # major_code -> {mã xét tuyển: chỉ tiêu}
+    for rec in targets:
+        t = rec.row
         key = (t.get("major_code", ""), t.get("major_name", ""))
         if key not in major_quotas:
             major_quotas[key] = {"major_code": key[0], "major_name": key[1], "nam": "2025", "chi_tieu": 0,
@@ -37,33 +34,36 @@ def list_admission_quota(major: Optional[str] = None, year: Optional[str] = None
         try:
             chi_tieu = int(t.get("quota", "0"))
         except ValueError:
-            chi_tieu = 0
+            chi_tieu = None
         major_quotas[key]["chi_tiet"].append({
             "admission_method": t.get("admission_method", ""),
             "subject_combination": t.get("subject_combination", ""),
-            "chi_tieu": chi_tieu
+            "chi_tieu": chi_tieu or 0
         })
 
+        # Chỉ tiêu theo mã xét tuyển (mỗi mã chỉ tính 1 lần)
+        ma_xt = t.get("admission_code", "")
+        per_code = ma_xt_quotas.setdefault(t.get("major_code"), {})
+        if chi_tieu is not None and ma_xt and ma_xt not in per_code:
+            per_code[ma_xt] = chi_tieu
+
     results = []
     for key, data in major_quotas.items():
-        ma_xt_quotas = {}
-        for t in targets:
-            if t.get("major_code") == data["major_code"]:
-                ma_xt = t.get("admission_code", "")
-                try:
-                    chi_tieu = int(t.get("quota", "0"))
-                    if ma_xt and ma_xt not in ma_xt_quotas:
-                        ma_xt_quotas[ma_xt] = chi_tieu
-                except ValueError:
-                    continue
-        data["chi_tieu"] = sum(ma_xt_quotas.values())
+        data["chi_tieu"] = sum(ma_xt_quotas.get(data["major_code"], {}).values())
         results.append(data)
     return results
 
 
+def _find_targets_for_major(major: Optional[str]) -> Tuple[TargetRecord, ...]:
+    """Chỉ tiêu theo mã ngành (7 ký tự) hoặc theo tên ngành/chương trình."""
+    if major and len(major) == 7:
+        return search_targets(ma_nganh=major)
+    return search_targets(name=major or None)
+
+
 def list_admission_methods_general() -> List[Dict[str, Any]]:
     """Lấy danh sách tổng quát các phương thức xét tuyển."""
-    rows = read_csv(os.path.join(DATA_DIR, "admission_methods.csv"))
+    rows = get_method_index().rows
     return [{"method_code": r.get("method_code"), "abbreviation": r.get("abbreviation"),
              "method_name": r.get("method_name"), "description": r.get("description"),
              "requirements": r.get("requirements")} for r in rows]
@@ -71,21 +71,8 @@ def list_admission_methods_general() -> List[Dict[str, Any]]:
 
 def list_admission_methods(major: Optional[str] = None) -> List[Dict[str, Any]]:
     """Tìm kiếm phương thức xét tuyển theo ngành."""
-    targets = get_admission_targets(ma_nganh=major if major and len(major) == 7 else None)
-
-    if major and len(major) != 7:
-        from .utils import strip_diacritics
-        mq = strip_diacritics(major.lower())
-        targets = [t for t in targets if mq in strip_diacritics(t.get("major_name", "").lower())
-                   or mq in strip_diacritics(t.get("program_name", "").lower())]
-
-    method_mapping: Dict[str, List[Dict[str, str]]] = {}
-    for m in list_admission_methods_general():
-        code = str(m.get("method_code", ""))
-        if code:
-            method_mapping.setdefault(code, []).append({
-                "method_name": m.get("method_name", ""), "abbreviation": m.get("abbreviation", ""),
-                "description": m.get("description", "")})
+    targets = [rec.row for rec in _find_targets_for_major(major)]
+    method_mapping = get_method_index().by_code
 
     methods_map = {}
     for t in targets:
@@ -168,19 +155,7 @@ def list_admissions_schedule(phuong_thuc: Optional[str] = None) -> List[Dict[str
 def get_admission_targets(ma_nganh: Optional[str] = None, phuong_thuc: Optional[str] = None,
                           to_hop: Optional[str] = None) -> List[Dict[str, Any]]:
     """Lấy chỉ tiêu tuyển sinh theo ngành, phương thức, tổ hợp môn."""
-    rows = read_csv(os.path.join(DATA_DIR, "admission_targets.csv"))
-    results = []
-    for row in rows:
-        if ma_nganh and row.get("major_code", "").strip() != ma_nganh.strip():
-            continue
-        if phuong_thuc and row.get("admission_method", "").strip() != phuong_thuc.strip():
-            continue
-        if to_hop:
-            to_hop_list = [x.strip() for x in row.get("subject_combination", "").split(",")]
-            if to_hop.strip() not in to_hop_list:
-                continue
-        results.append(row)
-    return results
+    return [rec.row for rec in search_targets(ma_nganh=ma_nganh, phuong_thuc=phuong_thuc, to_hop=to_hop)]
 
 
 def get_combination_codes(ky_thi: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -0,0 +1,447 @@
+"""
+Data Indexes - Chỉ mục dựng sẵn cho dữ liệu tuyển sinh
+
+Mỗi chỉ mục được dựng 1 lần cho mỗi version của file CSV (read_csv trả về list
+mới khi file thay đổi) và dùng chung cho mọi request:
+- Ngành học theo mã ngành và theo tên không dấu
+- Điểm chuẩn theo chương trình và theo năm
+- Chỉ tiêu theo mã ngành và theo phương thức xét tuyển
+- Bộ so khớp tên ngành/chương trình trong câu hỏi (infer_major_from_message)
+
+Các khóa chuẩn hóa (lowercase, bỏ dấu, canonicalize) được tính sẵn khi dựng
+chỉ mục, processors chỉ tra dict hoặc so khớp chuỗi đã chuẩn hóa.
+Bản ghi là NamedTuple và các dict được bọc MappingProxyType (chỉ đọc).
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from config import DATA_DIR
+from nlu.automaton import AhoCorasick
+from .cache import read_csv
+from .utils import strip_diacritics, canonicalize_vi_ascii, clean_program_name, normalize_text
+
+# Các cột năm hợp lệ trong admission_scores.csv
+SCORE_YEAR_MIN = 2020
+SCORE_YEAR_MAX = 2025
+
+_INDEXES: Dict[Tuple[str, ...], Tuple[Tuple[List[Dict[str, Any]], ...], Any]] = {}
+_LOCK = threading.Lock()
+# Thời điểm dựng (epoch) và thời gian dựng (ms) gần nhất của từng chỉ mục, dùng cho /readyz
+_BUILD_STATS: Dict[str, Dict[str, float]] = {}
+
+
+def _is_current(cached, rows: Tuple[List[Dict[str, Any]], ...]) -> bool:
+    return cached is not None and all(old is new for old, new in zip(cached[0], rows))
+
+
+def _get_index(filenames: Union[str, Tuple[str, ...]], builder: Callable[..., Any]) -> Any:
+    """
+    Lấy chỉ mục dựng từ 1 hoặc nhiều file CSV, dựng lại khi có file thay đổi
+
+    Args:
+        filenames: Tên file (hoặc tuple tên file) trong DATA_DIR
+        builder: Hàm dựng chỉ mục, nhận rows của từng file theo đúng thứ tự
+    """
+    if isinstance(filenames, str):
+        filenames = (filenames,)
+    rows = tuple(read_csv(os.path.join(DATA_DIR, name)) for name in filenames)
+    cached = _INDEXES.get(filenames)
+    if _is_current(cached, rows):
+        return cached[1]
+    with _LOCK:
+        cached = _INDEXES.get(filenames)
+        if not _is_current(cached, rows):
+            start = time.perf_counter()
+            cached = (rows, builder(*rows))
+            _INDEXES[filenames] = cached
+            _BUILD_STATS["+".join(filenames)] = {
+                "built_at": time.time(), "build_ms": round((time.perf_counter() - start) * 1000, 3)}
+    return cached[1]
+
+
+def clear_indexes() -> None:
+    """Xóa toàn bộ chỉ mục (dựng lại ở lần truy vấn sau)."""
+    with _LOCK:
+        _INDEXES.clear()
+        _BUILD_STATS.clear()
+
+
+def index_stats() -> Dict[str, Dict[str, float]]:
+    """Thời điểm dựng (built_at, epoch) và thời gian dựng (build_ms) của các chỉ mục đã dựng."""
+    with _LOCK:
+        return {name: dict(stats) for name, stats in _BUILD_STATS.items()}
+
+
+def _ascii_lower(text: str) -> str:
+    return strip_diacritics((text or "").lower())
+
+
+# ---------- Ngành học (majors.csv) ----------
+
+class MajorRecord(NamedTuple):
+    major_code: str
+    major_name: str
+    description: str
+    additional_info: str
+    code_lower: str
+    name_lower: str
+    name_ascii: str
+
+
+class MajorIndex(NamedTuple):
+    records: Tuple[MajorRecord, ...]
+    by_code: Mapping[str, Tuple[MajorRecord, ...]]
+    by_ascii_name: Mapping[str, Tuple[MajorRecord, ...]]
+
+
+def _group(pairs) -> Mapping[str, tuple]:
+    """Gom (key, value) thành dict chỉ đọc key -> tuple(values), giữ thứ tự xuất hiện."""
+    groups: Dict[str, list] = {}
+    for key, value in pairs:
+        groups.setdefault(key, []).append(value)
+    return MappingProxyType({key: tuple(values) for key, values in groups.items()})
+
+
+def _build_major_index(rows: List[Dict[str, Any]]) -> MajorIndex:
+    records = tuple(
+        MajorRecord(
+            major_code=r.get("major_code"),
+            major_name=r.get("major_name"),
+            description=r.get("description"),
+            additional_info=r.get("additional_info"),
+            code_lower=(r.get("major_code") or "").lower(),
+            name_lower=(r.get("major_name") or "").lower(),
+            name_ascii=_ascii_lower(r.get("major_name") or ""),
+        )
+        for r in rows
+    )
+    return MajorIndex(
+        records=records,
+        by_code=_group((rec.code_lower.strip(), rec) for rec in records),
+        by_ascii_name=_group((rec.name_ascii.strip(), rec) for rec in records),
+    )
+
+
+def get_major_index() -> MajorIndex:
+    """Chỉ mục ngành học."""
+    return _get_index("majors.csv", _build_major_index)
+
+
+def search_majors(query: Optional[str] = None) -> Tuple[MajorRecord, ...]:
+    """
+    Tìm ngành theo từ khóa (chứa trong tên, mã ngành hoặc tên không dấu)
+
+    Args:
+        query: Từ khóa; rỗng thì trả về tất cả
+
+    Returns:
+        Các bản ghi theo thứ tự trong file
+    """
+    index = get_major_index()
+    if not query:
+        return index.records
+    q = query.lower()
+    q_ascii = strip_diacritics(q)
+    return tuple(rec for rec in index.records
+                 if q in rec.name_lower or q in rec.code_lower or q_ascii in rec.name_ascii)
+
+
+# ---------- Điểm chuẩn (admission_scores.csv) ----------
+
+class ScoreRecord(NamedTuple):
+    program_name: str
+    year: str
+    score: float
+    subject_combination: str
+
+
+class ScoreProgram(NamedTuple):
+    program_name: str  # Đã bỏ phần "Ngành/" phía trước
+    name_lower: str
+    name_ascii: str  # Không dấu + canonicalize_vi_ascii
+    scores: Tuple[ScoreRecord, ...]  # Theo thứ tự năm tăng dần
+
+
+class ScoreIndex(NamedTuple):
+    programs: Tuple[ScoreProgram, ...]
+    by_year: Mapping[str, Tuple[ScoreRecord, ...]]
+    records: Tuple[ScoreRecord, ...]
+
+
+def _parse_score(value: Any) -> Optional[float]:
+    """Điểm chuẩn dạng số, None với các giá trị đặc biệt ("chưa tuyển", "tuyển chung"...)."""
+    if not value:
+        return None
+    score_str = str(value).strip()
+    score_lower = score_str.lower()
+    if score_lower in ["chưa tuyển", "chua tuyen", ""]:
+        return None
+    if "tuyển chung" in score_lower or "tuyen chung" in score_lower:
+        return None
+    if "chưa" in score_lower and "tuyển" in score_lower:
+        return None
+    try:
+        return float(score_str.replace(",", "."))
+    except (ValueError, TypeError):
+        return None
+
+
+def _build_score_index(rows: List[Dict[str, Any]]) -> ScoreIndex:
+    year_columns = []
+    if rows:
+        for key in rows[0].keys():
+            if key.isdigit() and len(key) == 4 and SCORE_YEAR_MIN <= int(key) <= SCORE_YEAR_MAX:
+                year_columns.append(key)
+        year_columns.sort()
+
+    programs = []
+    for r in rows:
+        program_name = (r.get("program_name") or "").strip()
+        if not program_name:
+            continue
+        cleaned = clean_program_name(program_name)
+        scores = []
+        for year_key in year_columns:
+            score = _parse_score(r.get(year_key, ""))
+            if score is not None:
+                scores.append(ScoreRecord(cleaned, year_key, score, r.get("subject_combination", "")))
+        name_lower = cleaned.lower()
+        programs.append(ScoreProgram(
+            program_name=cleaned,
+            name_lower=name_lower,
+            name_ascii=canonicalize_vi_ascii(strip_diacritics(name_lower)),
+            scores=tuple(scores),
+        ))
+
+    records = tuple(rec for prog in programs for rec in prog.scores)
+    return ScoreIndex(
+        programs=tuple(programs),
+        by_year=_group((rec.year, rec) for rec in records),
+        records=records,
+    )
+
+
+def get_score_index() -> ScoreIndex:
+    """Chỉ mục điểm chuẩn."""
+    return _get_index("admission_scores.csv", _build_score_index)
+
+
+def search_scores(major: Optional[str] = None, year: Optional[str] = None) -> Tuple[ScoreRecord, ...]:
+    """
+    Tìm điểm chuẩn theo ngành (chứa trong tên chương trình, có dấu hoặc không dấu) và/hoặc năm
+
+    Returns:
+        Các bản ghi theo thứ tự chương trình trong file, năm tăng dần
+    """
+    index = get_score_index()
+    if not major:
+        if year:
+            return index.by_year.get(year, ())
+        return index.records
+
+    mq = major.lower()
+    mq_ascii = canonicalize_vi_ascii(strip_diacritics(mq))
+    return tuple(
+        rec
+        for prog in index.programs
+        if mq in prog.name_lower or mq_ascii in prog.name_ascii
+        for rec in prog.scores
+        if not year or rec.year == year
+    )
+
+
+# ---------- Chỉ tiêu (admission_targets.csv) ----------
+
+class TargetRecord(NamedTuple):
+    row: Dict[str, Any]  # Dòng CSV gốc (trả nguyên cho caller như trước)
+    major_code: str
+    admission_method: str
+    combinations: frozenset
+    major_name_ascii: str
+    program_name_ascii: str
+
+
+class TargetIndex(NamedTuple):
+    records: Tuple[TargetRecord, ...]
+    by_major_code: Mapping[str, Tuple[TargetRecord, ...]]
+    by_method: Mapping[str, Tuple[TargetRecord, ...]]
+
+
+def _build_target_index(rows: List[Dict[str, Any]]) -> TargetIndex:
+    records = tuple(
+        TargetRecord(
+            row=r,
+            major_code=r.get("major_code", "").strip(),
+            admission_method=r.get("admission_method", "").strip(),
+            combinations=frozenset(x.strip() for x in r.get("subject_combination", "").split(",")),
+            major_name_ascii=_ascii_lower(r.get("major_name", "")),
+            program_name_ascii=_ascii_lower(r.get("program_name", "")),
+        )
+        for r in rows
+    )
+    return TargetIndex(
+        records=records,
+        by_major_code=_group((rec.major_code, rec) for rec in records),
+        by_method=_group((rec.admission_method, rec) for rec in records),
+    )
+
+
+def get_target_index() -> TargetIndex:
+    """Chỉ mục chỉ tiêu tuyển sinh."""
+    return _get_index("admission_targets.csv", _build_target_index)
+
+
+def search_targets(ma_nganh: Optional[str] = None, phuong_thuc: Optional[str] = None,
+                   to_hop: Optional[str] = None, name: Optional[str] = None) -> Tuple[TargetRecord, ...]:
+    """
+    Lọc chỉ tiêu theo mã ngành, phương thức, tổ hợp môn và/hoặc tên ngành
+
+    Args:
+        ma_nganh: Mã ngành (khớp chính xác)
+        phuong_thuc: Mã phương thức xét tuyển (khớp chính xác)
+        to_hop: Mã tổ hợp môn
+        name: Từ khóa tên ngành/chương trình (so khớp không dấu)
+
+    Returns:
+        Các bản ghi theo thứ tự trong file
+    """
+    index = get_target_index()
+    if ma_nganh:
+        records = index.by_major_code.get(ma_nganh.strip(), ())
+    elif phuong_thuc:
+        records = index.by_method.get(phuong_thuc.strip(), ())
+    else:
+        records = index.records
+
+    if phuong_thuc:
+        method = phuong_thuc.strip()
+        records = tuple(rec for rec in records if rec.admission_method == method)
+    if to_hop:
+        combo = to_hop.strip()
+        records = tuple(rec for rec in records if combo in rec.combinations)
+    if name:
+        mq = strip_diacritics(name.lower())
+        records = tuple(rec for rec in records if mq in rec.major_name_ascii or mq in rec.program_name_ascii)
+    return records
+
+
+# ---------- Phương thức xét tuyển (admission_methods.csv) ----------
+
+class MethodIndex(NamedTuple):
+    rows: Tuple[Dict[str, Any], ...]
+    by_code: Mapping[str, Tuple[Mapping[str, str], ...]]
+
+
+def _build_method_index(rows: List[Dict[str, Any]]) -> MethodIndex:
+    # by_code chỉ giữ các trường cần hiển thị, đã chuẩn hóa về str (dòng CSV thiếu cột -> "")
+    return MethodIndex(
+        rows=tuple(rows),
+        by_code=_group((str(r.get("method_code")), MappingProxyType({
+            "method_name": r.get("method_name") or "", "abbreviation": r.get("abbreviation") or "",
+            "description": r.get("description") or ""})) for r in rows if r.get("method_code")),
+    )
+
+
+def get_method_index() -> MethodIndex:
+    """Chỉ mục phương thức xét tuyển."""
+    return _get_index("admission_methods.csv", _build_method_index)
+
+
+# ---------- Suy luận ngành từ câu hỏi (majors + scores + targets) ----------
+
+class MajorMatcher:
+    """
+    So khớp tên ngành/chương trình (đã normalize) với các biến thể của câu hỏi
+
+    Điểm của 1 ứng viên với 1 biến thể v của câu hỏi:
+    - len(ứng viên) nếu ứng viên nằm trong v (tìm bằng automaton, 1 lần duyệt v)
+    - len(v) nếu v nằm trong ứng viên (tìm bằng str.find trên chuỗi nối các ứng viên;
+      mọi ứng viên chứa v có cùng điểm nên chỉ cần ứng viên đầu tiên)
+    Kết quả là ứng viên có điểm cao nhất, bằng điểm thì lấy ứng viên đứng trước.
+    """
+
+    _SEP = "\n"  # Biến thể của câu hỏi không chứa ký tự xuống dòng
+
+    def __init__(self, candidates: Iterable[str]) -> None:
+        """
+        Dựng bộ so khớp
+
+        Args:
+            candidates: Tên ngành/chương trình theo thứ tự ưu tiên
+        """
+        names: List[str] = []
+        norms: List[str] = []
+        seen = set()
+        for cand in candidates:
+            cnorm = normalize_text(cand)
+            if not cnorm or cnorm in seen:
+                continue  # Trùng tên chuẩn hóa: ứng viên đứng trước luôn thắng
+            seen.add(cnorm)
+            names.append(cand)
+            norms.append(cnorm)
+
+        self.names: Tuple[str, ...] = tuple(names)
+        self.norms: Tuple[str, ...] = tuple(norms)
+        self._automaton = AhoCorasick(norms)
+        self._joined = self._SEP.join(norms)
+        offsets, pos = [], 0
+        for cnorm in norms:
+            offsets.append(pos)
+            pos += len(cnorm) + len(self._SEP)
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def best_match(self, variants: Iterable[str]) -> Optional[str]:
+        """
+        Tìm ứng viên khớp dài nhất với các biến thể của câu hỏi
+
+        Args:
+            variants: Các biến thể đã normalize của câu hỏi
+
+        Returns:
+            Tên ứng viên (dạng gốc) hoặc None
+        """
+        best_len, best_idx = 0, -1
+        for vn in variants:
+            if not vn:
+                continue
+            for _, _, idx in self._automaton.find_all(vn):
+                overlap = len(self.norms[idx])
+                if overlap > best_len or (overlap == best_len and idx < best_idx):
+                    best_len, best_idx = overlap, idx
+            if len(vn) >= best_len:
+                pos = self._joined.find(vn)
+                if pos >= 0:
+                    idx = bisect_right(self._offsets, pos) - 1
+                    if len(vn) > best_len or idx < best_idx:
+                        best_len, best_idx = len(vn), idx
+        return self.names[best_idx] if best_idx >= 0 else None
+
+
+def _build_major_matcher(majors: List[Dict[str, Any]], scores: List[Dict[str, Any]],
+                         targets: List[Dict[str, Any]]) -> MajorMatcher:
+    candidates: List[str] = []
+    for r in majors:
+        if name := (r.get("major_name") or "").strip():
+            candidates.append(name)
+    for r in scores:
+        if pname := (r.get("program_name") or "").strip():
+            candidates.append(pname)
+    for r in targets:
+        if pname := (r.get("program_name") or "").strip():
+            candidates.append(pname)
+        if mname := (r.get("major_name") or "").strip():
+            candidates.append(mname)
+    return MajorMatcher(candidates)
+
+
+def get_major_matcher() -> MajorMatcher:
+    """Bộ so khớp tên ngành (dựng lại khi 1 trong 3 file nguồn thay đổi)."""
+    return _get_index(("majors.csv", "admission_scores.csv", "admission_targets.csv"), _build_major_matcher)
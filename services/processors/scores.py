@@ -2,12 +2,9 @@
 Scores Module - Xử lý điểm chuẩn, điểm sàn
 """
 
-import os
 from typing import Any, Dict, List, Optional
 
-from config import DATA_DIR
-from .cache import read_csv
-from .utils import strip_diacritics, canonicalize_vi_ascii, clean_program_name
+from .indexes import search_scores
 
 
 def find_standard_score(
@@ -23,78 +20,15 @@ def find_standard_score(
     Returns:
         List điểm chuẩn theo ngành và năm
     """
-    rows = read_csv(os.path.join(DATA_DIR, "admission_scores.csv"))
-    if not rows:
-        return []
-
-    # Lấy danh sách các cột năm từ header
-    year_columns = []
-    if rows:
-        first_row_keys = list(rows[0].keys())
-        for key in first_row_keys:
-            if key.isdigit() and len(key) == 4:
-                year_num = int(key)
-                if 2020 <= year_num <= 2025:
-                    year_columns.append(key)
-        year_columns.sort()
-
-    results: List[Dict[str, Any]] = []
-
-    for r in rows:
-        program_name = (r.get("program_name") or "").strip()
-        if not program_name:
-            continue
-
-        program_name_cleaned = clean_program_name(program_name)
-        program_name_lower = program_name_cleaned.lower()
-        program_name_ascii = strip_diacritics(program_name_lower)
-        program_name_ascii = canonicalize_vi_ascii(program_name_ascii)
-
-        # Lọc theo ngành nếu có
-        if major:
-            mq = major.lower()
-            mq_ascii = strip_diacritics(mq)
-            mq_ascii = canonicalize_vi_ascii(mq_ascii)
-            if (mq not in program_name_lower) and (mq_ascii not in program_name_ascii):
-                continue
-
-        # Lấy điểm cho từng năm
-        for year_key in year_columns:
-            if year and year != year_key:
-                continue
-
-            score_value = r.get(year_key, "")
-            if not score_value:
-                continue
-
-            score_str = str(score_value).strip()
-            score_lower = score_str.lower()
-
-            # Bỏ qua các giá trị đặc biệt
-            if score_lower in ["chưa tuyển", "chua tuyen", ""]:
-                continue
-            if "tuyển chung" in score_lower or "tuyen chung" in score_lower:
-                continue
-            if "chưa" in score_lower and "tuyển" in score_lower:
-                continue
-
-            # Thử chuyển đổi sang số
-            try:
-                score_str_clean = score_str.replace(",", ".")
-                score_float = float(score_str_clean)
-
-                results.append(
-                    {
-                        "program_name": program_name_cleaned,
-                        "nam": year_key,
-                        "diem_chuan": score_float,
-                        "subject_combination": r.get("subject_combination", ""),
-                    }
-                )
-            except (ValueError, TypeError):
-                continue
-
-    return results
+    return [
+        {
+            "program_name": rec.program_name,
+            "nam": rec.year,
+            "diem_chuan": rec.score,
+            "subject_combination": rec.subject_combination,
+        }
+        for rec in search_scores(major, year)
+    ]
 
 
 def suggest_majors_by_score(request_data: Dict[str, Any]) -> List[Dict[str, Any]]:
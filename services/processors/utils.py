@@ -1,12 +1,11 @@
 """Utility Functions - Text normalization và formatting."""
 
-import os
 import re
 from typing import Any, Dict, List, Optional
 
 import unicodedata
 
-from config import DATA_DIR
+from utils.metrics import timed
 
 
 def strip_diacritics(text: str) -> str:
@@ -40,9 +39,13 @@ def clean_program_name(name: str) -> str:
     return parts[-1] if len(parts) >= 2 else name.strip()
 
 
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+_DIGITS_RE = re.compile(r"\d+")
+
+
 def infer_major_from_message(message: str) -> Optional[str]:
     """Suy luận tên ngành từ message khi entity extractor không bắt được."""
-    from .cache import read_csv
+    from .indexes import get_major_matcher
 
     if not message:
         return None
@@ -60,34 +63,11 @@ def infer_major_from_message(message: str) -> Optional[str]:
     ]:
         base = base.replace(repl[0], repl[1])
         variants.add(base)
-    variants.add(re.sub(r"\b(19|20)\d{2}\b", " ", msg_norm))
-    variants.add(re.sub(r"\d+", " ", msg_norm))
+    variants.add(_YEAR_RE.sub(" ", msg_norm))
+    variants.add(_DIGITS_RE.sub(" ", msg_norm))
     variants = {" ".join(v.split()) for v in variants if v}
 
-    candidates: List[str] = []
-    for r in read_csv(os.path.join(DATA_DIR, "majors.csv")):
-        if name := (r.get("major_name") or "").strip():
-            candidates.append(name)
-    for r in read_csv(os.path.join(DATA_DIR, "admission_scores.csv")):
-        if pname := (r.get("program_name") or "").strip():
-            candidates.append(pname)
-    for r in read_csv(os.path.join(DATA_DIR, "admission_targets.csv")):
-        if pname := (r.get("program_name") or "").strip():
-            candidates.append(pname)
-        if mname := (r.get("major_name") or "").strip():
-            candidates.append(mname)
-
-    best_match, best_len = None, 0
-    for cand in candidates:
-        cnorm = normalize_text(cand)
-        if not cnorm:
-            continue
-        for vn in variants:
-            if cnorm in vn or vn in cnorm:
-                overlap_len = len(cnorm) if cnorm in vn else len(vn)
-                if overlap_len > best_len:
-                    best_match, best_len = cand, overlap_len
-    return best_match
+    return get_major_matcher().best_match(variants)
 
 
 def _get_method_name_mapping() -> Dict[str, str]:
@@ -126,6 +106,7 @@ def _get_method_name_mapping() -> Dict[str, str]:
     return method_mapping
 
 
+@timed("processors.format_data_to_text")
 def format_data_to_text(data: List[Dict[str, Any]], data_type: str) -> str:
     """Format data thành text để hiển thị."""
     if not data:
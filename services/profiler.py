@@ -0,0 +1,237 @@
+"""
+Request Profiler - Bật cProfile cho từng request /chat/advanced ngay khi server đang chạy
+
+Chọn request cần profile theo 2 cách:
+- Header X-Debug-Profile mang đúng PROFILE_TOKEN (không có token thì header bị bỏ qua)
+- Lấy mẫu 1 trên PROFILE_SAMPLE_RATE request (đổi được khi chạy qua /admin/profiles/sampling)
+
+cProfile chỉ đo thread gọi enable(), nên profile được bật bên trong worker của NLP
+executor (thread/process) quanh đúng lời gọi handle_message. Kết quả (pstats đã
+marshal, cùng định dạng với Profile.dump_stats) được ghi ra thư mục xoay vòng: mỗi
+profile gồm file .prof (mở bằng pstats, snakeviz, flameprof...) và file .json mô tả.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import get_profile_dir, get_profile_max_files, get_profile_sample_rate, get_profile_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Debug-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls", "name", "filename")
+
+_NAME_RE = re.compile(r"^[0-9TZ]{16}-[0-9a-f]{1,32}-\d+$")
+
+
+def run_profiled(func: Callable[..., Any], *args: Any) -> Tuple[Any, bytes]:
+    """
+    Chạy func(*args) dưới cProfile (trong thread/process hiện tại)
+
+    Returns:
+        (kết quả của func, pstats đã marshal)
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        result = func(*args)
+    finally:
+        profile.disable()
+    profile.create_stats()
+    return result, marshal.dumps(profile.stats)
+
+
+def _function_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":  # Hàm built-in
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def top_functions(stats_data: bytes, limit: int = 5) -> List[Dict[str, Any]]:
+    """Các hàm tốn thời gian tự thân (tottime) nhiều nhất, để xem nhanh trong danh sách profile."""
+    stats = marshal.loads(stats_data)
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [{"function": _function_label(func), "calls": nc, "tottime_ms": round(tt * 1000, 3),
+             "cumtime_ms": round(ct * 1000, 3)}
+            for func, (cc, nc, tt, ct, callers) in rows]
+
+
+class ProfileStore:
+    """
+    Thư mục profile xoay vòng: giữ tối đa max_files profile, xóa profile cũ nhất khi vượt
+
+    Args:
+        directory: Thư mục lưu (mặc định từ PROFILE_DIR)
+        max_files: Số profile tối đa (mặc định từ PROFILE_MAX_FILES)
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_files: Optional[int] = None) -> None:
+        self.directory = directory or get_profile_dir()
+        self.max_files = max(1, max_files if max_files is not None else get_profile_max_files())
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _path(self, name: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{name}.{ext}")
+
+    def _names(self) -> List[str]:
+        """Tên các profile hiện có, cũ nhất trước (tên bắt đầu bằng thời điểm UTC)."""
+        try:
+            files = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(f[:-5] for f in files if f.endswith(".prof") and _NAME_RE.match(f[:-5]))
+
+    def save(self, stats_data: bytes, meta: Dict[str, Any]) -> str:
+        """
+        Ghi 1 profile (file .prof + .json) rồi xóa các profile cũ vượt max_files
+
+        Args:
+            stats_data: pstats đã marshal (từ run_profiled)
+            meta: Thông tin request (path, intent, thời gian...)
+
+        Returns:
+            Tên profile (dùng cho GET /admin/profiles/{name})
+        """
+        now = datetime.now(timezone.utc)
+        request_id = re.sub(r"[^0-9a-f]", "", str(meta.get("request_id") or "").lower())[:12] or "0"
+        with self._lock:
+            self._seq += 1
+            name = f"{now.strftime('%Y%m%dT%H%M%SZ')}-{request_id}-{self._seq}"
+        os.makedirs(self.directory, exist_ok=True)
+
+        record = {"name": name, "created_at": now.isoformat(), "size_bytes": len(stats_data), **meta,
+                  "top": top_functions(stats_data)}
+        for ext, payload in (("prof", stats_data), ("json", json.dumps(record, ensure_ascii=False).encode("utf-8"))):
+            tmp = self._path(name, ext) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, self._path(name, ext))
+        self._rotate()
+        return name
+
+    def _rotate(self) -> None:
+        with self._lock:
+            names = self._names()
+            for name in names[:max(0, len(names) - self.max_files)]:
+                for ext in ("prof", "json"):
+                    try:
+                        os.remove(self._path(name, ext))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Mô tả các profile, mới nhất trước."""
+        records = []
+        for name in reversed(self._names()):
+            try:
+                with open(self._path(name, "json"), "r", encoding="utf-8") as f:
+                    records.append(json.load(f))
+            except (OSError, ValueError):  # Profile vừa bị xóa khi xoay vòng hoặc file .json hỏng
+                continue
+        return records
+
+    def path(self, name: str) -> Optional[str]:
+        """Đường dẫn file .prof của profile (None nếu tên không hợp lệ hoặc không tồn tại)."""
+        if not _NAME_RE.match(name):
+            return None
+        path = self._path(name, "prof")
+        return path if os.path.isfile(path) else None
+
+    def render_text(self, name: str, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """Bảng pstats dạng text của 1 profile (None nếu không tồn tại)."""
+        path = self.path(name)
+        if path is None:
+            return None
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort không hợp lệ: {sort!r} (chọn {', '.join(SORT_KEYS)})")
+        stream = io.StringIO()
+        stats = pstats.Stats(path, stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        stats.print_callers(limit)
+        return stream.getvalue()
+
+
+class RequestProfiler:
+    """
+    Quyết định request nào được profile và lưu kết quả
+
+    Args:
+        store: Nơi lưu profile (mặc định ProfileStore theo config)
+        sample_rate: Profile 1 trên N request, 0 = tắt (mặc định từ PROFILE_SAMPLE_RATE)
+        token: Token cho header X-Debug-Profile / X-Admin-Token (mặc định từ PROFILE_TOKEN)
+    """
+
+    def __init__(self, store: Optional[ProfileStore] = None, sample_rate: Optional[int] = None,
+                 token: Optional[str] = None) -> None:
+        self.store = store or ProfileStore()
+        self.sample_rate = max(0, sample_rate if sample_rate is not None else get_profile_sample_rate())
+        self.token = get_profile_token() if token is None else token
+        self._lock = threading.Lock()
+        self._seen = 0
+        self.stats: Dict[str, int] = {"header": 0, "sampled": 0, "saved": 0, "failed": 0}
+
+    def check_token(self, value: Optional[str]) -> bool:
+        """Token hợp lệ (so sánh thời gian hằng); luôn False khi chưa cấu hình PROFILE_TOKEN."""
+        return bool(self.token) and value is not None and hmac.compare_digest(value.encode(), self.token.encode())
+
+    def should_profile(self, header_value: Optional[str] = None) -> Optional[str]:
+        """
+        Request hiện tại có cần profile không
+
+        Args:
+            header_value: Giá trị header X-Debug-Profile (None nếu không có)
+
+        Returns:
+            Lý do ("header" hoặc "sample"), None nếu không profile
+        """
+        if header_value is not None and self.check_token(header_value):
+            self.stats["header"] += 1
+            return "header"
+        rate = self.sample_rate
+        if rate <= 0:
+            return None
+        with self._lock:
+            self._seen += 1
+            hit = self._seen % rate == 0
+        if hit:
+            self.stats["sampled"] += 1
+            return "sample"
+        return None
+
+    def set_sample_rate(self, sample_rate: int) -> None:
+        """Đổi tần suất lấy mẫu khi đang chạy (0 = tắt)."""
+        with self._lock:
+            self.sample_rate = max(0, int(sample_rate))
+            self._seen = 0
+
+    def save(self, stats_data: bytes, meta: Dict[str, Any]) -> Optional[str]:
+        """Lưu profile; lỗi ghi file chỉ được log, không làm hỏng request."""
+        try:
+            name = self.store.save(stats_data, meta)
+        except (OSError, ValueError) as e:
+            self.stats["failed"] += 1
+            logger.warning(f"Không lưu được profile: {e}")
+            return None
+        self.stats["saved"] += 1
+        logger.info(f"Đã lưu profile {name} ({meta.get('trigger')}, {meta.get('duration_ms')} ms)")
+        return name
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cấu hình hiện tại và số profile đã lấy."""
+        return {"sample_rate": self.sample_rate, "header_enabled": bool(self.token),
+                "directory": self.store.directory, "max_files": self.store.max_files, **self.stats}
@@ -0,0 +1,285 @@
+"""
+Rate Limiter - Giới hạn số request theo client (sliding window counter)
+
+Mỗi client (theo từng nhóm route) chỉ giữ 3 số: chỉ số cửa sổ hiện tại, số request
+trong cửa sổ hiện tại và trong cửa sổ trước. Số request "trượt" trong WINDOW giây
+gần nhất được ước tính bằng:
+
+    previous * (1 - thời gian đã qua của cửa sổ hiện tại / window) + current
+
+Chi phí mỗi request là O(1) bất kể giới hạn lớn hay nhỏ (thay cho list timestamp).
+Client không hoạt động quá 2 cửa sổ bị xóa dần (trạng thái của họ đã về 0), kèm
+giới hạn số client tối đa (LRU) để bộ nhớ không tăng theo số IP.
+
+Backend:
+- memory: trong RAM của từng worker (mặc định)
+- redis: đếm chung trên Redis (INCR theo cửa sổ) để giới hạn đúng khi chạy nhiều worker/instance
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import (
+    get_rate_limit_backend,
+    get_rate_limit_max_clients,
+    get_rate_limit_redis_url,
+    get_rate_limit_requests,
+    get_rate_limit_routes,
+    get_rate_limit_window_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULE = "default"
+
+
+class RateLimitRule(NamedTuple):
+    """Giới hạn của 1 nhóm route: tối đa limit request mỗi window giây."""
+
+    name: str
+    limit: int
+    window: float
+
+
+class RateLimitDecision(NamedTuple):
+    """Kết quả kiểm tra 1 request."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # Giây cần chờ (0 nếu được phép)
+
+
+def _estimate(previous: int, current: int, elapsed_fraction: float) -> float:
+    return previous * (1.0 - elapsed_fraction) + current
+
+
+def _decide(rule: RateLimitRule, previous: int, current: int, elapsed: float) -> RateLimitDecision:
+    """Quyết định dựa trên số đếm (current chưa gồm request này)."""
+    fraction = elapsed / rule.window
+    estimate = _estimate(previous, current, fraction)
+    if estimate + 1 <= rule.limit:
+        return RateLimitDecision(True, rule.limit, max(0, int(rule.limit - estimate - 1)), 0.0)
+    # Chờ đến khi phần của cửa sổ trước giảm đủ (hoặc sang cửa sổ mới nếu chỉ riêng current đã đủ giới hạn)
+    if previous and current + 1 <= rule.limit:
+        wait = (1.0 - (rule.limit - 1 - current) / previous - fraction) * rule.window
+    else:
+        wait = rule.window - elapsed
+    return RateLimitDecision(False, rule.limit, 0, max(wait, 0.001))
+
+
+class RateLimiter:
+    """
+    Chọn rule theo route và kiểm tra giới hạn
+
+    Route khớp theo tiền tố dài nhất trong routes; không khớp thì dùng rule mặc định.
+    Mỗi rule có bộ đếm riêng: request vào /chat/batch không làm giảm lượt của route khác.
+    """
+
+    name = "base"
+
+    def __init__(self, default: RateLimitRule, routes: Optional[Dict[str, RateLimitRule]] = None) -> None:
+        self.default = default
+        # Tiền tố dài trước để khớp cụ thể nhất
+        self.routes: List[Tuple[str, RateLimitRule]] = sorted((routes or {}).items(), key=lambda kv: -len(kv[0]))
+
+    def rule_for(self, path: str) -> RateLimitRule:
+        for prefix, rule in self.routes:
+            if path.startswith(prefix):
+                return rule
+        return self.default
+
+    def hit(self, client: str, path: str) -> RateLimitDecision:
+        """Ghi nhận 1 request và trả về quyết định."""
+        raise NotImplementedError
+
+    async def hit_async(self, client: str, path: str) -> RateLimitDecision:
+        """Như hit() (backend memory chạy trực tiếp trên event loop)."""
+        return self.hit(client, path)
+
+    def get_stats(self) -> Dict[str, object]:
+        return {"backend": self.name, "default": self.default._asdict(),
+                "routes": {prefix: rule._asdict() for prefix, rule in self.routes}}
+
+    def close(self) -> None:
+        pass
+
+
+class _Counter:
+    __slots__ = ("index", "current", "previous", "window")
+
+    def __init__(self, index: int, window: float) -> None:
+        self.index = index  # Chỉ số cửa sổ hiện tại (thời điểm // window)
+        self.current = 0
+        self.previous = 0
+        self.window = window
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Sliding window counter trong RAM (mỗi client 1 _Counter, xóa khi không hoạt động)."""
+
+    name = "memory"
+
+    def __init__(self, default: RateLimitRule, routes: Optional[Dict[str, RateLimitRule]] = None,
+                 max_clients: int = 100000, clock=time.monotonic) -> None:
+        super().__init__(default, routes)
+        self.max_clients = max(1, max_clients)
+        self._clock = clock
+        self._counters: "OrderedDict[Tuple[str, str], _Counter]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"allowed": 0, "rejected": 0, "evicted_idle": 0, "evicted_lru": 0}
+
+    def hit(self, client: str, path: str) -> RateLimitDecision:
+        rule = self.rule_for(path)
+        now = self._clock()
+        index = int(now // rule.window)
+        key = (rule.name, client)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = _Counter(index, rule.window)
+            else:
+                self._counters.move_to_end(key)
+                if index != counter.index:
+                    counter.previous = counter.current if index == counter.index + 1 else 0
+                    counter.current = 0
+                    counter.index = index
+            decision = _decide(rule, counter.previous, counter.current, now - index * rule.window)
+            if decision.allowed:
+                counter.current += 1
+                self.stats["allowed"] += 1
+            else:
+                self.stats["rejected"] += 1
+            self._evict(now)
+        return decision
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**super().get_stats(), "clients": len(self._counters), **self.stats}
+
+    def _evict(self, now: float) -> None:
+        # OrderedDict xếp theo lần truy cập: client lâu nhất nằm đầu. Mỗi request xóa tối đa
+        # vài client đã quá 2 cửa sổ (số đếm đã về 0) nên chi phí vẫn O(1) khấu hao
+        counters = self._counters
+        for _ in range(2):
+            if not counters:
+                break
+            counter = next(iter(counters.values()))
+            if now // counter.window - counter.index < 2:
+                break
+            counters.popitem(last=False)
+            self.stats["evicted_idle"] += 1
+        while len(counters) > self.max_clients:
+            counters.popitem(last=False)
+            self.stats["evicted_lru"] += 1
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Sliding window counter dùng chung trên Redis
+
+    Mỗi (rule, client, cửa sổ) là 1 key đếm bằng INCR, hết hạn sau 2 cửa sổ. Mỗi request
+    là 1 pipeline (INCR + PEXPIRE + GET cửa sổ trước); request bị từ chối được trả lại lượt (DECR).
+    Redis lỗi thì cho qua (fail open) để không chặn toàn bộ người dùng.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, default: RateLimitRule, routes: Optional[Dict[str, RateLimitRule]] = None,
+                 prefix: str = "huce:rl:", clock=time.time) -> None:
+        super().__init__(default, routes)
+        self.client = client
+        self.prefix = prefix
+        self._clock = clock  # Thời gian thực: các worker phải thấy cùng chỉ số cửa sổ
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"allowed": 0, "rejected": 0, "errors": 0}
+
+    def hit(self, client: str, path: str) -> RateLimitDecision:
+        rule = self.rule_for(path)
+        now = self._clock()
+        index = int(now // rule.window)
+        base = f"{self.prefix}{rule.name}:{client}:"
+        current_key = f"{base}{index}"
+        try:
+            current, _, previous = self.client.pipeline([
+                ("INCR", current_key),
+                ("PEXPIRE", current_key, int(rule.window * 2000)),
+                ("GET", f"{base}{index - 1}"),
+            ])
+            decision = _decide(rule, int(previous or 0), current - 1, now - index * rule.window)
+            if not decision.allowed:
+                self.client.execute("DECR", current_key)
+        except Exception as e:
+            logger.warning(f"Rate limiter Redis lỗi, cho qua request: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+            return RateLimitDecision(True, rule.limit, rule.limit, 0.0)
+        with self._lock:
+            self.stats["allowed" if decision.allowed else "rejected"] += 1
+        return decision
+
+    async def hit_async(self, client: str, path: str) -> RateLimitDecision:
+        # I/O mạng: chạy trong thread để không chặn event loop
+        return await asyncio.to_thread(self.hit, client, path)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**super().get_stats(), **self.stats}
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def parse_route_limits(spec: str) -> Dict[str, RateLimitRule]:
+    """
+    Đọc giới hạn theo route dạng "/chat/batch=10/60,/chat/advanced=60/60"
+
+    Args:
+        spec: Danh sách "tiền_tố_route=số_request/số_giây" ngăn cách bởi dấu phẩy
+
+    Returns:
+        Dict tiền tố -> RateLimitRule
+    """
+    routes: Dict[str, RateLimitRule] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            prefix, limit_spec = item.rsplit("=", 1)
+            limit, window = limit_spec.split("/")
+            routes[prefix.strip()] = RateLimitRule(prefix.strip(), int(limit), float(window))
+        except ValueError:
+            raise ValueError(f"RATE_LIMIT_ROUTES không hợp lệ: {item!r} (dạng /route=request/giây)")
+    return routes
+
+
+def create_rate_limiter(backend: Optional[str] = None) -> RateLimiter:
+    """
+    Tạo rate limiter theo cấu hình
+
+    Args:
+        backend: memory/redis (mặc định từ RATE_LIMIT_BACKEND)
+    """
+    default = RateLimitRule(DEFAULT_RULE, get_rate_limit_requests(), get_rate_limit_window_seconds())
+    routes = parse_route_limits(get_rate_limit_routes())
+    backend = (backend or get_rate_limit_backend()).strip().lower()
+    if backend == "memory":
+        return MemoryRateLimiter(default, routes, max_clients=get_rate_limit_max_clients())
+    if backend == "redis":
+        from services.context_backends import RespClient
+        return RedisRateLimiter(RespClient.from_url(get_rate_limit_redis_url()), default, routes)
+    raise ValueError(f"RATE_LIMIT_BACKEND không hợp lệ: {backend!r} (chọn memory, redis)")
+
+
+def retry_after_seconds(decision: RateLimitDecision) -> int:
+    """Giá trị header Retry-After (giây, làm tròn lên)."""
+    return max(1, math.ceil(decision.retry_after))
@@ -5,7 +5,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 from main import app
-from services.nlp_service import get_nlp_service
+from services.nlp_service import get_nlp_service, peek_nlp_service
 
 
 @pytest.fixture
@@ -110,9 +110,13 @@ def test_session_id():
 
 
 @pytest.fixture(autouse=True)
-def reset_test_context(nlp_service, test_session_id):
-    """Auto reset context before each test"""
-    nlp_service.reset_context(test_session_id)
+def reset_test_context(test_session_id):
+    """Auto reset context before each test (tests that never build the NLP service do not pay for it)"""
+    service = peek_nlp_service()
+    if service is not None:
+        service.reset_context(test_session_id)
     yield
     # Cleanup after test
-    nlp_service.reset_context(test_session_id)
+    service = peek_nlp_service()
+    if service is not None:
+        service.reset_context(test_session_id)
@@ -0,0 +1,272 @@
+"""
+Minimal in-process RESP (Redis protocol) server used as a stand-in for Redis in tests.
+
+Supports only the commands the backends use, with lazy key expiry driven by a
+replaceable clock, and WATCH/MULTI/EXEC optimistic transactions.
+"""
+
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class _Error(Exception):
+    pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self) -> None:
+        super().setup()
+        # Replies are small writes; without this Nagle + delayed ACK adds ~40 ms per pipeline
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self) -> None:
+        server: "RespServer" = self.server.owner  # type: ignore[attr-defined]
+        watched: Dict[bytes, int] = {}
+        queued: Optional[List[List[bytes]]] = None
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name = command[0].upper()
+            try:
+                if name == b"WATCH":
+                    watched.update(server.watch(command[1:]))
+                    reply: Any = "OK"
+                elif name == b"UNWATCH":
+                    watched.clear()
+                    reply = "OK"
+                elif name == b"MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == b"EXEC":
+                    reply = server.exec(queued or [], watched)
+                    queued = None
+                    watched.clear()
+                elif queued is not None:
+                    queued.append(command)
+                    reply = "QUEUED"
+                else:
+                    reply = server.dispatch(command)
+            except _Error as e:
+                self.wfile.write(b"-ERR " + str(e).encode() + b"\r\n")
+                continue
+            self.wfile.write(_encode(reply))
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+def _encode(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    if isinstance(value, _Error):
+        return b"-ERR " + str(value).encode() + b"\r\n"
+    raise TypeError(type(value))
+
+
+class RespServer:
+    """Threaded RESP server on 127.0.0.1 with an ephemeral port."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.commands: List[Tuple[bytes, ...]] = []
+        self.key_versions: Dict[bytes, int] = {}  # Bumped on every write, used by WATCH
+        self._lock = threading.RLock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self  # type: ignore[attr-defined]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "RespServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ---------- Commands ----------
+
+    _WRITES = {b"SET", b"INCR", b"INCRBY", b"DECR", b"DEL", b"PEXPIRE", b"HSET", b"RPUSH", b"LTRIM"}
+
+    def dispatch(self, args: List[bytes]) -> Any:
+        name = args[0].upper().decode()
+        with self._lock:
+            self.commands.append(tuple(args))
+            handler = getattr(self, f"_cmd_{name.lower()}", None)
+            if handler is None:
+                raise _Error(f"unknown command '{name}'")
+            if args[0].upper() in self._WRITES:
+                for key in (args[1:] if name == "DEL" else args[1:2]):
+                    self.key_versions[key] = self.key_versions.get(key, 0) + 1
+            return handler(*args[1:])
+
+    def watch(self, keys: List[bytes]) -> Dict[bytes, int]:
+        with self._lock:
+            return {key: self.key_versions.get(key, 0) for key in keys}
+
+    def exec(self, queued: List[List[bytes]], watched: Dict[bytes, int]) -> Optional[List[Any]]:
+        with self._lock:
+            if any(self.key_versions.get(key, 0) != version for key, version in watched.items()):
+                return None
+            replies = []
+            for command in queued:
+                try:
+                    replies.append(self.dispatch(command))
+                except _Error as e:
+                    replies.append(e)
+            return replies
+
+    def _live(self, key: bytes) -> Optional[Any]:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _typed(self, key: bytes, kind: type) -> Any:
+        value = self._live(key)
+        if value is not None and not isinstance(value, kind):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_ping(self, *args: bytes) -> Any:
+        return args[0] if args else "PONG"
+
+    def _cmd_auth(self, *args: bytes) -> str:
+        return "OK"
+
+    def _cmd_select(self, db: bytes) -> str:
+        return "OK"
+
+    def _cmd_flushdb(self) -> str:
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    def _cmd_get(self, key: bytes) -> Optional[bytes]:
+        return self._typed(key, bytes)
+
+    def _cmd_set(self, key: bytes, value: bytes, *options: bytes) -> str:
+        self.data[key] = value
+        self.expires.pop(key, None)
+        opts = [o.upper() for o in options]
+        if b"PX" in opts:
+            self.expires[key] = self.clock() + int(options[opts.index(b"PX") + 1]) / 1000
+        return "OK"
+
+    def _cmd_incrby(self, key: bytes, amount: bytes) -> int:
+        value = int(self._typed(key, bytes) or b"0") + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def _cmd_incr(self, key: bytes) -> int:
+        return self._cmd_incrby(key, b"1")
+
+    def _cmd_decr(self, key: bytes) -> int:
+        return self._cmd_incrby(key, b"-1")
+
+    def _cmd_del(self, *keys: bytes) -> int:
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def _cmd_exists(self, *keys: bytes) -> int:
+        return sum(self._live(key) is not None for key in keys)
+
+    def _cmd_pexpire(self, key: bytes, ms: bytes) -> int:
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = self.clock() + int(ms) / 1000
+        return 1
+
+    def _cmd_pttl(self, key: bytes) -> int:
+        if self._live(key) is None:
+            return -2
+        if key not in self.expires:
+            return -1
+        return int((self.expires[key] - self.clock()) * 1000)
+
+    def _cmd_hset(self, key: bytes, *pairs: bytes) -> int:
+        if not pairs or len(pairs) % 2:
+            raise _Error("wrong number of arguments for 'hset' command")
+        hash_ = self._typed(key, dict)
+        if hash_ is None:
+            hash_ = self.data[key] = {}
+        added = 0
+        for i in range(0, len(pairs), 2):
+            added += pairs[i] not in hash_
+            hash_[pairs[i]] = pairs[i + 1]
+        return added
+
+    def _cmd_hget(self, key: bytes, field: bytes) -> Optional[bytes]:
+        return (self._typed(key, dict) or {}).get(field)
+
+    def _cmd_hgetall(self, key: bytes) -> List[bytes]:
+        hash_ = self._typed(key, dict) or {}
+        return [item for pair in hash_.items() for item in pair]
+
+    def _cmd_rpush(self, key: bytes, *values: bytes) -> int:
+        list_ = self._typed(key, list)
+        if list_ is None:
+            list_ = self.data[key] = []
+        list_.extend(values)
+        return len(list_)
+
+    @staticmethod
+    def _range(length: int, start: int, stop: int) -> slice:
+        start = max(0, start + length if start < 0 else start)
+        stop = stop + length if stop < 0 else stop
+        return slice(start, max(start, stop + 1))
+
+    def _cmd_lrange(self, key: bytes, start: bytes, stop: bytes) -> List[bytes]:
+        list_ = self._typed(key, list) or []
+        return list_[self._range(len(list_), int(start), int(stop))]
+
+    def _cmd_ltrim(self, key: bytes, start: bytes, stop: bytes) -> str:
+        list_ = self._typed(key, list)
+        if list_ is not None:
+            list_[:] = list_[self._range(len(list_), int(start), int(stop))]
+            if not list_:
+                del self.data[key]
+        return "OK"
+
+    def _cmd_scan(self, cursor: bytes, *options: bytes) -> List[Any]:
+        opts = [o.upper() for o in options]
+        pattern = options[opts.index(b"MATCH") + 1].decode() if b"MATCH" in opts else "*"
+        keys = [key for key in list(self.data) if self._live(key) is not None
+                and fnmatch.fnmatchcase(key.decode(), pattern)]
+        return [b"0", keys]
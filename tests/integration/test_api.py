@@ -5,6 +5,8 @@ Tests the FastAPI endpoints with real requests.
 """
 import pytest
 
+from services.nlp_service import get_nlp_service
+
 
 @pytest.mark.integration
 @pytest.mark.api
@@ -139,6 +141,66 @@ class TestChatAdvancedEndpoint:
         assert "analysis" in data
 
 
+@pytest.mark.integration
+@pytest.mark.api
+class TestChatBatchEndpoint:
+    """Test /chat/batch endpoint"""
+
+    def test_chat_batch_basic(self, test_client):
+        """Each item gets its own analysis/response, in request order"""
+        payload = {"items": [
+            {"message": "Điểm chuẩn ngành Kiến trúc?", "session_id": "batch_a", "use_context": False},
+            {"message": "Học phí năm 2025 là bao nhiêu?", "session_id": "batch_b", "use_context": False},
+            {"message": "Điểm chuẩn ngành Kiến trúc?", "session_id": "batch_c", "use_context": False},
+        ]}
+
+        response = test_client.post("/chat/batch", json=payload)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert data["count"] == 3
+        assert [r["session_id"] for r in data["results"]] == ["batch_a", "batch_b", "batch_c"]
+        for result in data["results"]:
+            assert "intent" in result["analysis"]
+            assert "type" in result["response"]
+            assert "message" in result["response"]
+        assert data["results"][0]["analysis"] == data["results"][2]["analysis"]
+
+    def test_chat_batch_same_session_chains_context(self, test_client):
+        """Items of the same session are processed in order and share context"""
+        session_id = "batch_followup"
+        payload = {"items": [
+            {"message": "Điểm chuẩn ngành Kiến trúc?", "session_id": session_id},
+            {"message": "Còn học phí thế nào?", "session_id": session_id},
+        ]}
+
+        response = test_client.post("/chat/batch", json=payload)
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results[0]["context"]["conversation_history"]) == 1
+        assert len(results[1]["context"]["conversation_history"]) == 2
+
+        # The batch updates the stored context like /chat/advanced does
+        ctx = test_client.post("/chat/context", json={"action": "get", "session_id": session_id}).json()
+        history = ctx["context"]["conversation_history"]
+        assert len(history) == 2
+        assert history[0]["message"] == payload["items"][0]["message"]
+        assert history[0]["response"] == results[0]["response"]
+        assert set(results[1]["context"]["conversation_history"][0]) == {"message", "intent", "response_type"}
+        test_client.post("/chat/context", json={"action": "reset", "session_id": session_id})
+
+    def test_chat_batch_validation(self, test_client, monkeypatch):
+        """Empty batches, empty messages and oversized batches are rejected"""
+        monkeypatch.setenv("BATCH_MAX_ITEMS", "2")
+
+        assert test_client.post("/chat/batch", json={"items": []}).status_code == 422
+        assert test_client.post("/chat/batch", json={"items": [{"message": "   "}]}).status_code == 422
+        too_many = {"items": [{"message": f"Học phí {i}"} for i in range(3)]}
+        assert test_client.post("/chat/batch", json=too_many).status_code == 422
+
+
 @pytest.mark.integration
 @pytest.mark.api
 class TestContextEndpoint:
@@ -289,3 +351,368 @@ class TestAPIEdgeCases:
         # Session 2 should not have context from session 1
         assert response2.status_code == 200
         # Context should be independent
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestExecutorOverload:
+    """Test /chat/advanced when the NLP executor queue is full"""
+
+    def test_overloaded_returns_503(self, test_client, monkeypatch):
+        """A full executor queue is reported as HTTP 503 SERVICE_OVERLOADED"""
+        import main
+        from services.executor import NLPExecutor
+
+        executor = NLPExecutor(mode="inline", max_pending=1)
+        executor._pending = 1  # Giả lập 1 câu hỏi đang xử lý
+        monkeypatch.setattr(main, "get_nlp_executor", lambda: executor)
+
+        response = test_client.post("/chat/advanced", json={"message": "Học phí?", "use_context": False})
+
+        assert response.status_code == 503
+        data = response.json()
+        assert data["success"] is False
+        assert data["error_code"] == "SERVICE_OVERLOADED"
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestConcurrentSessionUpdates:
+    """Concurrent requests for one session must not lose context updates"""
+
+    def test_double_submit_is_not_lost(self, monkeypatch):
+        """The request that commits second is re-run on top of the first one's context"""
+        import asyncio
+        import httpx
+        import main
+        from services.executor import NLPExecutor
+
+        inner = NLPExecutor(mode="inline")
+        calls = []
+
+        class SlowFirstExecutor:
+            async def call(self, method, message, context):
+                calls.append(message)
+                # The follow-up question reads the context first but finishes last
+                if message.startswith("Còn") and len(calls) <= 2:
+                    await asyncio.sleep(0.2)
+                return await inner.call(method, message, context)
+
+        monkeypatch.setattr(main, "get_nlp_executor", lambda: SlowFirstExecutor())
+        session_id = "double_submit"
+        get_nlp_service().reset_context(session_id)
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                follow_up = asyncio.create_task(client.post("/chat/advanced", json={
+                    "message": "Còn học phí thế nào?", "session_id": session_id}))
+                await asyncio.sleep(0.05)
+                first = await client.post("/chat/advanced", json={
+                    "message": "Điểm chuẩn ngành Kiến trúc", "session_id": session_id})
+                return first, await follow_up
+
+        first, follow_up = asyncio.run(run())
+
+        assert first.status_code == 200 and follow_up.status_code == 200
+        assert calls.count("Còn học phí thế nào?") == 2  # Re-run after the conflict
+        context = get_nlp_service().export_context(session_id)
+        assert [h["message"] for h in context["conversation_history"]] == \
+            ["Điểm chuẩn ngành Kiến trúc", "Còn học phí thế nào?"]
+        # The major from the first question carries over into the follow-up's context
+        assert any(e.get("label") in ("TEN_NGANH", "CHUYEN_NGANH", "MA_NGANH") for e in context["last_entities"])
+        get_nlp_service().reset_context(session_id)
+
+
+    def test_slow_backend_does_not_stall_the_event_loop(self, monkeypatch):
+        """A blocking context backend runs off the event loop, so /livez answers meanwhile"""
+        import asyncio
+        import threading
+        import time
+        import httpx
+        import main
+
+        service = get_nlp_service()
+        release = threading.Event()
+
+        def slow_export(session_id, full=True):
+            release.wait(3)  # A SQLite write wait or a slow Redis round trip
+            return {}
+
+        monkeypatch.setattr(service.context_store, "blocking", True)
+        monkeypatch.setattr(service, "export_context", slow_export)
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                started = time.perf_counter()
+                slow = asyncio.create_task(client.post("/chat/context", json={"action": "get",
+                                                                               "session_id": "slow"}))
+                await asyncio.sleep(0.05)
+                live = await client.get("/livez")
+                elapsed = time.perf_counter() - started
+                release.set()
+                return live, elapsed, await slow
+
+        live, elapsed, slow = asyncio.run(run())
+
+        assert live.status_code == 200 and elapsed < 1.0
+        assert slow.status_code == 200
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestRateLimit:
+    """Test the per-route rate limit middleware"""
+
+    def test_exceeding_route_limit_returns_429(self, test_client, monkeypatch):
+        """Requests over a route's limit get HTTP 429 with Retry-After; other routes are unaffected"""
+        import main
+        from services.rate_limiter import MemoryRateLimiter, RateLimitRule
+
+        limiter = MemoryRateLimiter(RateLimitRule("default", 100, 60),
+                                    {"/chat/batch": RateLimitRule("/chat/batch", 1, 60)})
+        monkeypatch.setattr(main, "rate_limiter", limiter)
+        payload = {"items": [{"message": "Học phí?", "use_context": False}]}
+
+        assert test_client.post("/chat/batch", json=payload).status_code == 200
+        response = test_client.post("/chat/batch", json=payload)
+
+        assert response.status_code == 429
+        data = response.json()
+        assert data["error_code"] == "RATE_LIMIT_EXCEEDED"
+        assert 1 <= data["retry_after"] <= 60
+        assert response.headers["Retry-After"] == str(data["retry_after"])
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
+        assert test_client.get("/").status_code == 200
+
+    def test_request_id_and_security_headers(self, test_client, monkeypatch):
+        """Every response carries a fresh X-Request-ID, also echoed in error bodies, and security headers"""
+        import main
+
+        def broken(session_id):
+            raise ValueError("hỏng")
+
+        monkeypatch.setattr(get_nlp_service(), "export_context", broken)
+        first = test_client.get("/")
+        second = test_client.post("/chat/context", json={"action": "get"})
+
+        assert second.status_code == 400
+        assert second.json()["request_id"] == second.headers["X-Request-ID"]
+        assert first.headers["X-Request-ID"] != second.headers["X-Request-ID"]
+        for response in (first, second):
+            assert response.headers["X-Frame-Options"] == "DENY"
+            assert response.headers["Strict-Transport-Security"] == "max-age=31536000; includeSubDomains"
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestProbes:
+    """Test the liveness/readiness probes"""
+
+    def test_livez(self, test_client):
+        """GET /livez answers without touching data or context"""
+        response = test_client.get("/livez")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+
+    def test_readyz_reads_snapshot(self, test_client, monkeypatch):
+        """GET /readyz serves the precomputed snapshot without calling the context store"""
+        import main
+
+        get_nlp_service()  # What the app lifespan builds before serving
+        main.health.refresh()
+
+        def fail():
+            raise AssertionError("probe must not query the context store")
+
+        monkeypatch.setattr(get_nlp_service(), "context_stats", fail)
+        response = test_client.get("/readyz")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["model"]["loaded"] is True
+        assert data["data"]["files"] > 0 and data["data"]["version"]
+        assert "sessions" in data["context"]
+
+    def test_readyz_not_ready(self, test_client, monkeypatch):
+        """A snapshot with errors is reported as HTTP 503"""
+        import main
+
+        monkeypatch.setattr(main.health, "_snapshot", {**main.health.snapshot, "ready": False,
+                                                       "errors": ["Intent model chưa được nạp"]})
+        response = test_client.get("/readyz")
+
+        assert response.status_code == 503
+        assert response.json()["status"] == "not_ready"
+
+    def test_background_init_reports_not_ready(self, monkeypatch):
+        """NLP_INIT_MODE=background: the app answers at once, not ready until warm-up finishes"""
+        import asyncio
+        import threading
+        import httpx
+        import main
+
+        monkeypatch.setenv("NLP_INIT_MODE", "background")
+        monkeypatch.setenv("NLP_INIT_WAIT_SECONDS", "0")
+        release = threading.Event()
+        monkeypatch.setattr(get_nlp_service(), "warm_up", lambda: release.wait(10))
+        payload = {"message": "Học phí ngành Kiến trúc?", "use_context": False}
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with main.app.router.lifespan_context(main.app):
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    warming = (await client.get("/readyz"), await client.post("/chat/advanced", json=payload))
+                    release.set()
+                    for _ in range(100):
+                        if main.STARTUP.state != "warming":
+                            break
+                        await asyncio.sleep(0.05)
+                    return warming, (await client.get("/readyz"), await client.post("/chat/advanced", json=payload))
+
+        (ready_before, chat_before), (ready_after, chat_after) = asyncio.run(run())
+
+        assert ready_before.status_code == 503
+        assert ready_before.json()["startup"]["state"] == "warming"
+        assert chat_before.status_code == 503 and chat_before.json()["error_code"] == "SERVICE_NOT_READY"
+        assert ready_after.status_code == 200 and ready_after.json()["startup"]["state"] == "ready"
+        assert chat_after.status_code == 200
+
+    def test_health_reports_services(self, test_client, monkeypatch):
+        """GET /health no longer fails on data loading"""
+        import main
+
+        get_nlp_service()  # What the app lifespan builds before serving
+        main.health.refresh()
+
+        def fail():
+            raise AssertionError("/health must not query the context store")
+
+        monkeypatch.setattr(get_nlp_service(), "context_stats", fail)
+        response = test_client.get("/health")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["services"] == {"nlp": "healthy", "data": "healthy"}
+        assert "sessions" in data["context"]
+
+    def test_health_is_informational(self, test_client, monkeypatch):
+        """GET /health answers 200 even when not ready (e.g. no lifespan, stale snapshot); /readyz gates"""
+        import main
+
+        monkeypatch.setattr(main.health, "_refreshed_at", None)
+        health = test_client.get("/health")
+        ready = test_client.get("/readyz")
+
+        assert health.status_code == 200
+        assert health.json()["status"] == "unhealthy" and health.json()["ready"] is False
+        assert ready.status_code == 503
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestMetricsEndpoint:
+    """Test the Prometheus /metrics endpoint"""
+
+    def test_metrics_after_chat(self, test_client):
+        """A chat request shows up in stage histograms, intent counts and cache gauges"""
+        test_client.post("/chat/advanced", json={"message": "Học phí ngành Kiến trúc?", "use_context": False})
+        response = test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        for stage in ("http.request", "nlp.analyze", "nlp.tokenize_and_map", "nlp.intent_scoring",
+                      "nlp.entities.gazetteer", "service.handle_message", "context.append"):
+            assert f'huce_stage_duration_seconds_count{{stage="{stage}"}}' in text
+        assert 'huce_intent_total{intent="hoi_hoc_phi"}' in text
+        assert 'huce_cache_hit_ratio{cache="normalize"}' in text
+        assert "huce_executor_pending" in text
+        assert 'huce_context_sessions{backend="memory"}' in text
+
+    def test_metrics_collect_off_the_event_loop(self, test_client, monkeypatch):
+        """Backend stats (SQLite COUNT(*), Redis round trips) are gathered outside the event loop"""
+        import asyncio
+
+        service = get_nlp_service()
+        real_stats = service.context_stats
+        on_loop = []
+
+        def stats():
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return real_stats()
+
+        monkeypatch.setattr(service, "context_stats", stats)
+        response = test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert on_loop == [False]
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestRequestProfiling:
+    """Test per-request profiling of /chat/advanced and the /admin/profiles endpoints"""
+
+    @pytest.fixture
+    def profiler(self, monkeypatch, tmp_path):
+        import main
+        from services.profiler import ProfileStore, RequestProfiler
+
+        profiler = RequestProfiler(ProfileStore(directory=str(tmp_path), max_files=5), sample_rate=0, token="s3cret")
+        monkeypatch.setattr(main, "profiler", profiler)
+        return profiler
+
+    def test_debug_header_profiles_request(self, test_client, profiler):
+        """A request with the debug token is profiled and can be listed and downloaded"""
+        payload = {"message": "Học phí ngành Kiến trúc?", "use_context": False}
+        assert "X-Profile-Id" not in test_client.post("/chat/advanced", json=payload).headers
+
+        response = test_client.post("/chat/advanced", json=payload, headers={"X-Debug-Profile": "s3cret"})
+        assert response.status_code == 200
+        assert response.json()["analysis"]["intent"] == "hoi_hoc_phi"
+        name = response.headers["X-Profile-Id"]
+
+        listing = test_client.get("/admin/profiles", headers={"X-Admin-Token": "s3cret"}).json()
+        assert listing["count"] == 1
+        record = listing["profiles"][0]
+        assert record["name"] == name
+        assert record["trigger"] == "header"
+        assert record["intent"] == "hoi_hoc_phi"
+        assert record["request_id"] == response.headers["X-Request-ID"]
+
+        download = test_client.get(f"/admin/profiles/{name}", headers={"X-Admin-Token": "s3cret"})
+        assert download.status_code == 200
+        assert download.content == open(profiler.store.path(name), "rb").read()
+        text = test_client.get(f"/admin/profiles/{name}?format=text&sort=tottime",
+                               headers={"X-Admin-Token": "s3cret"})
+        assert "handle_message" in text.text
+
+    def test_runtime_sampling(self, test_client, profiler):
+        """Sampling can be switched on through the admin endpoint without a restart"""
+        headers = {"X-Admin-Token": "s3cret"}
+        response = test_client.put("/admin/profiles/sampling", json={"sample_rate": 2}, headers=headers)
+        assert response.json()["profiler"]["sample_rate"] == 2
+
+        ids = [test_client.post("/chat/advanced", json={"message": "Học phí?", "use_context": False}
+                                ).headers.get("X-Profile-Id") for _ in range(4)]
+        assert [i is not None for i in ids] == [False, True, False, True]
+        assert test_client.get("/admin/profiles", headers=headers).json()["count"] == 2
+
+    def test_admin_requires_token(self, test_client, profiler, monkeypatch):
+        """Admin endpoints reject missing or wrong tokens and are hidden without PROFILE_TOKEN"""
+        assert test_client.get("/admin/profiles").status_code == 403
+        assert test_client.get("/admin/profiles", headers={"X-Admin-Token": "nope"}).status_code == 403
+        assert test_client.get("/admin/profiles/../../etc/passwd",
+                               headers={"X-Admin-Token": "s3cret"}).status_code == 404
+        assert test_client.put("/admin/profiles/sampling", json={"sample_rate": -1},
+                               headers={"X-Admin-Token": "s3cret"}).status_code == 422
+        monkeypatch.setattr(profiler, "token", "")
+        assert test_client.get("/admin/profiles", headers={"X-Admin-Token": ""}).status_code == 404
@@ -0,0 +1,53 @@
+"""
+Unit tests for the Aho–Corasick automaton
+
+Tests multi-pattern matching used by the keyword backoff.
+"""
+import random
+
+import pytest
+
+from nlu.automaton import AhoCorasick
+
+
+def _brute_force(patterns, text):
+    return sorted(
+        (i, i + len(p), k)
+        for k, p in enumerate(patterns)
+        for i in range(len(text))
+        if p and text.startswith(p, i)
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestAhoCorasick:
+    """Test the automaton against a brute-force substring search"""
+
+    def test_finds_all_overlapping_matches(self):
+        """Overlapping and nested keywords are all reported"""
+        ac = AhoCorasick(["học phí", "phí", "học", "ọc p"])
+        assert sorted(ac.find_all("học phí ngành")) == [(0, 3, 2), (0, 7, 0), (1, 5, 3), (4, 7, 1)]
+
+    def test_vietnamese_and_spaces(self):
+        """Keywords with diacritics and leading spaces match like `in`"""
+        patterns = ["điểm chuẩn", " a00", "là gì"]
+        ac = AhoCorasick(patterns)
+        text = "điểm chuẩn khối a00 là gì"
+        assert sorted(ac.find_all(text)) == _brute_force(patterns, text)
+        assert ac.find_all("a00") == []
+
+    def test_empty_inputs(self):
+        """Empty keyword lists, empty keywords and empty text are handled"""
+        assert AhoCorasick([]).find_all("abc") == []
+        assert AhoCorasick(["", "b"]).find_all("abc") == [(1, 2, 1)]
+        assert AhoCorasick(["a"]).find_all("") == []
+
+    def test_matches_brute_force(self):
+        """Random small alphabets exercise the failure links"""
+        rng = random.Random(1)
+        for _ in range(300):
+            patterns = ["".join(rng.choice("ab ") for _ in range(rng.randint(1, 4)))
+                        for _ in range(rng.randint(1, 8))]
+            text = "".join(rng.choice("ab ") for _ in range(rng.randint(0, 30)))
+            assert sorted(AhoCorasick(patterns).find_all(text)) == _brute_force(patterns, text)
@@ -0,0 +1,88 @@
+"""
+Unit tests for the benchmark suite plumbing: corpus sampling, timing and baseline comparison
+"""
+
+import pytest
+
+from benchmarks.cases import CASES, Case
+from benchmarks.corpus import LONG_MESSAGES, load_corpus
+from benchmarks.run import compare, measure
+
+
+def _result(**cases):
+    return {"calibration_us": 100.0, "cases": {name: {"best_us": value} for name, value in cases.items()}}
+
+
+@pytest.mark.unit
+class TestCorpus:
+    """Fixed query corpus sampled from intent.csv"""
+
+    def test_deterministic(self):
+        """Same size and seed give the same corpus; another seed changes it"""
+        a, b = load_corpus(100, seed=1), load_corpus(100, seed=1)
+        assert a.messages == b.messages and a.digest == b.digest
+        assert load_corpus(100, seed=2).digest != a.digest
+
+    def test_stratified_with_long_messages(self):
+        """Every intent is represented and the long messages are appended"""
+        corpus = load_corpus(200)
+        assert {"hoi_diem_chuan", "hoi_hoc_phi", "chao_hoi", "fallback"} <= set(corpus.intents)
+        assert corpus.messages[-len(LONG_MESSAGES):] == list(LONG_MESSAGES)
+        assert corpus.intents.count("hoi_phuong_thuc") > corpus.intents.count("chao_hoi")
+
+
+@pytest.mark.unit
+class TestMeasure:
+    """Interleaved timing rounds"""
+
+    def test_measure_reports_per_call_figures(self):
+        """Each case gets best/median/p95 figures and before_each runs before every call"""
+        resets = []
+        cases = [Case("square", lambda corpus, service: ((lambda x: x * x), [1, 2, 3])),
+                 Case("square.cold", lambda corpus, service: ((lambda x: x * x), [1, 2, 3]), resets.append),
+                 Case("empty", lambda corpus, service: ((lambda x: x), []))]
+        results = measure(cases, load_corpus(20), service="svc", rounds=3, min_time=0.0)
+
+        assert results["square"]["calls"] == 9
+        assert results["square"]["best_us"] <= results["square"]["median_us"]
+        assert results["square"]["min_us"] <= results["square"]["p95_us"] <= results["square"]["p99_us"]
+        assert len(resets) == 3 + 9 and set(resets) == {"svc"}  # Warm-up pass + timed calls
+        assert results["empty"]["calls"] == 0
+
+    def test_case_names_unique(self):
+        """Case names are unique so results and baselines map one to one"""
+        names = [case.name for case in CASES]
+        assert len(names) == len(set(names))
+
+
+@pytest.mark.unit
+class TestCompare:
+    """Baseline comparison and regression thresholds"""
+
+    def test_statuses(self):
+        """Slower than the threshold is a regression, much faster is an improvement"""
+        baseline = _result(a=10.0, b=10.0, c=10.0, gone=5.0)
+        rows = {r["name"]: r for r in compare(_result(a=11.0, b=14.0, c=7.0, fresh=1.0), baseline)}
+
+        assert rows["a"]["status"] == "ok"
+        assert rows["b"]["status"] == "regression" and rows["b"]["ratio"] == 1.4
+        assert rows["c"]["status"] == "improved"
+        assert rows["fresh"]["status"] == "new"
+        assert rows["gone"]["status"] == "missing"
+
+    def test_thresholds_from_baseline_and_override(self):
+        """Per-case thresholds in the baseline apply unless --threshold overrides them"""
+        baseline = {**_result(a=10.0, b=10.0), "thresholds": {"default": 0.1, "b": 0.5}}
+        current = _result(a=12.0, b=12.0)
+        rows = {r["name"]: r["status"] for r in compare(current, baseline)}
+        assert rows == {"a": "regression", "b": "ok"}
+        rows = {r["name"]: r["status"] for r in compare(current, baseline, threshold=0.3)}
+        assert rows == {"a": "ok", "b": "ok"}
+
+    def test_normalize_by_calibration(self):
+        """--normalize scales the baseline by the calibration loop ratio"""
+        baseline = _result(a=10.0)
+        current = {**_result(a=18.0), "calibration_us": 200.0}  # Machine 2x slower
+        assert compare(current, baseline)[0]["status"] == "regression"
+        row = compare(current, baseline, normalize=True)[0]
+        assert row["status"] == "ok" and row["ratio"] == 0.9
@@ -220,3 +220,176 @@ class TestContextEdgeCases:
         # Final context should have history
         final_ctx = nlp_service.get_context(test_session_id)
         assert "last_intent" in final_ctx
+
+
+class _FakeClock:
+    """Controllable replacement for time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.unit
+class TestBoundedContextStore:
+    """Test LRU, idle TTL and byte budget of ContextStore"""
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        from services import context_store
+        fake = _FakeClock()
+        monkeypatch.setattr(context_store.time, "monotonic", fake)
+        return fake
+
+    def test_lru_evicts_least_recently_used(self, clock):
+        """Exceeding max_sessions drops the least recently used session"""
+        from services.context_store import ContextStore
+        store = ContextStore(max_sessions=2, ttl_seconds=0, max_bytes=0)
+        store.set("a", {"last_intent": "a"})
+        store.set("b", {"last_intent": "b"})
+        store.get("a")  # "b" trở thành session lâu nhất không dùng
+        store.set("c", {"last_intent": "c"})
+
+        assert "a" in store and "c" in store
+        assert "b" not in store
+        assert store.get_stats()["evicted_lru"] == 1
+
+    def test_idle_ttl_expires_on_access(self, clock):
+        """Sessions idle longer than the TTL read back as empty"""
+        from services.context_store import ContextStore
+        store = ContextStore(max_sessions=0, ttl_seconds=60, max_bytes=0)
+        store.set("a", {"last_intent": "a"})
+        clock.now += 30
+        assert store.get("a") == {"last_intent": "a"}  # Truy cập làm mới TTL
+        clock.now += 59
+        assert store.get("a") == {"last_intent": "a"}
+        clock.now += 61
+        assert store.get("a") == {}
+        stats = store.get_stats()
+        assert stats["evicted_ttl"] == 1
+        assert stats["sessions"] == 0
+        assert stats["bytes"] == 0
+
+    def test_sweep_removes_only_expired(self, clock):
+        """sweep() drops idle sessions and keeps active ones"""
+        from services.context_store import ContextStore
+        store = ContextStore(max_sessions=0, ttl_seconds=60, max_bytes=0, sweep_interval=3600)
+        for i in range(5):
+            store.set(f"old{i}", {"last_intent": "x"})
+        clock.now += 45
+        store.set("fresh", {"last_intent": "y"})
+        clock.now += 30
+
+        assert store.sweep() == 5
+        assert len(store) == 1 and "fresh" in store
+
+    def test_byte_budget_evicts_lru(self, clock):
+        """Total estimated size stays within max_bytes"""
+        from services.context_store import ContextStore, HistoryRecord
+        entry = {"message": "m", "intent": "i", "response": {"data": [{"row": "x" * 500}] * 10}}
+        store = ContextStore(max_sessions=0, ttl_seconds=0, max_bytes=3 * HistoryRecord(entry).nbytes)
+        for i in range(10):
+            store.append_history(f"s{i}", dict(entry))
+
+        stats = store.get_stats()
+        assert stats["bytes"] <= store.max_bytes
+        assert stats["sessions"] == 3
+        assert stats["evicted_bytes"] == 7
+        assert "s9" in store and "s0" not in store
+
+    def test_incremental_size_matches_full_estimate(self, clock):
+        """Incremental accounting equals re-measuring every key"""
+        from services.context_store import ContextStore, estimate_size
+        store = ContextStore(max_sessions=0, ttl_seconds=0, max_bytes=0)
+        for i in range(15):
+            store.append_history("s", {"message": f"m{i}", "intent": "i", "response": {"n": i}})
+            store.update("s", {"last_intent": f"i{i}", "last_entities": [{"label": "L", "text": "t" * i}]})
+
+        ctx = store.get("s")
+        assert len(ctx["conversation_history"]) <= 10
+        expected = sum(estimate_size(value) for key, value in ctx.items() if key != "conversation_history")
+        expected += sum(record.nbytes for record in ctx["conversation_history"].records)
+        assert store.get_stats()["bytes"] == expected
+
+    def test_history_record_round_trip(self):
+        """Compact records rebuild the original entry, including long messages"""
+        from services.context_store import HistoryRecord, MESSAGE_PREVIEW_CHARS
+        response = {"type": "diem_chuan", "data": [{"nganh": "Kiến trúc", "diem": 24.5}] * 20}
+        long_message = "điểm chuẩn " * 50
+        for message in ("Điểm chuẩn ngành kiến trúc?", long_message):
+            entry = {"message": message, "intent": "hoi_diem_chuan", "response": response}
+            record = HistoryRecord(entry)
+            assert record.to_dict() == entry
+            assert list(record.to_dict()) == list(entry)
+            assert len(record.message) <= MESSAGE_PREVIEW_CHARS
+            assert record.to_summary() == {"message": record.message, "intent": "hoi_diem_chuan",
+                                           "response_type": "diem_chuan"}
+        assert HistoryRecord(["raw"]).to_dict() == ["raw"]
+
+    def test_client_labels_do_not_grow_intern_table(self, clock, monkeypatch):
+        """A long client-supplied history is trimmed before packing and arbitrary labels stay off the shared table"""
+        import services.context_store as cs
+        monkeypatch.setattr(cs, "_LABELS", {})
+        monkeypatch.setattr(cs, "MAX_INTERNED_LABELS", 8)
+        built = []
+        real_record = cs.HistoryRecord
+        monkeypatch.setattr(cs, "HistoryRecord", lambda entry: built.append(entry) or real_record(entry))
+
+        store = cs.ContextStore(max_sessions=0, ttl_seconds=0, max_bytes=0)
+        history = [{"message": f"m{i}", "intent": f"intent_{i}", "response": {"type": f"type_{i}"}}
+                   for i in range(5000)]
+        store.set("s", {"conversation_history": history})
+
+        assert len(built) == 10  # CONTEXT_HISTORY_LIMIT, not 5000
+        assert len(cs._LABELS) <= 8
+        ctx = store.get("s")
+        assert [h["intent"] for h in ctx["conversation_history"]] == [f"intent_{i}" for i in range(4990, 5000)]
+        records = ctx["conversation_history"].records
+        assert records[-1].to_summary()["response_type"] == "type_4999"
+        store.reset("s")
+        assert len(cs._LABELS) <= 8
+
+    def test_history_ring_buffer(self, clock):
+        """History is bounded in place and earlier snapshots are not affected"""
+        from services.context_store import ContextStore
+        store = ContextStore(max_sessions=0, ttl_seconds=0, max_bytes=0)
+        store.append_history("s", {"message": "m0", "intent": "i", "response": {"type": "t"}})
+        snapshot = store.get("s")["conversation_history"]
+        for i in range(1, 15):
+            store.append_history("s", {"message": f"m{i}", "intent": "i", "response": {"type": "t"}})
+
+        history = store.get("s")["conversation_history"]
+        assert len(history) == 10
+        assert [entry["message"] for entry in history] == [f"m{i}" for i in range(5, 15)]
+        assert len(snapshot) == 1 and snapshot[0]["message"] == "m0"
+
+    def test_export_full_and_summary(self, clock):
+        """export() returns JSON-ready history, full or summarized"""
+        from services.context_store import ContextStore
+        store = ContextStore(max_sessions=0, ttl_seconds=0, max_bytes=0)
+        entry = {"message": "hỏi", "intent": "hoi_hoc_phi", "response": {"type": "hoc_phi", "data": [1, 2]}}
+        store.append_history("s", entry)
+        store.update("s", {"last_intent": "hoi_hoc_phi"})
+
+        assert store.export("s") == {"conversation_history": [entry], "last_intent": "hoi_hoc_phi"}
+        summary = store.export("s", full=False)["conversation_history"]
+        assert summary == [{"message": "hỏi", "intent": "hoi_hoc_phi", "response_type": "hoc_phi"}]
+        assert store.export("missing") == {}
+
+    def test_background_sweeper(self):
+        """The sweeper thread removes expired sessions without traffic"""
+        import time
+        from services.context_store import ContextStore
+        store = ContextStore(max_sessions=0, ttl_seconds=0.05, max_bytes=0, sweep_interval=0.1)
+        store.set("a", {"last_intent": "a"})
+        store.start_sweeper()
+        try:
+            deadline = time.time() + 3
+            while len(store) and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            store.stop_sweeper()
+        assert len(store) == 0
+        assert store.get_stats()["sweeps"] >= 1
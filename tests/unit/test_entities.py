@@ -229,3 +229,171 @@ class TestEntityEdgeCases:
             result = nlp_service.analyze_message(msg)
             # Should handle Unicode gracefully
             assert "entities" in result
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestGazetteer:
+    """Test the Aho-Corasick gazetteer used for pattern and dictionary lookup"""
+
+    def test_token_boundaries(self):
+        """Phrases only match on word boundaries; "_" separates words"""
+        from nlu.gazetteer import Gazetteer
+
+        gaz = Gazetteer([("NAM_HOC", "2020"), ("CHUNG_CHI", "sat"), ("MA_NGANH", "7580101")])
+        assert gaz.find("ngành 7520201 có vsat không") == []
+        assert gaz.find("năm 2020 thi sat") == [(4, 8, 0), (13, 16, 1)]
+        assert gaz.find("mã 7580101_02") == [(3, 10, 2)]
+
+    def test_find_first_keeps_declaration_order(self):
+        """Each phrase is reported once, in declaration order"""
+        from nlu.gazetteer import Gazetteer
+
+        gaz = Gazetteer([("B", "học phí"), ("A", "phí"), ("A2", "phí")])
+        assert gaz.find_first("phí và học phí") == [(7, 14, 0), (0, 3, 1), (0, 3, 2)]
+
+    def test_entities_have_offsets(self, nlp_service):
+        """Pattern/dictionary entities carry char offsets into the normalized text"""
+        pipeline = nlp_service.pipeline
+        doc = pipeline.make_doc("Điểm chuẩn ngành Kiến trúc năm 2024")
+        entities = [e for e in pipeline.extract_doc_entities(doc) if e["source"] != "ner"]
+
+        assert entities
+        for ent in entities:
+            assert doc.norm[ent["start"]:ent["end"]] == ent["text"]
+
+    def test_synonym_expansion_offsets(self):
+        """Matches found in the synonym-expanded text map back to the original tokens"""
+        from nlu.entities import _map_expanded_span
+
+        tokens = ["ngành", "cntt", "năm", "2024"]
+        expanded = ["ngành", "công nghệ thông tin", "năm", "2024"]
+        # "công nghệ thông tin" (6..25) and "thông tin" (16..25) -> "cntt" (6..10)
+        assert _map_expanded_span(tokens, expanded, 6, 25) == (6, 10)
+        assert _map_expanded_span(tokens, expanded, 16, 25) == (6, 10)
+        # "thông tin năm" (16..29) -> "cntt năm" (6..14)
+        assert _map_expanded_span(tokens, expanded, 16, 29) == (6, 14)
+
+
+@pytest.fixture
+def ner_calls(monkeypatch):
+    """Replace the underthesea NER call with a recorder returning one LOC entity"""
+    import nlu.entities as entities
+
+    calls = []
+
+    def fake_ner(text):
+        calls.append(text)
+        return [{"label": "LOC", "text": "Hà Nội", "source": "ner"}]
+
+    monkeypatch.setattr(entities, "_extract_by_ner", fake_ner)
+    monkeypatch.setattr(entities, "uts_ner", object())
+    return calls
+
+
+def _make_extractor(**kwargs):
+    import os
+
+    from config import DATA_DIR
+    from nlu.entities import EntityExtractor
+
+    return EntityExtractor(DATA_DIR, os.path.join(DATA_DIR, "entity.json"), {}, **kwargs)
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestLazyNER:
+    """Test the conditional, budgeted and cached NER stage"""
+
+    def test_auto_skips_when_needed_label_found(self, ner_calls):
+        """auto mode only runs NER when no needed label was found by the gazetteer"""
+        extractor = _make_extractor(ner_mode="auto", ner_needed_labels=["TEN_NGANH", "MA_NGANH"], ner_budget_ms=0)
+
+        with_major = extractor.extract("Điểm chuẩn ngành 7580101")
+        without_major = extractor.extract("Trường ở đâu vậy")
+
+        assert ner_calls == ["Trường ở đâu vậy"]
+        assert all(e["source"] != "ner" for e in with_major)
+        assert {"label": "LOC", "text": "Hà Nội", "source": "ner"} in without_major
+        stats = extractor.get_ner_stats()
+        assert (stats["calls"], stats["runs"], stats["skipped_found"]) == (2, 1, 1)
+
+    def test_modes_and_cache(self, ner_calls):
+        """always runs NER once per normalized text (cached); off never runs it"""
+        extractor = _make_extractor(ner_mode="always", ner_budget_ms=0)
+        extractor.extract("Trường ở đâu vậy?")
+        extractor.extract("trường ở đâu   vậy")
+        assert len(ner_calls) == 1
+        assert extractor.get_ner_stats()["cache_hits"] == 1
+
+        off = _make_extractor(ner_mode="off")
+        assert all(e["source"] != "ner" for e in off.extract("Trường ở đâu vậy"))
+        assert len(ner_calls) == 1
+        assert off.get_ner_stats()["skipped_off"] == 1
+
+        with pytest.raises(ValueError):
+            _make_extractor(ner_mode="sometimes")
+
+    def test_time_budget(self, ner_calls):
+        """NER is skipped when its expected duration does not fit the budget"""
+        extractor = _make_extractor(ner_mode="always", ner_budget_ms=5, ner_cache_size=0)
+        extractor._ner_avg_ms = 10.0
+
+        extractor.extract("Trường ở đâu vậy")
+
+        assert ner_calls == []
+        assert extractor.get_ner_stats()["skipped_budget"] == 1
+
+    def test_budget_recovers_after_slow_run(self, monkeypatch):
+        """The cold run is not averaged in; after a slow run NER is re-probed and resumes once fast again"""
+        import time
+        import nlu.entities as entities
+
+        delays = [0.08, 0.08]  # Cold model load, then one GC-pause-like slow run; fast afterwards
+        runs = []
+
+        def fake_ner(text):
+            runs.append(text)
+            time.sleep(delays.pop(0) if delays else 0)
+            return []
+
+        monkeypatch.setattr(entities, "_extract_by_ner", fake_ner)
+        monkeypatch.setattr(entities, "uts_ner", object())
+        extractor = _make_extractor(ner_mode="always", ner_budget_ms=50, ner_cache_size=0)
+
+        extractor.extract("Trường ở đâu vậy")  # Cold
+        extractor.extract("Trường ở đâu vậy")  # Slow, still runs: the cold run was not averaged
+        assert len(runs) == 2
+
+        for _ in range(entities.NER_REPROBE_EVERY):
+            extractor.extract("Trường ở đâu vậy")
+        assert len(runs) == 2
+        assert extractor.get_ner_stats()["skipped_budget"] == entities.NER_REPROBE_EVERY
+
+        for _ in range(5):  # Probe is fast, so NER runs normally again
+            extractor.extract("Trường ở đâu vậy")
+        stats = extractor.get_ner_stats()
+        assert len(runs) == 7
+        assert stats["probes"] == 1 and stats["skipped_budget"] == entities.NER_REPROBE_EVERY
+
+    def test_stats_are_exact_across_threads(self, ner_calls):
+        """Counters updated from many executor threads add up to the number of calls"""
+        import threading
+
+        extractor = _make_extractor(ner_mode="always", ner_budget_ms=0)
+        n_threads, per_thread = 8, 100
+
+        def worker():
+            for _ in range(per_thread):
+                extractor.extract("Trường ở đâu vậy")
+
+        threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = extractor.get_ner_stats()
+        assert stats["calls"] == n_threads * per_thread
+        assert stats["runs"] + stats["cache_hits"] == n_threads * per_thread
+        assert stats["runs"] == len(ner_calls)
@@ -0,0 +1,153 @@
+"""
+Unit tests for the NLP executor
+
+Tests offloading NLP work from the event loop and the bounded queue.
+"""
+import asyncio
+import marshal
+import os
+import threading
+
+import pytest
+
+from exceptions import ServiceOverloadedError
+from services import executor as executor_module
+from services.executor import NLPExecutor, pack_analysis, unpack_analysis
+from utils import metrics
+
+
+@pytest.mark.unit
+class TestNLPExecutor:
+    """Test NLPExecutor modes and queue bounds"""
+
+    @pytest.mark.parametrize("mode", ["inline", "thread"])
+    def test_call_matches_direct_call(self, mode, nlp_service):
+        """Dispatched calls return the same result as calling the service"""
+        executor = NLPExecutor(mode=mode, max_workers=2, max_pending=4)
+        try:
+            result = asyncio.run(executor.call("analyze_message", "Điểm chuẩn ngành Kiến trúc?"))
+        finally:
+            executor.shutdown()
+        expected = nlp_service.analyze_message("Điểm chuẩn ngành Kiến trúc?")
+        assert result["intent"] == expected["intent"]
+        assert executor.get_stats()["completed"] == 1
+        assert executor.pending == 0
+
+    @pytest.mark.parametrize("mode", ["inline", "thread"])
+    def test_call_profiled_captures_worker_stack(self, mode):
+        """call_profiled returns the result plus pstats recorded inside the worker"""
+        executor = NLPExecutor(mode=mode, max_workers=1, max_pending=4)
+        try:
+            result, stats_data = asyncio.run(executor.call_profiled("handle_message", "Học phí ngành Kiến trúc?", {}))
+        finally:
+            executor.shutdown()
+        assert result["analysis"]["intent"] == "hoi_hoc_phi"
+        functions = {name for _, _, name in marshal.loads(stats_data)}
+        assert "handle_message" in functions
+        assert "detect_intent" in functions or "_score_many" in functions
+        assert executor.get_stats()["completed"] == 1
+
+    def test_thread_mode_runs_off_event_loop(self, monkeypatch):
+        """Thread mode runs work on a worker thread, not the loop thread"""
+        monkeypatch.setattr(executor_module, "_call_service", lambda method, *args: threading.get_ident())
+        executor = NLPExecutor(mode="thread", max_workers=1, max_pending=4)
+        try:
+            worker_ident = asyncio.run(executor.call("anything"))
+        finally:
+            executor.shutdown()
+        assert worker_ident != threading.get_ident()
+
+    def test_rejects_when_queue_full(self, monkeypatch):
+        """Calls beyond max_pending fail fast with ServiceOverloadedError"""
+        release = threading.Event()
+        monkeypatch.setattr(executor_module, "_call_service", lambda method, *args: release.wait(5))
+        executor = NLPExecutor(mode="thread", max_workers=1, max_pending=2)
+
+        async def burst():
+            tasks = [asyncio.create_task(executor.call("slow")) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with pytest.raises(ServiceOverloadedError) as exc_info:
+                await executor.call("slow")
+            release.set()
+            await asyncio.gather(*tasks)
+            return exc_info.value
+
+        try:
+            exc = asyncio.run(burst())
+        finally:
+            executor.shutdown()
+        assert exc.status_code == 503
+        assert exc.details["max_pending"] == 2
+        stats = executor.get_stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["pending"] == 0
+
+    def test_failed_call_releases_slot(self, monkeypatch):
+        """Exceptions propagate and do not leak queue slots"""
+        def boom(method, *args):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(executor_module, "_call_service", boom)
+        executor = NLPExecutor(mode="inline", max_pending=1)
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                asyncio.run(executor.call("analyze_message", "x"))
+        assert executor.get_stats()["failed"] == 3
+        assert executor.pending == 0
+
+    def test_invalid_mode(self):
+        """Unknown executor mode is rejected"""
+        with pytest.raises(ValueError):
+            NLPExecutor(mode="gpu")
+
+
+@pytest.mark.unit
+class TestProcessWorkerFarm:
+    """Test the forked process worker farm and its compact results"""
+
+    def test_pack_analysis_round_trip(self, nlp_service):
+        """Packed tuples unpack to the original analysis dict"""
+        for message in ["Điểm chuẩn ngành Kiến trúc năm 2024?", "Xin chào", "Học phí ngành 7480201"]:
+            analysis = nlp_service.analyze_message(message)
+            packed = pack_analysis(analysis)
+            assert isinstance(packed, tuple)
+            assert unpack_analysis(packed) == analysis
+
+    def test_unpack_entity_without_offsets(self):
+        """NER entities without start/end keep their shape"""
+        analysis = {"intent": "hoi_nganh", "score": 0.5,
+                    "entities": [{"label": "TEN_NGANH", "text": "Kiến trúc", "source": "ner"}]}
+        assert unpack_analysis(pack_analysis(analysis)) == analysis
+
+    @pytest.mark.slow
+    def test_process_mode_matches_direct_call(self, nlp_service):
+        """Forked workers return the same results as the in-process service"""
+        executor = NLPExecutor(mode="process", max_workers=2, max_pending=8)
+
+        async def run():
+            return await asyncio.gather(
+                executor.call("handle_message", "Điểm chuẩn ngành Kiến trúc?", {}),
+                executor.call("analyze_many", ["Học phí?", "Xin chào"]),
+            )
+
+        analyzed = metrics.STAGE_SECONDS.labels("nlp.analyze")
+        try:
+            executor.start()
+            assert len(executor.worker_pids) == 2
+            assert os.getpid() not in executor.worker_pids
+            before = analyzed.snapshot()[2]
+            handled, analyses = asyncio.run(run())
+            profiled, stats_data = asyncio.run(executor.call_profiled("handle_message", "Học phí?", {}))
+            after = analyzed.snapshot()[2]
+        finally:
+            executor.shutdown()
+
+        expected = nlp_service.handle_message("Điểm chuẩn ngành Kiến trúc?", {})
+        assert handled["analysis"] == expected["analysis"]
+        assert handled["response"]["type"] == expected["response"]["type"]
+        assert analyses == nlp_service.analyze_many(["Học phí?", "Xin chào"])
+        assert profiled["analysis"] == nlp_service.handle_message("Học phí?", {})["analysis"]
+        assert "handle_message" in {name for _, _, name in marshal.loads(stats_data)}
+        if metrics.ENABLED:  # Stages timed inside the workers reach the main registry
+            assert after - before == 3  # 3 calls; values inherited at fork are not sent back
@@ -0,0 +1,111 @@
+"""
+Unit tests for the health monitor snapshot used by /livez and /readyz
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.health import HealthMonitor, data_version
+
+
+class FakeNLP:
+    def __init__(self, model_source="artifact", context_error=None):
+        self.pipeline = SimpleNamespace(intent_model_source=model_source)
+        self.context_error = context_error
+        self.stats_calls = 0
+
+    def context_stats(self):
+        self.stats_calls += 1
+        if self.context_error:
+            raise self.context_error
+        return {"backend": "memory", "sessions": 3, "bytes": 100}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / "majors.csv").write_text("major_code,major_name\n1,A\n", encoding="utf-8")
+    return str(tmp_path)
+
+
+@pytest.mark.unit
+class TestHealthMonitor:
+    """Snapshot contents, readiness and background refresh"""
+
+    def test_refresh_builds_snapshot(self, data_dir):
+        """The snapshot reports model, data version, indexes and context size"""
+        monitor = HealthMonitor(FakeNLP(), data_dir=data_dir, interval=10)
+        assert monitor.readiness()[0] is False  # Not refreshed yet
+
+        snapshot = monitor.refresh()
+        ready, same = monitor.readiness()
+        assert ready and same is snapshot
+        assert snapshot["model"] == {"loaded": True, "source": "artifact"}
+        assert snapshot["data"] == {"version": data_version(data_dir)[0], "files": 1}
+        assert snapshot["context"] == {"backend": "memory", "sessions": 3}
+        assert isinstance(snapshot["indexes"], dict)
+        assert snapshot["errors"] == []
+
+    def test_data_version_changes_with_files(self, data_dir):
+        """Touching a data file changes the data version"""
+        before, _ = data_version(data_dir)
+        path = os.path.join(data_dir, "majors.csv")
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+        assert data_version(data_dir)[0] != before
+
+    def test_not_ready_reasons(self, data_dir, tmp_path_factory):
+        """Missing model, empty data dir or a failing context backend make it not ready"""
+        empty_dir = str(tmp_path_factory.mktemp("empty"))
+        monitor = HealthMonitor(FakeNLP("none", ConnectionError("redis down")), data_dir=empty_dir)
+        snapshot = monitor.refresh()
+
+        assert monitor.readiness()[0] is False
+        assert len(snapshot["errors"]) == 3
+        assert snapshot["model"]["loaded"] is False
+
+    def test_readiness_is_cached_and_goes_stale(self, data_dir):
+        """Probes read the snapshot without I/O; a stale snapshot is not ready"""
+        nlp = FakeNLP()
+        monitor = HealthMonitor(nlp, data_dir=data_dir, interval=0.05)
+        monitor.refresh()
+        for _ in range(100):
+            assert monitor.readiness()[0]
+        assert nlp.stats_calls == 1
+
+        time.sleep(0.2)  # Older than 3 intervals and no refresher running
+        assert monitor.readiness()[0] is False
+
+    def test_background_refresh(self, data_dir):
+        """start() refreshes immediately and then periodically"""
+        nlp = FakeNLP()
+        monitor = HealthMonitor(nlp, data_dir=data_dir, interval=0.05)
+        monitor.start()
+        try:
+            time.sleep(0.3)
+            assert nlp.stats_calls >= 3
+            assert monitor.readiness()[0]
+        finally:
+            monitor.stop()
+
+    def test_lazy_service_and_startup_state(self, data_dir):
+        """While the service is not built or still warming up, the snapshot is not ready and shows the startup state"""
+        from utils.startup import STATE_READY, STATE_WARMING, StartupTimeline
+
+        service, startup = {"nlp": None}, StartupTimeline()
+        monitor = HealthMonitor(lambda: service["nlp"], data_dir=data_dir, interval=10, startup=startup)
+        snapshot = monitor.refresh()
+        assert snapshot["ready"] is False and snapshot["context"] == {}
+        assert snapshot["startup"]["state"] == "idle"
+
+        startup.set_state(STATE_WARMING)
+        with startup.phase("pipeline.intent_model"):
+            service["nlp"] = FakeNLP()
+        snapshot = monitor.refresh()
+        assert snapshot["ready"] is False and snapshot["errors"] == ["NLP service đang khởi tạo"]
+        assert [p["name"] for p in snapshot["startup"]["phases"]] == ["pipeline.intent_model"]
+
+        startup.set_state(STATE_READY)
+        snapshot = monitor.refresh()
+        assert snapshot["ready"] is True and snapshot["startup"]["ready_after_ms"] is not None
@@ -82,3 +82,208 @@ class TestIntentClassification:
                 f"Empty message should fallback: '{msg}'"
             assert result["score"] == 0.0, \
                 f"Empty message should have 0 confidence"
+
+
+@pytest.fixture(scope="module")
+def engines():
+    """Pipeline plus one IntentDetector per scoring engine, built from the same samples"""
+    from nlu.intent import IntentDetector
+    from services.nlp_service import get_nlp_service
+
+    pipeline = get_nlp_service().pipeline
+    args = (pipeline.intent_samples, pipeline.intent_keyword_backoff, pipeline.intent_threshold)
+    return (
+        pipeline,
+        IntentDetector(*args, engine="dict"),
+        IntentDetector(*args, engine="sparse"),
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestIntentScoringEngines:
+    """Test parity between the dict and sparse (CSR) scoring engines"""
+
+    def test_engines_return_same_results(self, engines, sample_messages):
+        """Sparse engine must return the same (intent, score) as the dict engine"""
+        import csv
+        import os
+
+        from config import DATA_DIR
+        from nlu.pipeline import _normalize_text
+
+        pipeline, dict_engine, sparse_engine = engines
+        with open(os.path.join(DATA_DIR, "intent.csv"), newline="", encoding="utf-8") as f:
+            utterances = [r["utterance"] for r in csv.DictReader(f)][::500]
+
+        messages = utterances + [m for msgs in sample_messages.values() for m in msgs] + ["", "asdfghjkl"]
+        for msg in messages:
+            expected = dict_engine.detect(msg, pipeline.syn_map, _normalize_text)
+            actual = sparse_engine.detect(msg, pipeline.syn_map, _normalize_text)
+            assert actual[0] == expected[0], f"Intent mismatch for message: {msg}"
+            assert actual[1] == pytest.approx(expected[1], abs=1e-9), f"Score mismatch for message: {msg}"
+
+    def test_detect_many_matches_detect(self, engines, sample_messages):
+        """Batch scoring returns the same (intent, score) as scoring each message alone"""
+        from nlu.pipeline import _normalize_text
+
+        pipeline, dict_engine, sparse_engine = engines
+        messages = [m for msgs in sample_messages.values() for m in msgs] + ["", "asdfghjkl"]
+        for detector in (dict_engine, sparse_engine):
+            batch = detector.detect_many(messages, pipeline.syn_map, _normalize_text)
+            for msg, (intent, score) in zip(messages, batch):
+                expected = detector.detect(msg, pipeline.syn_map, _normalize_text)
+                assert intent == expected[0], f"Intent mismatch for message: {msg}"
+                assert score == pytest.approx(expected[1], abs=1e-9), f"Score mismatch for message: {msg}"
+        assert sparse_engine.detect_many([], pipeline.syn_map, _normalize_text) == []
+
+    def test_invalid_engine(self):
+        """Unknown engine names are rejected"""
+        from nlu.intent import IntentDetector
+
+        with pytest.raises(ValueError):
+            IntentDetector({}, {}, engine="unknown")
+
+    def test_empty_model(self):
+        """Both engines fall back cleanly without training data"""
+        from nlu.intent import IntentDetector
+
+        for engine in ("dict", "sparse"):
+            detector = IntentDetector({}, {}, engine=engine)
+            assert detector.detect("điểm chuẩn", {}, lambda t: t) == ("fallback", 0.0)
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestIntentCandidatePruning:
+    """Test inverted-index candidate pruning"""
+
+    SAMPLES = {
+        "hoi_diem_chuan": [["điểm", "chuẩn"], ["điểm", "chuẩn", "ngành"]],
+        "hoi_hoc_phi": [["học_phí"], ["học_phí", "ngành"]],
+        "hoi_hoc_bong": [["học_bổng"]],
+    }
+
+    @pytest.mark.parametrize("engine", ["dict", "sparse"])
+    def test_only_intents_sharing_a_token_are_scored(self, engine):
+        """A query only touches intents that share at least one token with it"""
+        from nlu.intent import IntentDetector
+
+        detector = IntentDetector(self.SAMPLES, {}, threshold=0.1, engine=engine)
+        assert detector.postings["ngành"] == (0, 1)
+
+        intent, _ = detector.detect("điểm chuẩn", {}, lambda t: t)
+        assert intent == "hoi_diem_chuan"
+        detector.detect("xyz", {}, lambda t: t)
+
+        stats = detector.get_stats()
+        assert stats["queries"] == 2
+        assert stats["candidates_scored"] == 1
+        assert stats["candidates_pruned"] == 5
+        assert stats["pruned_ratio"] == pytest.approx(5 / 6)
+
+    @pytest.mark.parametrize("engine", ["dict", "sparse"])
+    def test_stats_are_exact_across_threads(self, engine):
+        """Counters updated from many threads add up to the number of queries"""
+        import threading
+
+        from nlu.intent import IntentDetector
+
+        detector = IntentDetector(self.SAMPLES, {}, threshold=0.1, engine=engine)
+        n_threads, per_thread = 8, 200
+
+        def worker():
+            for _ in range(per_thread):
+                detector.detect("điểm chuẩn", {}, lambda t: t)
+
+        threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = detector.get_stats()
+        assert stats["queries"] == n_threads * per_thread
+        assert stats["candidates_scored"] == n_threads * per_thread
+        assert stats["candidates_pruned"] == 2 * n_threads * per_thread
+
+    def test_pipeline_exposes_stats(self, nlp_service):
+        """Pruning counters are reachable from the pipeline"""
+        before = nlp_service.pipeline.intent_stats()["queries"]
+        nlp_service.analyze_message("Học phí ngành CNTT?")
+        assert nlp_service.pipeline.intent_stats()["queries"] == before + 1
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestKeywordBackoff:
+    """Test the automaton-based keyword backoff"""
+
+    BACKOFF = {"học phí": "hoi_hoc_phi", "chương trình đào tạo": "hoi_nganh_hoc", "phí": "hoi_phi"}
+
+    def test_priority_mode_matches_legacy_scan(self, nlp_service):
+        """Priority mode returns exactly what the old `kw in text` loop returned"""
+        from nlu.intent import IntentDetector
+        from nlu.pipeline import _normalize_text
+
+        backoff = nlp_service.pipeline.intent_keyword_backoff
+        detector = IntentDetector({}, backoff, backoff_mode="priority")
+        for msg in ["Học phí chương trình đào tạo là gì", "khối a00 thi môn gì", "vsat là gì", "xin chào", ""]:
+            norm = _normalize_text(msg)
+            legacy = next((intent for kw, intent in backoff.items() if kw in norm), "")
+            assert detector._match_backoff(norm) == legacy, f"Mismatch for message: {msg}"
+
+    def test_longest_mode(self):
+        """Longest mode prefers the longest keyword regardless of declaration order"""
+        from nlu.intent import IntentDetector
+
+        detector = IntentDetector({}, self.BACKOFF, backoff_mode="longest")
+        assert detector._match_backoff("học phí chương trình đào tạo") == "hoi_nganh_hoc"
+        assert detector._match_backoff("phí") == "hoi_phi"
+
+    def test_compat_is_alias_of_priority(self):
+        """compat keeps the legacy declaration-order rule"""
+        from nlu.intent import IntentDetector
+
+        detector = IntentDetector({}, self.BACKOFF, backoff_mode="compat")
+        assert detector.backoff_mode == "priority"
+        assert detector._match_backoff("học phí chương trình đào tạo") == "hoi_hoc_phi"
+        with pytest.raises(ValueError):
+            IntentDetector({}, self.BACKOFF, backoff_mode="shortest")
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestAnalyzeMany:
+    """Test batch analysis through the pipeline"""
+
+    def test_matches_single_analyze(self, nlp_service, sample_messages):
+        """analyze_many returns the same result as analyze for every message, in order"""
+        messages = [m for msgs in sample_messages.values() for m in msgs]
+        results = nlp_service.analyze_many(messages)
+
+        assert len(results) == len(messages)
+        for msg, result in zip(messages, results):
+            expected = nlp_service.analyze_message(msg)
+            assert result["intent"] == expected["intent"], f"Intent mismatch for message: {msg}"
+            assert result["score"] == pytest.approx(expected["score"])
+            assert result["entities"] == expected["entities"]
+
+    def test_duplicates_analyzed_once(self, nlp_service, monkeypatch):
+        """Messages equal after normalization are analyzed once but returned as independent copies"""
+        pipeline = nlp_service.pipeline
+        calls = []
+        original = pipeline.extract_doc_entities
+        monkeypatch.setattr(pipeline, "extract_doc_entities", lambda doc: calls.append(doc) or original(doc))
+
+        results = nlp_service.analyze_many(["Điểm chuẩn ngành Kiến trúc", "  điểm chuẩn ngành kiến trúc ",
+                                            "Học phí"])
+
+        assert len(results) == 3
+        assert len(calls) == 2
+        assert results[0] == results[1]
+        results[0]["intent"] = "changed"
+        results[0]["entities"].append({"label": "X", "text": "x"})
+        assert results[1]["intent"] != "changed"
+        assert len(results[1]["entities"]) == len(results[0]["entities"]) - 1
+
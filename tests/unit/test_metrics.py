@@ -0,0 +1,145 @@
+"""
+Unit tests for the stage timing histograms and Prometheus text rendering
+"""
+
+import threading
+
+import pytest
+
+from utils import metrics
+from utils.metrics import Counter, Histogram, Registry
+
+
+@pytest.mark.unit
+class TestHistogram:
+    """Fixed-bucket histograms"""
+
+    def test_buckets_are_cumulative(self):
+        """Each le bucket counts every observation <= its bound"""
+        hist = Histogram("h_seconds", "test", ("stage",), buckets=(0.001, 0.01, 0.1))
+        for value in (0.0005, 0.001, 0.005, 0.05, 3.0):
+            hist.observe(value, "a")
+
+        samples = {(name, labels.get("le")): value for name, labels, value in hist.samples()}
+        assert samples[("h_seconds_bucket", "0.001")] == 2
+        assert samples[("h_seconds_bucket", "0.01")] == 3
+        assert samples[("h_seconds_bucket", "0.1")] == 4
+        assert samples[("h_seconds_bucket", "+Inf")] == 5
+        assert samples[("h_seconds_count", None)] == 5
+        assert samples[("h_seconds_sum", None)] == pytest.approx(3.0565)
+
+    def test_concurrent_observations_are_not_lost(self):
+        """Per-thread shards add up to the exact total"""
+        child = Histogram("h_seconds", "test").labels()
+
+        def worker():
+            for _ in range(5000):
+                child.observe(0.002)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        counts, total, count = child.snapshot()
+        assert count == 20000 and sum(counts) == 20000
+        assert total == pytest.approx(40.0)
+
+    def test_label_count_is_checked(self):
+        """Wrong number of label values is rejected"""
+        with pytest.raises(ValueError):
+            Histogram("h_seconds", "test", ("stage",)).labels("a", "b")
+        with pytest.raises(ValueError):
+            Counter("c_total", "test", ("intent",)).inc()
+
+
+@pytest.mark.unit
+class TestRegistry:
+    """Text exposition and collectors"""
+
+    def test_render_text_format(self):
+        """HELP/TYPE headers, escaped labels and collector families"""
+        registry = Registry()
+        counter = registry.counter("huce_test_total", "Số lần", ("intent",))
+        counter.inc("hoi_hoc_phi")
+        counter.inc("hoi_hoc_phi", amount=2)
+        counter.inc('a"b')
+        registry.add_collector(lambda: [("huce_rss_bytes", "gauge", "RSS", [({}, 1024)])])
+        registry.add_collector(lambda: 1 / 0)  # A broken collector does not break the page
+
+        text = registry.render()
+        assert "# HELP huce_test_total Số lần\n# TYPE huce_test_total counter\n" in text
+        assert 'huce_test_total{intent="hoi_hoc_phi"} 3\n' in text
+        assert 'huce_test_total{intent="a\\"b"} 1\n' in text
+        assert "# TYPE huce_rss_bytes gauge\nhuce_rss_bytes 1024\n" in text
+        assert "# collector error: ZeroDivisionError" in text
+
+    def test_register_returns_existing_metric(self):
+        """Registering the same name twice returns the first metric"""
+        registry = Registry()
+        assert registry.counter("c_total", "a") is registry.counter("c_total", "b")
+
+    def test_drain_and_merge_histograms(self):
+        """Values drained in a worker registry add up in the main registry and are cleared in the worker"""
+        worker, main = Registry(), Registry()
+        for registry in (worker, main):
+            registry.histogram("h_seconds", "h", ("stage",), buckets=(0.1, 1.0))
+        worker_h = worker.histogram("h_seconds", "h", ("stage",))
+        main_h = main.histogram("h_seconds", "h", ("stage",))
+        worker_h.observe(0.05, "nlp")
+        worker_h.observe(0.5, "nlp")
+        main_h.observe(2.0, "nlp")
+
+        drained = worker.drain_histograms()
+        main.merge_histograms(drained)
+        main.merge_histograms({"unknown_seconds": [(("x",), [1], 0.1, 1)]})
+
+        assert main_h.labels("nlp").snapshot() == ([1, 1, 1], pytest.approx(2.55), 3)
+        assert worker_h.labels("nlp").snapshot()[2] == 0
+        assert worker.drain_histograms() == {}
+
+
+@pytest.mark.unit
+class TestSpans:
+    """span() and timed() record into the stage histogram"""
+
+    def _count(self, stage):
+        return metrics.STAGE_SECONDS.labels(stage).snapshot()[2]
+
+    def test_span_and_timed(self):
+        """Each use adds one observation, also when the code raises"""
+        if not metrics.ENABLED:
+            pytest.skip("METRICS_ENABLED=false")
+        before = self._count("test.span")
+        with metrics.span("test.span"):
+            pass
+        with pytest.raises(KeyError):
+            with metrics.span("test.span"):
+                raise KeyError("x")
+        assert self._count("test.span") == before + 2
+
+        @metrics.timed("test.timed")
+        def work(x):
+            return x * 2
+
+        before = self._count("test.timed")
+        assert work(21) == 42
+        assert self._count("test.timed") == before + 1
+
+    def test_reset_keeps_bound_children(self):
+        """Resetting clears values in place so cached spans keep recording"""
+        if not metrics.ENABLED:
+            pytest.skip("METRICS_ENABLED=false")
+        with metrics.span("test.reset"):
+            pass
+        metrics.STAGE_SECONDS.reset()
+        assert self._count("test.reset") == 0
+        with metrics.span("test.reset"):
+            pass
+        assert self._count("test.reset") == 1
+
+    def test_process_rss(self):
+        """RSS is read from /proc on Linux"""
+        rss = metrics.process_rss_bytes()
+        assert rss is None or rss > 0
@@ -0,0 +1,91 @@
+"""
+Unit tests for the precompiled intent model artifact
+
+Tests saving, memory-mapping and invalidating the intent model.
+"""
+import os
+
+import pytest
+
+from nlu.intent import IntentDetector
+from nlu.model_store import artifact_path, compute_source_hash, load_intent_model, save_intent_model
+
+SAMPLES = {
+    "hoi_diem_chuan": [["điểm", "chuẩn"], ["điểm", "chuẩn", "ngành"], ["điểm", "trúng_tuyển"]],
+    "hoi_hoc_phi": [["học_phí"], ["học_phí", "bao_nhiêu"], ["tiền", "học"]],
+    "hoi_hoc_bong": [["học_bổng"], ["học_bổng", "ngành"]],
+}
+
+
+@pytest.fixture
+def source_files(tmp_path):
+    """Fake intent.csv / synonym.csv pair"""
+    intent_csv = tmp_path / "intent.csv"
+    synonym_csv = tmp_path / "synonym.csv"
+    intent_csv.write_text("utterance,intent\nđiểm chuẩn,hoi_diem_chuan\n", encoding="utf-8")
+    synonym_csv.write_text("entity,canonical,alias\n", encoding="utf-8")
+    return str(intent_csv), str(synonym_csv)
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestIntentModelStore:
+    """Test the intent model artifact round trip"""
+
+    def test_round_trip_matches_original(self, tmp_path, source_files):
+        """A detector loaded from the artifact scores like the one that built it"""
+        source_hash = compute_source_hash(*source_files)
+        path = artifact_path(str(tmp_path / "artifacts"), source_hash)
+        original = IntentDetector(SAMPLES, {}, threshold=0.1)
+        save_intent_model(path, original.to_model(source_hash))
+
+        model = load_intent_model(path, source_hash)
+        assert model is not None
+        assert model.vocab == list(original.vocab)
+
+        for engine in ("dict", "sparse"):
+            loaded = IntentDetector.from_model(model, {}, threshold=0.1, engine=engine)
+            for toks in (["điểm", "chuẩn"], ["học_phí", "ngành"], ["học_bổng"], ["xyz"]):
+                expected = original._score_dict(original._tfidf_vec(toks))
+                actual = loaded._score_sparse(loaded._tfidf_vec(toks)) if engine == "sparse" \
+                    else loaded._score_dict(loaded._tfidf_vec(toks))
+                assert actual[0] == expected[0]
+                assert actual[1] == pytest.approx(expected[1], abs=1e-9)
+
+    def test_hash_changes_with_content(self, source_files):
+        """Editing intent.csv changes the source hash"""
+        before = compute_source_hash(*source_files)
+        with open(source_files[0], "a", encoding="utf-8") as f:
+            f.write("học phí,hoi_hoc_phi\n")
+        assert compute_source_hash(*source_files) != before
+
+    def test_stale_artifact_is_ignored(self, tmp_path, source_files):
+        """An artifact built for another hash is not loaded"""
+        source_hash = compute_source_hash(*source_files)
+        path = artifact_path(str(tmp_path), source_hash)
+        save_intent_model(path, IntentDetector(SAMPLES, {}).to_model(source_hash))
+
+        assert load_intent_model(path, "0" * 64) is None
+
+    def test_corrupted_artifact_is_ignored(self, tmp_path):
+        """A truncated or garbage file falls back to a rebuild"""
+        path = str(tmp_path / "broken.bin")
+        with open(path, "wb") as f:
+            f.write(b"not an artifact")
+        assert load_intent_model(path, "abc") is None
+        assert load_intent_model(str(tmp_path / "missing.bin"), "abc") is None
+
+    def test_old_artifacts_are_pruned(self, tmp_path):
+        """Writing a new artifact removes artifacts for older hashes"""
+        detector = IntentDetector(SAMPLES, {})
+        old_path = artifact_path(str(tmp_path), "a" * 64)
+        new_path = artifact_path(str(tmp_path), "b" * 64)
+        save_intent_model(old_path, detector.to_model("a" * 64))
+        save_intent_model(new_path, detector.to_model("b" * 64))
+
+        assert not os.path.exists(old_path)
+        assert os.path.exists(new_path)
+
+    def test_pipeline_uses_artifact(self, nlp_service):
+        """The service pipeline exposes where its intent model came from"""
+        assert nlp_service.pipeline.intent_model_source in ("artifact", "rebuilt")
@@ -92,3 +92,126 @@ class TestPreprocessingEdgeCases:
 
         # All should be lowercase
         assert all(r.islower() or not r.isalpha() for r in results)
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestTextCache:
+    """Test the memoized normalization/tokenization layer"""
+
+    def test_lru_eviction_and_stats(self):
+        """Least recently used entries are evicted and counted"""
+        from nlu.text_cache import LRUCache
+
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # "b" is now least recently used
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        stats = cache.get_stats()
+        assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1, 1)
+        assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+    def test_disabled_cache(self):
+        """maxsize 0 never stores anything"""
+        from nlu.text_cache import LRUCache
+
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_tokenize_cache_hits(self):
+        """Repeated texts are served from the cache with identical results"""
+        from nlu.preprocess import clear_text_caches, get_text_cache_stats, tokenize_and_map
+
+        clear_text_caches()
+        syn = {"cntt": "công_nghệ_thông_tin"}
+        first = tokenize_and_map("Điểm chuẩn ngành CNTT", syn)
+        first.append("mutated")
+        second = tokenize_and_map("Điểm chuẩn ngành CNTT", syn)
+
+        assert "mutated" not in second
+        assert second == tokenize_and_map("Điểm chuẩn ngành CNTT", syn, use_cache=False)
+        stats = get_text_cache_stats()["tokenize"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_synonym_version_in_key(self):
+        """A different synonym map never reuses tokens cached for another map"""
+        from nlu.preprocess import clear_text_caches, synonym_map_version, tokenize_and_map
+
+        clear_text_caches()
+        text = "học phí ngành cntt"
+        plain = tokenize_and_map(text, {})
+        mapped = tokenize_and_map(text, {"cntt": "công_nghệ_thông_tin"})
+
+        assert "cntt" in plain
+        assert "công_nghệ_thông_tin" in mapped
+        assert synonym_map_version({"a": "b"}) == synonym_map_version({"a": "b"})
+        assert synonym_map_version({"a": "b"}) != synonym_map_version({"a": "c"})
+
+    def test_synonym_map_version_is_remembered(self):
+        """SynonymMap hashes once, re-hashes after edits and is not kept alive by the cache"""
+        import gc
+        import weakref
+
+        from nlu import preprocess
+        from nlu.preprocess import SynonymMap, synonym_map_version, tokenize_and_map
+
+        syn = SynonymMap({"cntt": "công_nghệ_thông_tin"})
+        version = synonym_map_version(syn)
+        assert version == synonym_map_version({"cntt": "công_nghệ_thông_tin"})
+
+        calls = []
+        original = preprocess._hash_synonyms
+        preprocess._hash_synonyms = lambda m: calls.append(len(m)) or original(m)
+        try:
+            for _ in range(3):
+                tokenize_and_map("ngành cntt", syn)
+            assert calls == []
+            syn["it"] = "công_nghệ_thông_tin"
+            assert synonym_map_version(syn) != version
+            assert len(calls) == 1
+        finally:
+            preprocess._hash_synonyms = original
+
+        ref = weakref.ref(syn)
+        del syn
+        gc.collect()
+        assert ref() is None
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestDoc:
+    """Test the shared preprocessed document"""
+
+    def test_fields(self):
+        """Doc holds every representation the pipeline stages need"""
+        from nlu.doc import Doc
+        from nlu.preprocess import tokenize_and_map
+
+        syn = {"cntt": "công nghệ thông tin"}
+        doc = Doc("Điểm chuẩn ngành CNTT?", syn)
+
+        assert doc.norm == normalize_text("Điểm chuẩn ngành CNTT?")
+        assert doc.tokens == ["điểm", "chuẩn", "ngành", "cntt"]
+        assert doc.expanded_text == "điểm chuẩn ngành công nghệ thông tin"
+        assert doc.intent_tokens == tokenize_and_map("Điểm chuẩn ngành CNTT?", syn)
+
+    def test_pipeline_stages_match_text_api(self, nlp_service, sample_messages):
+        """Intent detection and entity extraction give the same results from a Doc"""
+        from nlu.pipeline import _normalize_text
+
+        pipeline = nlp_service.pipeline
+        for msg in [m for msgs in sample_messages.values() for m in msgs]:
+            doc = pipeline.make_doc(msg)
+            assert pipeline.extract_doc_entities(doc) == pipeline.extract_entities(msg)
+            expected = pipeline._intent_detector.detect(msg, pipeline.syn_map, _normalize_text)
+            actual = pipeline._intent_detector.detect_doc(doc)
+            assert actual[0] == expected[0]
+            assert actual[1] == pytest.approx(expected[1])
@@ -3,9 +3,13 @@ Unit tests for Data Processors
 
 Tests the CSV data processing functions.
 """
+import os
+
 import pytest
 
 from services.processors import (
+    clear_indexes,
+    get_admission_targets,
     find_standard_score,
     list_majors,
     list_tuition,
@@ -266,3 +270,117 @@ class TestDataProcessorEdgeCases:
 
         # Should handle gracefully
         assert isinstance(result, str)
+
+
+@pytest.mark.unit
+@pytest.mark.data
+class TestDataIndexes:
+    """Test precomputed per-CSV-version indexes"""
+
+    @pytest.fixture
+    def data_dir(self, tmp_path, monkeypatch):
+        from services.processors import indexes
+        monkeypatch.setattr(indexes, "DATA_DIR", str(tmp_path))
+        clear_indexes()
+        yield tmp_path
+        clear_indexes()
+
+    @staticmethod
+    def _write_majors(path, rows):
+        lines = ["major_code,major_name,description,additional_info"]
+        lines += [f"{code},{name},," for code, name in rows]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        # Đảm bảo mtime khác lần ghi trước (read_csv cache theo mtime)
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + 1 + len(rows)))
+
+    def test_index_reused_until_csv_changes(self, data_dir):
+        """Index is built once per CSV version and rebuilt when the file changes"""
+        from services.processors.indexes import get_major_index, search_majors
+        majors_csv = data_dir / "majors.csv"
+        self._write_majors(majors_csv, [("7580101", "Kiến trúc")])
+
+        first = get_major_index()
+        assert get_major_index() is first
+        assert [r.major_code for r in search_majors("kien truc")] == ["7580101"]
+
+        self._write_majors(majors_csv, [("7580101", "Kiến trúc"), ("7480201", "Công nghệ thông tin")])
+        second = get_major_index()
+        assert second is not first
+        assert [r.major_code for r in search_majors("cong nghe")] == ["7480201"]
+
+    def test_index_is_read_only(self):
+        """Index lookups are immutable and shared between callers"""
+        from services.processors.indexes import get_target_index
+        index = get_target_index()
+        code = next(iter(index.by_major_code))
+        with pytest.raises(TypeError):
+            index.by_major_code[code] = ()
+        assert isinstance(index.by_major_code[code], tuple)
+
+    def test_admission_methods_tolerate_short_rows(self, data_dir):
+        """Method rows with missing columns are listed with empty fields instead of failing"""
+        from services.processors import list_admission_methods
+        (data_dir / "admission_targets.csv").write_text(
+            "admission_code,program_name,major_code,major_name,quota,admission_method,subject_combination\n"
+            "7580101,Kiến trúc,7580101,Kiến trúc,300,100,V00\n"
+            "7580101,Kiến trúc,7580101,Kiến trúc,300,200,V00\n", encoding="utf-8")
+        (data_dir / "admission_methods.csv").write_text(
+            "method_code,abbreviation,method_name,description,requirements\n"
+            "100,THPT,Xét tuyển THPT\n"
+            "200,HB,Học bạ,Xét học bạ\n"
+            "200,HB_NK\n", encoding="utf-8")
+
+        methods = {m["method_code"]: m for m in list_admission_methods("7580101")}
+        assert methods["100"]["abbreviation"] == "THPT"
+        assert methods["100"]["description"] == ""
+        assert methods["200"]["abbreviation"] == "HB / HB_NK"
+        assert methods["200"]["method_name"] == "HB - Học bạ"
+        assert methods["200"]["description"] == "Xét học bạ"
+
+    def test_targets_match_linear_scan(self):
+        """Indexed target lookup returns the same rows as filtering the CSV"""
+        from config import DATA_DIR
+        from services.processors import read_csv
+        rows = read_csv(os.path.join(DATA_DIR, "admission_targets.csv"))
+        for code, method in [("7580101", None), ("7480201", "100"), (None, "301"), ("0000000", None)]:
+            expected = [r for r in rows
+                        if (not code or r["major_code"].strip() == code)
+                        and (not method or r["admission_method"].strip() == method)]
+            assert get_admission_targets(ma_nganh=code, phuong_thuc=method) == expected
+
+    def test_major_matcher_matches_brute_force(self):
+        """Matcher picks the longest overlap, earliest candidate on ties"""
+        from services.processors.indexes import MajorMatcher
+        from services.processors.utils import normalize_text
+
+        candidates = ["Kiến trúc", "Kiến trúc cảnh quan", "Kỹ thuật xây dựng", "Xây dựng", "KIẾN TRÚC"]
+
+        def brute_force(variants):
+            best, best_len = None, 0
+            for cand in candidates:
+                cnorm = normalize_text(cand)
+                for vn in variants:
+                    if cnorm in vn or vn in cnorm:
+                        overlap = len(cnorm) if cnorm in vn else len(vn)
+                        if overlap > best_len:
+                            best, best_len = cand, overlap
+            return best
+
+        matcher = MajorMatcher(candidates)
+        assert len(matcher) == 4  # "KIẾN TRÚC" trùng tên chuẩn hóa với "Kiến trúc"
+        for variants in [{"diem chuan kien truc canh quan"}, {"kien"}, {"ky thuat xay dung", "xay dung"},
+                         {"xay"}, {"hoc phi"}, {"truc canh", "kien truc"}, {""}]:
+            assert matcher.best_match(variants) == brute_force(variants)
+
+    def test_major_matcher_rebuilt_when_csv_changes(self, data_dir):
+        """Matcher is versioned on its source CSV files"""
+        from services.processors.indexes import get_major_matcher
+        majors_csv = data_dir / "majors.csv"
+        self._write_majors(majors_csv, [("7580101", "Kiến trúc")])
+        assert infer_major_from_message("điểm chuẩn công nghệ thông tin") is None
+
+        matcher = get_major_matcher()
+        self._write_majors(majors_csv, [("7580101", "Kiến trúc"), ("7480201", "Công nghệ thông tin")])
+        assert get_major_matcher() is not matcher
+        assert infer_major_from_message("điểm chuẩn công nghệ thông tin") == "Công nghệ thông tin"
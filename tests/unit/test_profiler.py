@@ -0,0 +1,138 @@
+"""
+Unit tests for the per-request profiler: sampling decisions and the rotating profile store
+"""
+
+import json
+import os
+import pstats
+
+import pytest
+
+from services.profiler import ProfileStore, RequestProfiler, run_profiled, top_functions
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProfileStore(directory=str(tmp_path / "profiles"), max_files=3)
+
+
+@pytest.mark.unit
+class TestRunProfiled:
+    """cProfile wrapper used inside executor workers"""
+
+    def test_returns_result_and_stats(self):
+        """The result is passed through and the stats include the profiled function"""
+        result, stats_data = run_profiled(_busy, 1000)
+        assert result == _busy(1000)
+        top = top_functions(stats_data, limit=10)
+        assert any("_busy" in row["function"] or "genexpr" in row["function"] for row in top)
+        assert all(row["tottime_ms"] >= 0 for row in top)
+
+    def test_stats_survive_exceptions(self):
+        """The profiler is disabled even when the profiled call raises"""
+        with pytest.raises(ZeroDivisionError):
+            run_profiled(lambda: 1 / 0)
+        assert run_profiled(_busy, 10)[0] == _busy(10)
+
+
+@pytest.mark.unit
+class TestProfileStore:
+    """Rotating directory of .prof + .json files"""
+
+    def test_save_and_list(self, store):
+        """A saved profile is listed with its metadata and loads with pstats"""
+        _, stats_data = run_profiled(_busy, 1000)
+        name = store.save(stats_data, {"request_id": "ab12-cd34", "path": "/chat/advanced", "intent": "hoi_hoc_phi"})
+
+        records = store.list()
+        assert [r["name"] for r in records] == [name]
+        assert records[0]["intent"] == "hoi_hoc_phi"
+        assert records[0]["top"]
+        assert "ab12cd34" in name
+        stats = pstats.Stats(store.path(name))
+        assert stats.total_calls > 0
+
+    def test_rotation_keeps_newest(self, store):
+        """Only max_files profiles are kept, oldest are removed with their sidecar"""
+        _, stats_data = run_profiled(_busy, 10)
+        names = [store.save(stats_data, {"request_id": f"{i:x}"}) for i in range(5)]
+
+        assert [r["name"] for r in store.list()] == names[::-1][:3]
+        assert store.path(names[0]) is None
+        assert sorted(os.listdir(store.directory)) == sorted(f"{n}.{ext}" for n in names[2:] for ext in ("prof", "json"))
+
+    def test_rejects_unknown_or_unsafe_names(self, store):
+        """Names outside the generated pattern never resolve to a path"""
+        assert store.path("../../etc/passwd") is None
+        assert store.path("20260101T000000Z-ab-1") is None
+        assert store.render_text("nope") is None
+        assert store.list() == []
+
+    def test_render_text(self, store):
+        """Text output is a pstats table sorted by the requested key"""
+        _, stats_data = run_profiled(_busy, 1000)
+        name = store.save(stats_data, {})
+        text = store.render_text(name, sort="tottime", limit=5)
+        assert "function calls" in text
+        assert "_busy" in text
+        with pytest.raises(ValueError):
+            store.render_text(name, sort="bogus")
+
+    def test_listing_skips_broken_sidecar(self, store):
+        """A corrupt .json file does not break the listing"""
+        _, stats_data = run_profiled(_busy, 10)
+        name = store.save(stats_data, {})
+        with open(os.path.join(store.directory, f"{name}.json"), "w") as f:
+            f.write("{")
+        assert store.list() == []
+        good = store.save(stats_data, {})
+        assert json.loads(json.dumps(store.list()))[0]["name"] == good
+
+
+@pytest.mark.unit
+class TestRequestProfiler:
+    """Deciding which requests get profiled"""
+
+    def test_disabled_by_default(self, store):
+        """No token and no sample rate: nothing is profiled, even with the header"""
+        profiler = RequestProfiler(store, sample_rate=0, token="")
+        assert profiler.should_profile(None) is None
+        assert profiler.should_profile("") is None
+        assert profiler.should_profile("anything") is None
+
+    def test_header_requires_token(self, store):
+        """The debug header only triggers with the configured token"""
+        profiler = RequestProfiler(store, sample_rate=0, token="s3cret")
+        assert profiler.should_profile("s3cret") == "header"
+        assert profiler.should_profile("wrong") is None
+        assert profiler.should_profile(None) is None
+        assert profiler.get_stats()["header"] == 1
+
+    def test_one_in_n_sampling(self, store):
+        """A sample rate of N profiles exactly every N-th request"""
+        profiler = RequestProfiler(store, sample_rate=4, token="")
+        decisions = [profiler.should_profile(None) for _ in range(12)]
+        assert decisions.count("sample") == 3
+        assert decisions[3] == decisions[7] == decisions[11] == "sample"
+
+    def test_sample_rate_changes_at_runtime(self, store):
+        """set_sample_rate switches sampling on and off without a restart"""
+        profiler = RequestProfiler(store, sample_rate=0, token="")
+        assert profiler.should_profile(None) is None
+        profiler.set_sample_rate(1)
+        assert profiler.should_profile(None) == "sample"
+        profiler.set_sample_rate(0)
+        assert profiler.should_profile(None) is None
+
+    def test_save_failure_is_logged_not_raised(self, tmp_path):
+        """An unwritable profile directory does not fail the request"""
+        blocker = tmp_path / "file"
+        blocker.write_text("x")
+        profiler = RequestProfiler(ProfileStore(directory=str(blocker / "sub")), sample_rate=1, token="")
+        _, stats_data = run_profiled(_busy, 10)
+        assert profiler.save(stats_data, {}) is None
+        assert profiler.get_stats()["failed"] == 1
@@ -0,0 +1,173 @@
+"""
+Unit tests for the sliding-window-counter rate limiter
+"""
+
+import pytest
+
+from services.context_backends import RespClient
+from services.rate_limiter import (
+    MemoryRateLimiter,
+    RateLimitDecision,
+    RateLimitRule,
+    RedisRateLimiter,
+    create_rate_limiter,
+    parse_route_limits,
+    retry_after_seconds,
+)
+from tests.fixtures.resp_server import RespServer
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _allowed(limiter, client="1.2.3.4", path="/chat/advanced", n=1):
+    return [limiter.hit(client, path).allowed for _ in range(n)]
+
+
+@pytest.mark.unit
+class TestMemoryRateLimiter:
+    """In-process limiter: constant state per client, idle eviction"""
+
+    def test_limit_within_window(self):
+        """The limit+1-th request in a window is rejected with a retry hint"""
+        clock = FakeClock()
+        limiter = MemoryRateLimiter(RateLimitRule("default", 3, 60), clock=clock)
+
+        assert _allowed(limiter, n=3) == [True] * 3
+        decision = limiter.hit("1.2.3.4", "/chat/advanced")
+        assert not decision.allowed and decision.remaining == 0
+        assert 0 < decision.retry_after <= 60
+        assert _allowed(limiter, client="5.6.7.8") == [True]  # Other clients are unaffected
+
+    def test_sliding_window_weights_previous_window(self):
+        """Requests of the previous window count proportionally to their overlap"""
+        clock = FakeClock(1200.0)  # Start of a window
+        limiter = MemoryRateLimiter(RateLimitRule("default", 10, 60), clock=clock)
+        assert _allowed(limiter, n=10) == [True] * 10
+
+        clock.now += 60 + 15  # 25% into the next window: 10 * 0.75 = 7.5 counted
+        assert _allowed(limiter, n=3) == [True, True, False]
+        decision = limiter.hit("1.2.3.4", "/")
+        # Allowed again once 10 * (1 - f) + 2 + 1 <= 10, i.e. f >= 0.3 (3 s later)
+        assert decision.retry_after == pytest.approx(3.0)
+
+        clock.now += 3.01
+        assert _allowed(limiter) == [True]
+
+        clock.now += 120  # Two windows later nothing is carried over
+        assert _allowed(limiter, n=10) == [True] * 10
+
+    def test_routes_have_separate_budgets(self):
+        """The longest matching route prefix selects its own rule and counter"""
+        clock = FakeClock()
+        routes = parse_route_limits("/chat=5/60,/chat/batch=1/60")
+        limiter = MemoryRateLimiter(RateLimitRule("default", 100, 60), routes, clock=clock)
+
+        assert limiter.rule_for("/chat/batch").name == "/chat/batch"
+        assert limiter.rule_for("/chat/advanced").name == "/chat"
+        assert limiter.rule_for("/health").name == "default"
+
+        assert _allowed(limiter, path="/chat/batch", n=2) == [True, False]
+        assert _allowed(limiter, path="/chat/advanced", n=6) == [True] * 5 + [False]
+        assert _allowed(limiter, path="/health", n=3) == [True] * 3
+
+    def test_idle_clients_are_evicted(self):
+        """Clients idle for two windows are dropped as new requests arrive"""
+        clock = FakeClock()
+        limiter = MemoryRateLimiter(RateLimitRule("default", 10, 60), clock=clock)
+        for i in range(100):
+            limiter.hit(f"10.0.0.{i}", "/")
+        assert len(limiter) == 100
+
+        clock.now += 121
+        for i in range(60):
+            limiter.hit(f"10.1.0.{i}", "/")
+        # Each request removes up to two idle clients
+        assert len(limiter) == 60
+        assert limiter.get_stats()["evicted_idle"] == 100
+
+    def test_max_clients_bounds_memory(self):
+        """Beyond max_clients the least recently seen client is dropped"""
+        limiter = MemoryRateLimiter(RateLimitRule("default", 10, 60), max_clients=50, clock=FakeClock())
+        for i in range(200):
+            limiter.hit(f"10.0.0.{i}", "/")
+
+        stats = limiter.get_stats()
+        assert len(limiter) == 50
+        assert stats["evicted_lru"] == 150
+        assert stats["allowed"] == 200 and stats["rejected"] == 0
+
+
+@pytest.mark.unit
+class TestRedisRateLimiter:
+    """Shared limiter: every worker counts against the same budget"""
+
+    def test_limit_is_shared_between_workers(self):
+        """Two limiters on the same Redis enforce one combined limit"""
+        server = RespServer().start()
+        clock = FakeClock(1200.0)
+        rule = RateLimitRule("default", 4, 60)
+        workers = [RedisRateLimiter(RespClient.from_url(server.url), rule, clock=clock) for _ in range(2)]
+        try:
+            results = [workers[i % 2].hit("1.2.3.4", "/").allowed for i in range(6)]
+            assert results == [True] * 4 + [False] * 2
+            # Rejected requests give their slot back
+            assert server.dispatch([b"GET", b"huce:rl:default:1.2.3.4:20"]) == b"4"
+            assert 0 < server.dispatch([b"PTTL", b"huce:rl:default:1.2.3.4:20"]) <= 120000
+
+            clock.now += 60 + 30  # Half of the previous window still counts
+            assert [workers[0].hit("1.2.3.4", "/").allowed for _ in range(3)] == [True, True, False]
+        finally:
+            for worker in workers:
+                worker.close()
+            server.stop()
+
+    def test_fails_open_when_redis_is_down(self):
+        """Redis errors let requests through instead of rejecting everyone"""
+        client = RespClient(host="127.0.0.1", port=1, timeout=0.5)
+        limiter = RedisRateLimiter(client, RateLimitRule("default", 1, 60))
+        assert _allowed(limiter, n=3) == [True] * 3
+        assert limiter.get_stats()["errors"] == 3
+
+
+@pytest.mark.unit
+class TestConfiguration:
+    """Route specs and factory"""
+
+    def test_parse_route_limits(self):
+        """Specs are "prefix=requests/seconds" separated by commas"""
+        routes = parse_route_limits(" /chat/batch=10/60, /chat/advanced=60/30 ,")
+        assert routes == {
+            "/chat/batch": RateLimitRule("/chat/batch", 10, 60.0),
+            "/chat/advanced": RateLimitRule("/chat/advanced", 60, 30.0),
+        }
+        assert parse_route_limits("") == {}
+        with pytest.raises(ValueError):
+            parse_route_limits("/chat/batch=10")
+
+    def test_create_rate_limiter(self, monkeypatch):
+        """RATE_LIMIT_* environment variables configure the limiter"""
+        monkeypatch.setenv("RATE_LIMIT_REQUESTS", "7")
+        monkeypatch.setenv("RATE_LIMIT_WINDOW_SECONDS", "30")
+        monkeypatch.setenv("RATE_LIMIT_ROUTES", "/chat/batch=2/60")
+        limiter = create_rate_limiter()
+        assert isinstance(limiter, MemoryRateLimiter)
+        assert limiter.default == RateLimitRule("default", 7, 30.0)
+        assert limiter.rule_for("/chat/batch").limit == 2
+
+        monkeypatch.setenv("RATE_LIMIT_REDIS_URL", "redis://cache.local:6380/1")
+        limiter = create_rate_limiter("redis")
+        assert isinstance(limiter, RedisRateLimiter)
+        assert (limiter.client.host, limiter.client.port, limiter.client.db) == ("cache.local", 6380, 1)
+        with pytest.raises(ValueError):
+            create_rate_limiter("memcached")
+
+    def test_retry_after_rounds_up(self):
+        """Retry-After is a whole number of seconds, at least 1"""
+        assert retry_after_seconds(RateLimitDecision(False, 1, 0, 2.1)) == 3
+        assert retry_after_seconds(RateLimitDecision(False, 1, 0, 0.001)) == 1
@@ -0,0 +1,106 @@
+"""
+Unit tests for the startup timeline and the lazy underthesea loader
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from nlu import uts
+from utils.startup import STATE_FAILED, STATE_READY, STATE_WARMING, StartupTimeline
+
+
+@pytest.mark.unit
+class TestStartupTimeline:
+    """Phase timings and startup state"""
+
+    def test_phases_in_start_order(self):
+        """Phases are recorded in start order with their durations, nested phases included"""
+        timeline = StartupTimeline()
+        with timeline.phase("service.build"):
+            with timeline.phase("pipeline.synonyms"):
+                time.sleep(0.01)
+        phases = timeline.phases()
+
+        assert [p["name"] for p in phases] == ["service.build", "pipeline.synonyms"]
+        assert phases[1]["duration_ms"] >= 10
+        assert phases[0]["duration_ms"] >= phases[1]["duration_ms"]
+        assert phases[0]["start_ms"] <= phases[1]["start_ms"]
+
+    def test_failed_phase_and_states(self):
+        """A failing phase is kept with ok=False; state changes are reflected in the snapshot"""
+        timeline = StartupTimeline()
+        timeline.set_state(STATE_WARMING)
+        with pytest.raises(RuntimeError):
+            with timeline.phase("warm_up.ner"):
+                raise RuntimeError("model hỏng")
+        timeline.set_state(STATE_FAILED, "RuntimeError: model hỏng")
+
+        snapshot = timeline.snapshot()
+        assert snapshot["state"] == "failed" and snapshot["error"] == "RuntimeError: model hỏng"
+        assert snapshot["phases"][0]["ok"] is False and snapshot["ready_after_ms"] is None
+
+        timeline.set_state(STATE_READY)
+        assert timeline.snapshot()["ready_after_ms"] is not None
+        timeline.reset()
+        assert timeline.snapshot() == {"state": "idle", "error": None, "ready_after_ms": None, "phases": []}
+
+
+@pytest.fixture
+def fake_underthesea(monkeypatch):
+    """An underthesea stand-in whose first call loads its "model" non-atomically, like the real one"""
+    module = types.ModuleType("underthesea")
+    state = {"model": None, "loads": 0}
+
+    def word_tokenize(text):
+        if state["model"] is None:
+            state["loads"] += 1
+            time.sleep(0.05)  # Other threads would see the half-loaded model here
+            state["model"] = "loaded"
+        return text.replace(" ", "_")
+
+    module.word_tokenize = word_tokenize
+    monkeypatch.setitem(sys.modules, "underthesea", module)
+    monkeypatch.setattr(uts, "_funcs", {})
+    monkeypatch.setattr(uts, "_available", True)
+    return state
+
+
+@pytest.mark.unit
+@pytest.mark.nlp
+class TestLazyUnderthesea:
+    """nlu.uts imports underthesea on first use and serializes the model load"""
+
+    def test_first_call_is_serialized(self, fake_underthesea):
+        """Concurrent first calls load the model once and all get a result"""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(uts.word_tokenize("xin chào")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["xin_chào"] * 8
+        assert fake_underthesea["loads"] == 1
+        assert uts.is_loaded("word_tokenize") and not uts.is_loaded("ner")
+
+    def test_fallback_without_underthesea(self, monkeypatch):
+        """Without underthesea the text is returned untouched and NER finds nothing"""
+        monkeypatch.setattr(uts, "_available", False)
+        assert uts.word_tokenize("xin chào") == "xin chào"
+        assert uts.ner("Hà Nội") == []
+
+    def test_import_main_stays_light(self):
+        """Importing the app neither imports underthesea nor builds the NLP service"""
+        code = ("import sys, main\n"
+                "from services.nlp_service import peek_nlp_service\n"
+                "print('underthesea' in sys.modules, peek_nlp_service() is None)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60,
+                                cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        assert result.stdout.split()[-2:] == ["False", "True"], result.stderr
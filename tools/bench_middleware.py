@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the per-request middleware overhead on a tiny endpoint.
+
+Compares three apps serving the same GET /ping:
+  - bare:    no middleware
+  - stacked: the previous three @app.middleware("http") functions (rate limit,
+             request id, security headers), i.e. three BaseHTTPMiddleware layers
+  - fused:   services.middleware.GatewayMiddleware (one pure ASGI layer)
+
+Requests are driven straight through the ASGI interface (no sockets) so the
+numbers isolate the middleware cost.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+import warnings
+
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from services.middleware import GatewayMiddleware  # noqa: E402
+from services.rate_limiter import MemoryRateLimiter, RateLimitRule, retry_after_seconds  # noqa: E402
+
+
+def _limiter() -> MemoryRateLimiter:
+    # Limits high enough that every request passes: only the cost of the check is measured
+    return MemoryRateLimiter(RateLimitRule("default", 10 ** 9, 60))
+
+
+def _add_ping(app: FastAPI) -> FastAPI:
+    @app.get("/ping")
+    async def ping():
+        return {"success": True}
+
+    return app
+
+
+def build_bare() -> FastAPI:
+    return _add_ping(FastAPI())
+
+
+def build_stacked() -> FastAPI:
+    app = FastAPI()
+    limiter = _limiter()
+
+    @app.middleware("http")
+    async def rate_limit_middleware(request: Request, call_next):
+        decision = await limiter.hit_async(request.client.host, request.url.path)
+        if not decision.allowed:
+            retry_after = retry_after_seconds(decision)
+            return JSONResponse(status_code=429, content={"success": False, "retry_after": retry_after},
+                                headers={"Retry-After": str(retry_after)})
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def add_request_id_middleware(request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+    @app.middleware("http")
+    async def add_security_headers_middleware(request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+    return _add_ping(app)
+
+
+def build_fused() -> FastAPI:
+    app = FastAPI()
+    limiter = _limiter()
+    app.add_middleware(GatewayMiddleware, get_rate_limiter=lambda: limiter)
+    return _add_ping(app)
+
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+    "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+}
+
+
+async def _request(app: FastAPI) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(dict(SCOPE), receive, send)
+    return status
+
+
+async def _measure(app: FastAPI, requests: int, rounds: int) -> float:
+    """Median time per request (µs) over several rounds."""
+    for _ in range(200):  # Build the middleware stack and warm up
+        assert await _request(app) == 200
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await _request(app)
+        samples.append((time.perf_counter() - start) / requests * 1e6)
+    return statistics.median(samples)
+
+
+async def main_async(requests: int, rounds: int) -> None:
+    results = {}
+    for name, build in (("bare", build_bare), ("stacked", build_stacked), ("fused", build_fused)):
+        results[name] = await _measure(build(), requests, rounds)
+
+    bare = results["bare"]
+    print(f"{'app':<8} {'µs/request':>11} {'overhead µs':>12}")
+    for name, value in results.items():
+        print(f"{name:<8} {value:>11.1f} {value - bare:>12.1f}")
+    saved = results["stacked"] - results["fused"]
+    print(f"\nfused saves {saved:.1f} µs/request ({saved / results['stacked'] * 100:.0f}% of the stacked total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
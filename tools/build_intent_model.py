@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build the precompiled intent model artifact (vocab, IDF, CSR centroids) from
+data/intent.csv + data/synonym.csv so workers can memory-map it at startup
+instead of re-tokenizing every utterance.
+
+Run this in the image build / CI step after changing intent.csv or synonym.csv.
+The artifact is keyed by a content hash, so a stale file is simply ignored.
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import DATA_DIR, get_artifact_dir  # noqa: E402
+from nlu.model_store import artifact_path, compute_source_hash, load_intent_model, save_intent_model  # noqa: E402
+from nlu.pipeline import NLPPipeline  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--artifact-dir", default=get_artifact_dir())
+    parser.add_argument("--force", action="store_true", help="rebuild even if an up-to-date artifact exists")
+    args = parser.parse_args()
+
+    source_hash = compute_source_hash(os.path.join(args.data_dir, "intent.csv"),
+                                      os.path.join(args.data_dir, "synonym.csv"))
+    path = artifact_path(args.artifact_dir, source_hash)
+    if not args.force and load_intent_model(path, source_hash) is not None:
+        print(f"Up to date: {path}")
+        return
+
+    start = time.perf_counter()
+    # Build without the artifact cache so samples are always tokenized from intent.csv
+    pipeline = NLPPipeline(data_dir=args.data_dir, artifact_dir=args.artifact_dir, use_model_cache=False)
+    detector = pipeline._intent_detector
+    save_intent_model(path, detector.to_model(source_hash))
+    print(f"Wrote {path} ({len(detector.vocab)} tokens, {len(detector.intent_names)} intents) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load generator replaying multi-turn chat conversations against /chat/advanced.
+
+Conversations open with an utterance from data/intent.csv and continue with
+context-dependent follow-ups ("Còn học phí thế nào?"...), each on its own
+session id. Virtual users run concurrently, pause for a think time between turns
+and take the next conversation when one ends.
+
+    # against a running server (the realistic setup for sizing pods)
+    python tools/loadgen.py --url http://localhost:8000 --concurrency 50 --sessions 500 --think-time 1
+
+    # in-process through httpx.ASGITransport (no server needed; client and app share one
+    # event loop and CPU, so throughput is a lower bound)
+    python tools/loadgen.py --in-process --concurrency 20 --sessions 200 --think-time 0
+
+Reports throughput, p50/p95/p99 latency, error and 429 rates and the server RSS over
+time (polled from /metrics, huce_process_resident_memory_bytes). All requests of a
+remote run come from one IP, so the per-IP rate limit applies to the whole run:
+raise RATE_LIMIT_REQUESTS on the target unless 429 behaviour is what is tested.
+In-process runs give every virtual user its own client address.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import warnings
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+
+from benchmarks.corpus import read_intent_utterances  # noqa: E402
+from config import DATA_DIR  # noqa: E402
+
+# Openers come from intents that return data (they usually name a major, so follow-ups rely on context)
+OPENING_INTENTS = ("hoi_diem_chuan", "hoi_hoc_phi", "hoi_nganh_hoc", "hoi_to_hop_mon", "hoi_chi_tieu",
+                   "hoi_ma_nganh", "hoi_phuong_thuc")
+SMALL_TALK_INTENTS = ("chao_hoi", "tam_biet", "hoi_hoc_bong", "hoi_thong_tin_lien_he", "hoi_thoi_gian_dk")
+FOLLOW_UPS = (
+    "Còn học phí thế nào?",
+    "Còn điểm chuẩn năm 2024?",
+    "Điểm chuẩn năm ngoái bao nhiêu?",
+    "Xét tổ hợp nào vậy?",
+    "Chỉ tiêu bao nhiêu?",
+    "Ngành này học những gì?",
+    "Có học bổng không?",
+    "Cảm ơn bạn",
+)
+
+RSS_RE = re.compile(r"^huce_process_resident_memory_bytes(?:\{[^}]*\})? ([0-9.e+]+)$", re.MULTILINE)
+
+
+def build_conversations(count: int, max_turns: int, seed: int, data_dir: str = DATA_DIR) -> List[List[str]]:
+    """Deterministic list of conversations (each a list of messages, 1..max_turns long)."""
+    by_intent = read_intent_utterances(os.path.join(data_dir, "intent.csv"))
+    rng = random.Random(seed)
+    openers = sorted({u for intent in OPENING_INTENTS for u in by_intent.get(intent, [])})
+    small_talk = sorted({u for intent in SMALL_TALK_INTENTS for u in by_intent.get(intent, [])})
+    conversations = []
+    for _ in range(count):
+        turns = [rng.choice(openers)]
+        if small_talk and rng.random() < 0.2:
+            turns.insert(0, rng.choice(small_talk))
+        follow_ups = rng.randint(0, max(0, max_turns - len(turns)))
+        turns.extend(rng.sample(FOLLOW_UPS, min(follow_ups, len(FOLLOW_UPS))))
+        conversations.append(turns[:max_turns])
+    return conversations
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..1) of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+class LoadStats:
+    """Latencies and outcomes of every request, plus RSS samples."""
+
+    def __init__(self) -> None:
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.exceptions: Counter = Counter()
+        self.rss: List[Dict[str, float]] = []
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, status: int, latency_ms: float) -> None:
+        self.statuses[status] += 1
+        if 200 <= status < 300:
+            self.latencies_ms.append(latency_ms)
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values()) + sum(self.exceptions.values())
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total = self.requests
+        latencies = sorted(self.latencies_ms)
+        ok = len(latencies)
+        rejected = self.statuses.get(429, 0)
+        errors = total - ok - rejected
+        rss_values = [s["rss_mb"] for s in self.rss]
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 2)
+
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "ok_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {"p50": ms(percentile(latencies, 0.50)), "p95": ms(percentile(latencies, 0.95)),
+                           "p99": ms(percentile(latencies, 0.99)), "max": ms(latencies[-1] if latencies else None),
+                           "mean": ms(sum(latencies) / ok if ok else None)},
+            "rate_429": round(rejected / total, 4) if total else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "status_counts": {str(k): v for k, v in sorted(self.statuses.items())},
+            "exceptions": dict(self.exceptions),
+            "rss_mb": {"start": rss_values[0] if rss_values else None,
+                       "max": max(rss_values) if rss_values else None,
+                       "end": rss_values[-1] if rss_values else None},
+            "rss_timeline": self.rss,
+        }
+
+
+async def _think(think_time: float, rng: random.Random) -> None:
+    if think_time > 0:
+        await asyncio.sleep(rng.expovariate(1 / think_time))  # Mean of think_time seconds
+
+
+async def virtual_user(client: httpx.AsyncClient, queue: "asyncio.Queue[tuple]", stats: LoadStats,
+                       think_time: float, timeout: float, rng: random.Random, deadline: Optional[float]) -> None:
+    """Take conversations from the queue until it is empty (or the deadline passes)."""
+    while True:
+        try:
+            session_id, turns = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        for message in turns:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat/advanced", timeout=timeout,
+                                             json={"message": message, "session_id": session_id})
+                stats.record(response.status_code, (time.perf_counter() - start) * 1000)
+            except httpx.HTTPError as e:
+                stats.exceptions[type(e).__name__] += 1
+            await _think(think_time, rng)
+
+
+async def sample_rss(client: httpx.AsyncClient, stats: LoadStats, interval: float, stop: asyncio.Event) -> None:
+    """Poll /metrics for the server RSS every interval seconds."""
+    while True:
+        try:
+            response = await client.get("/metrics", timeout=5)
+            match = RSS_RE.search(response.text) if response.status_code == 200 else None
+            if match:
+                stats.rss.append({"t": round(time.perf_counter() - stats.started, 2),
+                                  "requests": stats.requests,
+                                  "rss_mb": round(float(match.group(1)) / 2 ** 20, 1)})
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def run_load(make_client, conversations: List[List[str]], concurrency: int, think_time: float,
+                   timeout: float, duration: Optional[float], rss_interval: float, seed: int,
+                   run_id: str) -> Dict[str, Any]:
+    """
+    Drive the conversations with `concurrency` virtual users.
+
+    make_client(i) returns the httpx.AsyncClient of virtual user i (index -1: RSS sampler).
+    """
+    queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+    for n, turns in enumerate(conversations):
+        queue.put_nowait((f"loadgen-{run_id}-{n}", turns))
+
+    stats = LoadStats()
+    stop = asyncio.Event()
+    deadline = stats.started + duration if duration else None
+    clients = [make_client(i) for i in range(concurrency)]
+    monitor_client = make_client(-1)
+    sampler = asyncio.create_task(sample_rss(monitor_client, stats, rss_interval, stop))
+    try:
+        await asyncio.gather(*(virtual_user(client, queue, stats, think_time, timeout, random.Random(seed + i),
+                                            deadline) for i, client in enumerate(clients)))
+    finally:
+        stats.finished = time.perf_counter()
+        stop.set()
+        await sampler
+        for client in [*clients, monitor_client]:
+            await client.aclose()
+    return stats.summary()
+
+
+def _print_summary(summary: Dict[str, Any], settings: Dict[str, Any]) -> None:
+    latency = summary["latency_ms"]
+    fmt = lambda v: "-" if v is None else f"{v:.1f}"  # noqa: E731
+    print(f"\nconcurrency={settings['concurrency']} sessions={settings['sessions']} "
+          f"think_time={settings['think_time']}s target={settings['target']}")
+    print(f"requests      {summary['requests']} in {summary['elapsed_seconds']} s")
+    print(f"throughput    {summary['throughput_rps']} req/s ({summary['ok_rps']} ok/s)")
+    print(f"latency ms    p50 {fmt(latency['p50'])}  p95 {fmt(latency['p95'])}  p99 {fmt(latency['p99'])}  "
+          f"max {fmt(latency['max'])}")
+    print(f"429 rate      {summary['rate_429']:.2%}")
+    print(f"error rate    {summary['error_rate']:.2%}  statuses {summary['status_counts']}"
+          + (f"  exceptions {summary['exceptions']}" if summary["exceptions"] else ""))
+    rss = summary["rss_mb"]
+    if rss["start"] is not None:
+        print(f"server RSS MB start {rss['start']}  max {rss['max']}  end {rss['end']} "
+              f"({len(summary['rss_timeline'])} samples)")
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    conversations = build_conversations(args.sessions, args.turns, args.seed)
+    run_id = f"{int(time.time())}"
+    settings = {"concurrency": args.concurrency, "sessions": args.sessions, "turns": args.turns,
+                "think_time": args.think_time, "duration": args.duration, "seed": args.seed,
+                "target": "in-process" if args.in_process else args.url,
+                "conversation_turns": sum(len(c) for c in conversations)}
+
+    if args.in_process:
+        import logging
+        from main import app
+        logging.getLogger().setLevel(logging.WARNING)  # Per-request INFO logs would slow down the loop being measured
+
+        def make_client(i: int) -> httpx.AsyncClient:
+            # One address per virtual user, like real users (the rate limit is per IP)
+            host = f"10.{(i + 2) // 65536 % 256}.{(i + 2) // 256 % 256}.{(i + 2) % 256}"
+            return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(host, 40000)),
+                                     base_url="http://loadgen")
+
+        async with app.router.lifespan_context(app):
+            summary = await run_load(make_client, conversations, args.concurrency, args.think_time, args.timeout,
+                                     args.duration, args.rss_interval, args.seed, run_id)
+    else:
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+
+        def make_client(i: int) -> httpx.AsyncClient:
+            return httpx.AsyncClient(base_url=args.url, limits=limits)
+
+        summary = await run_load(make_client, conversations, args.concurrency, args.think_time, args.timeout,
+                                 args.duration, args.rss_interval, args.seed, run_id)
+
+    _print_summary(summary, settings)
+    return {"settings": settings, **summary}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8000", help="base URL of a running server")
+    target.add_argument("--in-process", action="store_true", help="drive main.app through httpx.ASGITransport")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users")
+    parser.add_argument("--sessions", type=int, default=100, help="conversations to replay")
+    parser.add_argument("--turns", type=int, default=4, help="max messages per conversation")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between turns (seconds)")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="request timeout (seconds)")
+    parser.add_argument("--rss-interval", type=float, default=1.0, help="seconds between /metrics polls")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="FILE", help="write the full report (incl. RSS timeline) as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
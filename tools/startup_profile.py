@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup-time breakdown: import time per top-level package and init time per component.
+
+Runs a fresh interpreter under `python -X importtime` that imports main, builds the
+NLPService and warms it up (what the app lifespan does before /readyz turns green),
+then reports:
+
+- wall time of `import main`, build and warm-up
+- self import time per top-level package, split into imports paid by `import main`
+  and imports deferred to the build/warm-up (underthesea, nltk, scipy...)
+- the startup timeline phases (synonyms, intent model, entity extractor, tokenizer
+  and NER models, CSV indexes) recorded by utils.startup
+
+    python tools/startup_profile.py
+    python tools/startup_profile.py --no-warm-up --top 10 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MARKER = "--- startup_profile: main imported ---"
+
+# Runs in the child interpreter: times each step and prints the JSON result to stdout
+CHILD = """
+import json, sys, time, warnings
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+import logging
+logging.getLogger().setLevel(logging.WARNING)
+from services.nlp_service import get_nlp_service
+from utils.startup import STARTUP
+service = get_nlp_service()
+t2 = time.perf_counter()
+if {warm_up!r}:
+    service.warm_up()
+t3 = time.perf_counter()
+print(json.dumps({{"import_main_s": t1 - t0, "build_s": t2 - t1, "warm_up_s": t3 - t2,
+                  "phases": STARTUP.phases()}}))
+"""
+
+
+def parse_importtime(lines: List[str]) -> Dict[str, float]:
+    """`import time: self [us] | cumulative | name` lines -> total self time (ms) per top-level package."""
+    totals: Dict[str, float] = defaultdict(float)
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|", 2)
+            totals[name.strip().split(".")[0]] += int(self_us) / 1000
+        except ValueError:
+            continue
+    return dict(totals)
+
+
+def nest_phases(phases: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Attach a depth to each phase (a phase that runs inside an earlier one is its child)."""
+    stack: List[float] = []  # End times of the phases still open
+    nested = []
+    for record in phases:
+        end = record["start_ms"] + (record["duration_ms"] or 0.0)
+        while stack and record["start_ms"] >= stack[-1]:
+            stack.pop()
+        nested.append((len(stack), record))
+        stack.append(end)
+    return nested
+
+
+def profile(warm_up: bool = True) -> Dict[str, Any]:
+    code = CHILD.format(marker=MARKER, warm_up=warm_up)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{proc.stderr[-4000:]}")
+    stderr = proc.stderr.splitlines()
+    split = stderr.index(MARKER) if MARKER in stderr else len(stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports_main_ms"] = parse_importtime(stderr[:split])
+    result["imports_deferred_ms"] = parse_importtime(stderr[split:])
+    return result
+
+
+def print_report(result: Dict[str, Any], top: int) -> None:
+    print(f"import main : {result['import_main_s'] * 1000:8.1f} ms")
+    print(f"build       : {result['build_s'] * 1000:8.1f} ms")
+    print(f"warm-up     : {result['warm_up_s'] * 1000:8.1f} ms")
+    for title, key in (("Imports paid by `import main`", "imports_main_ms"),
+                       ("Imports deferred to build/warm-up", "imports_deferred_ms")):
+        imports = result[key]
+        print(f"\n{title} (self time, total {sum(imports.values()):.1f} ms):")
+        for name, ms in sorted(imports.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {name:<28} {ms:8.1f} ms")
+    print("\nInit phases:")
+    for depth, record in nest_phases(result["phases"]):
+        duration = "running" if record["duration_ms"] is None else f"{record['duration_ms']:8.1f} ms"
+        flag = "" if record["ok"] else "  (failed)"
+        print(f"  {'  ' * depth}{record['name']:<{30 - 2 * depth}} {duration}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--no-warm-up", action="store_true", help="stop after building the NLP service")
+    parser.add_argument("--top", type=int, default=15, help="packages to list per import section")
+    parser.add_argument("--json", help="also write the raw result to this file")
+    args = parser.parse_args()
+
+    result = profile(warm_up=not args.no_warm_up)
+    print_report(result, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Metrics - Đo thời gian từng bước xử lý và xuất theo định dạng text của Prometheus
+
+- Histogram: bucket cố định (giây), mỗi lần observe chỉ là 1 bisect + cộng dồn
+- Counter: đếm theo nhãn (vd: số câu hỏi theo intent)
+- span(stage): đo 1 đoạn code bằng time.perf_counter() (đồng hồ monotonic), ghi vào
+  histogram huce_stage_duration_seconds{stage="..."}
+- timed(stage): decorator tương tự cho cả hàm
+- Collector: hàm trả về giá trị tức thời (cache hit rate, RSS, executor...) khi render
+
+Ở chế độ executor "process", các bước chạy trong process worker được ghi vào registry
+của worker đó; mỗi kết quả worker gửi về kèm phần histogram mới ghi (drain_histograms),
+process chính cộng vào registry của mình (merge_histograms) nên /metrics thấy đủ các bước.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import get_metrics_enabled
+
+# Bucket (giây) từ 50µs tới 2.5s: đủ chi tiết cho các bước NLP cỡ vài chục µs lẫn request cả giây
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                                      0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Sample = Tuple[str, Dict[str, str], float]  # (tên metric, nhãn, giá trị)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _HistogramChild:
+    """
+    Histogram của 1 bộ giá trị nhãn
+
+    Mỗi thread ghi vào shard riêng (list [count từng bucket..., sum, count]) nên observe()
+    không cần khóa; snapshot() cộng các shard lại.
+    """
+
+    __slots__ = ("buckets", "_local", "_shards", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def _new_shard(self) -> List[float]:
+        shard: List[float] = [0] * (len(self.buckets) + 3)  # Bucket cuối: > bucket lớn nhất (+Inf)
+        self._local.shard = shard
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def observe(self, value: float) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(số lần theo từng bucket, tổng, số lần)."""
+        with self._lock:
+            shards = list(self._shards)
+        totals = [sum(column) for column in zip(*shards)] if shards else [0] * (len(self.buckets) + 3)
+        return [int(n) for n in totals[:-2]], float(totals[-2]), int(totals[-1])
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard[:] = [0] * len(shard)
+
+    def drain(self) -> Tuple[List[int], float, int]:
+        """
+        Như snapshot() rồi xóa giá trị
+
+        Chỉ dùng khi không có thread nào đang observe (process worker chạy 1 tác vụ mỗi lúc).
+        """
+        counts, total, count = self.snapshot()
+        if count:
+            self.reset()
+        return counts, total, count
+
+    def merge(self, counts: Sequence[int], total: float, count: int) -> None:
+        """Cộng giá trị do process khác ghi (số lần theo từng bucket, tổng, số lần) vào shard của thread này."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        for i, n in enumerate(counts):
+            shard[i] += n
+        shard[-2] += total
+        shard[-1] += count
+
+
+class Histogram:
+    """
+    Histogram với bucket cố định, chia theo nhãn
+
+    Ví dụ:
+        h = Histogram("huce_stage_duration_seconds", "Thời gian từng bước", ("stage",))
+        h.labels("nlp.analyze").observe(0.0012)
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _HistogramChild:
+        """Histogram con theo giá trị nhãn (nên giữ lại để gọi observe nhiều lần)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} cần nhãn {self.labelnames}, nhận {values}")
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float, *values: str) -> None:
+        self.labels(*values).observe(value)
+
+    def samples(self) -> List[Sample]:
+        result: List[Sample] = []
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            labels = dict(zip(self.labelnames, values))
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                result.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            result.append((f"{self.name}_sum", labels, total))
+            result.append((f"{self.name}_count", labels, count))
+        return result
+
+    def drain(self) -> List[Tuple[Tuple[str, ...], List[int], float, int]]:
+        """(giá trị nhãn, số lần theo từng bucket, tổng, số lần) của các histogram con có dữ liệu, rồi xóa."""
+        with self._lock:
+            children = list(self._children.items())
+        drained = []
+        for values, child in children:
+            counts, total, count = child.drain()
+            if count:
+                drained.append((values, counts, total, count))
+        return drained
+
+    def merge(self, drained: Iterable[Tuple[Tuple[str, ...], List[int], float, int]]) -> None:
+        """Cộng kết quả drain() của histogram cùng tên ở process khác."""
+        for values, counts, total, count in drained:
+            self.labels(*values).merge(counts, total, count)
+
+    def reset(self) -> None:
+        # Xóa giá trị tại chỗ: span()/timed() giữ sẵn tham chiếu tới histogram con
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+
+class Counter:
+    """Bộ đếm chỉ tăng, chia theo nhãn."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} cần nhãn {self.labelnames}, nhận {values}")
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def get(self, *values: str) -> float:
+        return self._values.get(values, 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, values)), value) for values, value in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """Tập các metric và collector, render ra định dạng text exposition 0.0.4 của Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Any) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+                      ) -> None:
+        """
+        Thêm collector gọi lúc render
+
+        Args:
+            collector: Hàm trả về list (tên, loại "gauge"/"counter", mô tả, [(nhãn, giá trị), ...])
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Text cho endpoint /metrics."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:  # 1 collector lỗi không làm hỏng cả /metrics
+                lines.append(f"# collector error: {type(e).__name__}: {e}".replace("\n", " "))
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def drain_histograms(self) -> Dict[str, list]:
+        """Phần mới ghi của mọi histogram (tên -> Histogram.drain()), gửi từ process worker về process chính."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        drained = {}
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                values = metric.drain()
+                if values:
+                    drained[metric.name] = values
+        return drained
+
+    def merge_histograms(self, drained: Dict[str, list]) -> None:
+        """Cộng kết quả drain_histograms() của process worker (bỏ qua histogram không có ở process này)."""
+        for name, values in drained.items():
+            metric = self._metrics.get(name)
+            if isinstance(metric, Histogram):
+                metric.merge(values)
+
+    def reset(self) -> None:
+        """Xóa giá trị của mọi metric (dùng trong test/benchmark)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "huce_stage_duration_seconds", "Thời gian xử lý từng bước (giây)", ("stage",))
+
+
+ENABLED = get_metrics_enabled()
+
+
+class _Span:
+    """Context manager đo 1 lần thực thi của 1 bước."""
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self.child = child
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_CHILDREN: Dict[str, _HistogramChild] = {}
+
+
+def span(stage: str):
+    """
+    Đo thời gian 1 đoạn code vào huce_stage_duration_seconds{stage=...}
+
+    Ví dụ:
+        with span("nlp.intent_scoring"):
+            ...
+    """
+    if not ENABLED:
+        return _NOOP
+    child = _CHILDREN.get(stage)
+    if child is None:
+        child = _CHILDREN.setdefault(stage, STAGE_SECONDS.labels(stage))
+    return _Span(child)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Ghi thời gian đã đo sẵn của 1 bước."""
+    if ENABLED:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def timed(stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator đo thời gian mỗi lần gọi hàm (tắt METRICS_ENABLED thì trả về hàm gốc)."""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        if not ENABLED:
+            return func
+        child = STAGE_SECONDS.labels(stage)
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(clock() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def process_rss_bytes() -> Optional[int]:
+    """RSS hiện tại của process (Linux /proc), None nếu không đọc được."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
@@ -0,0 +1,80 @@
+"""
+Startup Timeline - Thời gian khởi tạo từng thành phần và trạng thái khởi động của service
+
+- phase(name): đo 1 bước khởi tạo (đọc synonym, nạp intent model, dựng gazetteer, nạp model
+  Underthesea, dựng chỉ mục CSV...) bằng time.perf_counter(), ghi vào timeline dùng chung
+- Trạng thái: idle (chưa dựng NLPService) → warming (đang dựng/warm-up) → ready | failed
+
+/readyz và /health đọc timeline để báo server đang khởi động tới bước nào;
+tools/startup_profile.py in ra bảng thời gian import + khởi tạo từng thành phần.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+STATE_IDLE = "idle"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class StartupTimeline:
+    """Các bước khởi tạo đã chạy (theo thứ tự bắt đầu) và trạng thái khởi động hiện tại."""
+
+    def __init__(self) -> None:
+        self.state = STATE_IDLE
+        self.error: Optional[str] = None
+        self._origin = time.perf_counter()
+        self._phases: List[Dict[str, Any]] = []
+        self._ready_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Đo 1 bước khởi tạo; bước lỗi vẫn được ghi lại (ok=False)."""
+        record = {"name": name, "start_ms": round((time.perf_counter() - self._origin) * 1000, 3),
+                  "duration_ms": None, "ok": True}
+        with self._lock:
+            self._phases.append(record)
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            record["ok"] = False
+            raise
+        finally:
+            record["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+
+    def set_state(self, state: str, error: Optional[str] = None) -> None:
+        """Chuyển trạng thái khởi động (ready: ghi lại thời điểm sẵn sàng)."""
+        self.state, self.error = state, error
+        if state == STATE_READY:
+            self._ready_at = time.perf_counter()
+
+    def phases(self) -> List[Dict[str, Any]]:
+        """Bản sao các bước đã chạy (duration_ms=None: bước đang chạy)."""
+        with self._lock:
+            return [dict(record) for record in self._phases]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Trạng thái + các bước, dạng JSON cho /readyz."""
+        ready_ms = None if self._ready_at is None else round((self._ready_at - self._origin) * 1000, 3)
+        return {"state": self.state, "error": self.error, "ready_after_ms": ready_ms, "phases": self.phases()}
+
+    def reset(self) -> None:
+        """Xóa timeline (dùng trong test)."""
+        with self._lock:
+            self._phases = []
+        self.state, self.error, self._ready_at = STATE_IDLE, None, None
+        self._origin = time.perf_counter()
+
+
+# Timeline dùng chung của process
+STARTUP = StartupTimeline()
+
+
+def phase(name: str):
+    """Đo 1 bước khởi tạo vào timeline dùng chung (vd: with phase("pipeline.intent_model"): ...)."""
+    return STARTUP.phase(name)